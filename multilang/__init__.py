@@ -19,6 +19,8 @@ Expected uses
 
 2.	Running scripts from Terminal:
 		$ python -m multilang path/to/file.mul
+		$ python -m multilang sweep path/to/file.mul -g check=Condition,Sac
+		$ python -m multilang run-many path/to/*.mul --jobs 4
 
 
 Warning
@@ -47,8 +49,13 @@ See the docs for Master to learn more.
 How It Works
 ------------
 Passing variables between most environments uses temporary .mat files.
+These live in one scratch directory per session, on /dev/shm if there's
+room, and are deleted once loaded; see `multilang.transfer.Scratch`.
+Variables that R or Matlab already hold unchanged are not sent again.
 Python's file interactions use scipy.io.
 R's file interactions use R.matlab.
+Transfers between Python and R can use a named pipe instead of a file;
+see `multilang.transfer.TRANSPORT`.
 Matlab's file interactions use the `load` and `save` commands.
 Bash's interactions are done using a dict, starting with `os.environ`.
 
@@ -59,8 +66,20 @@ Matlab is running as a script, so function definitions are not allowed.
 Subpackages
 -----------
 All imported directly into the main module for convenience.
+checkpoint
+	Checkpoints of long multilang runs
+memo
+	Replaying the blocks of a script whose code and inputs are unchanged
 objects
 	Underlying classes for R and Matlab environments
+program
+	Parsing scripts into reusable MulPrograms
+refs
+	Lazy references to variables in the R and Matlab environments
+sweep
+	Running scripts many times in a pool of worker processes
+transfer
+	Sending Python variables to the R and Matlab environments
 
 Attributes
 ----------
@@ -95,11 +114,21 @@ as_multilang_unix
 as_multilang_windows
 	Not implemented
 	Run multilang code on Windows
+compile_mul
+	Parse a script once into a MulProgram that can be run many times
+sweep
+	Run a script once for each set of parameters, in worker processes
+run_many
+	Run many independent scripts in worker processes
 
 Classes
 -------
 Master
 	An interactive object for multilang coding
+MulProgram
+	A parsed multilang script
+Run
+	The result of one run of a sweep or of run_many
 RObject
 	An interactive R environment
 MatlabObject
@@ -138,6 +167,7 @@ bash_to_r
 
 
 # ------------------------------- Imports ------------------------------- #
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import json
 import numpy as np
 import os
@@ -146,11 +176,18 @@ from platform import system
 from random import choices
 import re
 import scipy.io as sio
+import scipy.sparse as sp
 import sys
 import subprocess
 from tempfile import NamedTemporaryFile
 
+from .checkpoint import Checkpoint, checkpoint_dir
+from .memo import fingerprint, Memo, memo_dir
 from .objects import RObject, MatlabObject
+from .program import _is_switch, _uncomment, Block, compile_mul, LANGUAGES, MulProgram
+from .refs import MatRef, mat_refs, r_refs, RRef, resolve
+from .sweep import expand, Run, run_many, sweep
+from .transfer import assigned, content_hash, fetch_mat, fetch_r, from_mat, from_r, move_mat_to_r, move_r_to_mat, Scratch, summarize_mat, summarize_r, to_mat, to_r
 
 
 
@@ -167,6 +204,7 @@ _IMPORTED = {
 		'choices': choices,
 		're'	: re,
 		'sio'	: sio,
+		'sp'	: sp,
 		'subprocess': subprocess,
 		'NamedTemporaryFile': NamedTemporaryFile,
 		'RObject': RObject,
@@ -390,6 +428,7 @@ def bash_to_r(_line, _environ : dict, _r_object : RObject = RObject()):
 				for _k, _v in _out.items()
 		]
 	)
+	_r_object.forget(_out)
 	return _r_object
 
 def bash_to_mat(_line, _environ : dict, _mat_object : MatlabObject = MatlabObject()):
@@ -459,15 +498,8 @@ def bash_to_mat(_line, _environ : dict, _mat_object : MatlabObject = MatlabObjec
 		else:
 			_out[_i] = _environ[_i]
 	
-	# bundle them
-	_temp_file = NamedTemporaryFile(suffix='.mat')
-	sio.savemat(_temp_file, _out)
-	_temp_file.seek(0)
-
-	# load them
-	_mat_object.sendline('load \'' + _temp_file.name + '\';')
-
-	return _mat_object
+	# bundle and load them
+	return to_mat(_out, _mat_object)
 
 def r_to_bash(_line, _r_object : MatlabObject, _environ : dict = None):
 	"""Move variables from R to bash.
@@ -610,7 +642,7 @@ def mat_to_bash(_line, _mat_object : MatlabObject, _environ : dict = None):
 
 	# null case
 	if _to_load[0] == '':
-		return
+		return _environ
 
 	# get the variables
 	_dump = mat_to_py(_line, _mat_object, _load=False)
@@ -732,26 +764,8 @@ def py_to_r(_line, _r_object : RObject = RObject()):
 
 		else: _out[_i] = _VARIABLES[_i]
 
-	# bundle the variables
-	_temp_file = NamedTemporaryFile()
-	sio.savemat(_temp_file, _out)
-	_temp_file.seek(0)
-	
-	# send them
-	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-	_r_object.sendlines(
-		[
-			'library("R.matlab")',
-			_random_name + ' <- readMat("' + _temp_file.name + '")'
-		] + [
-			_current + ' <- ' + _random_name + '$' + _current
-				for _current in _out
-		] + [
-			'rm(' + _random_name + ')'
-		]
-	)
-
-	return _r_object
+	# bundle and send the ones R doesn't have
+	return to_r(_out, _r_object)
 
 def py_to_mat(_line, _mat_object : MatlabObject = MatlabObject()):
 	"""Move variables from Python to Matlab
@@ -851,14 +865,8 @@ def py_to_mat(_line, _mat_object : MatlabObject = MatlabObject()):
 
 		else: _out[_i] = _VARIABLES[_i] # easy case
 
-	# bundle them
-	_temp_file = NamedTemporaryFile(suffix='.mat')
-	sio.savemat(_temp_file, _out)
-	_temp_file.seek(0)
-
-	# load them
-	_mat_object.sendline('load \'' + _temp_file.name + '\';')
-	return _mat_object
+	# bundle and load the ones Matlab doesn't have
+	return to_mat(_out, _mat_object)
 
 def r_to_py(_line, _r_object : RObject, _load : bool = True):
 	"""Move variables from R to Python
@@ -919,26 +927,8 @@ def r_to_py(_line, _r_object : RObject, _load : bool = True):
 	if _to_load[0] == '':
 		return
 
-	# check the variables
-	_who = _r_object.who
-	for i in _to_load:
-		if i not in _who:
-			raise NameError(str(i) + ' not in R environment.')
-
-	# bundle them
-	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-	_r_object.sendline(_random_name + '<- tempfile(); ' + _random_name)
-	_temp_file = str(_r_object.before).split('"')[1]
-
 	# get them
-	_r_object.sendlines([
-			'writeMat(paste(' + _random_name + ',".mat",sep=""), ' + ', '.join([i + '=' + i for i in _to_load]) + ')',
-			'rm(' + _random_name + ')'
-		])
-
-	# load them
-	_loaded = sio.loadmat(_temp_file, squeeze_me=True)
-	del _loaded['__globals__'], _loaded['__header__'], _loaded['__version__']
+	_loaded = from_r(_to_load, _r_object)
 	if _load:
 		_VARIABLES.update(_loaded)
 	return _loaded
@@ -1007,27 +997,8 @@ def r_to_mat(_line, _r_object : RObject, _mat_object : MatlabObject = MatlabObje
 		# null case
 		return _mat_object
 
-	# check the variables
-	_who = _r_object.who
-	for i in _to_load:
-		if i not in _who:
-			print(_who)
-			raise NameError(str(i) + ' not in R environment.')
-
-	# bundle them
-	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-	_r_object.sendline(_random_name + '<- tempfile(); ' + _random_name)
-	_temp_file = str(_r_object.before).split('"')[1]
-
-	# get them
-	_r_object.sendlines([
-			'writeMat(paste(' + _random_name + ',".mat", sep=""), ' + ', '.join([ i + '=' + i for i in _to_load]) + ')',
-			'rm(' + _random_name + ')'
-		])
-
-	# load them
-	_mat_object.sendline('load \'' + _temp_file + '\';')
-	return _mat_object
+	# bundle and load them
+	return move_r_to_mat(_to_load, _r_object, _mat_object)
 
 def mat_to_py(_line, _mat_object : MatlabObject, _load : bool = True):
 	"""Move variables from Matlab to Python
@@ -1088,25 +1059,8 @@ def mat_to_py(_line, _mat_object : MatlabObject, _load : bool = True):
 	if _to_load[0] == '':
 		return
 
-	# check the variables
-	_who = _mat_object.who
-	if any([i not in _who for i in _to_load]):
-		raise NameError(str(i) + ' not in Matlab environment')
-
-	# bundle them
-	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-	_mat_object.sendline(_random_name + ' = tempname')
-	_temp_file = _mat_object.before.split('\r\n\r\n')[2].strip()[1:-1]
-
 	# get them
-	_mat_object.sendlines([
-			'save ' + _temp_file + ' ' + ' '.join(_to_load),
-			'clear ' + _random_name
-		])
-
-	# load them
-	_loaded = sio.loadmat(_temp_file, squeeze_me=True)
-	del _loaded['__globals__'], _loaded['__header__'], _loaded['__version__']
+	_loaded = from_mat(_to_load, _mat_object)
 	if _load:
 		_VARIABLES.update(_loaded)
 	return _loaded
@@ -1175,36 +1129,8 @@ def mat_to_r(_line, _mat_object : MatlabObject, _r_object : RObject = RObject())
 		# null case
 		return _r_object
 
-	# check the variables
-	_who = _mat_object.who
-	for i in _to_load:
-		if i not in _who:
-			raise NameError(str(i) + ' not in Matlab environment')
-
-	# bundle them
-	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-	_mat_object.sendline(_random_name + ' = tempname')
-	_temp_file = _mat_object.before.split('\r\n\r\n')[2].strip()[1:-1]
-
-	# get them
-	_mat_object.sendlines([
-			'save ' + _temp_file + '.mat ' + ' '.join(_to_load),
-			'clear ' + _random_name
-		])
-	
-	# load them
-	_r_object.sendlines(
-		[
-			'library("R.matlab")',
-			_random_name + ' <- readMat("' + _temp_file + '.mat")'
-		] + [
-			_current + ' <- ' + _random_name + '$' + _current
-				for _current in _to_load
-		] + [
-			'rm(' + _random_name + ')'
-		]
-	)
-	return _r_object
+	# bundle and load them
+	return move_mat_to_r(_to_load, _mat_object, _r_object)
 
 
 def dump(_file = '', **kwargs):
@@ -1301,11 +1227,16 @@ def as_array(var: str, extras: str = 'True'):
 	If extras == 'True', adds more information about the variable.
 	If var is a pd.DataFrame:
 		<var>_index and <var>_columns are also passed as lists.
+
+	scipy.sparse matrices are passed in CSC form rather than densified.
 	"""
 	# get it
 	obj = _VARIABLES[var]
 
-	if extras != 'True':
+	if sp.issparse(obj):
+		# keep it sparse
+		return {var: obj.tocsc()}
+	elif extras != 'True':
 		# if nothing special
 		return {var: np.array(obj)}
 	elif type(obj) is pd.core.frame.DataFrame:
@@ -1316,6 +1247,294 @@ def as_array(var: str, extras: str = 'True'):
 	else: # everything else is simple
 		return {var: np.array(obj)}
 
+def _quiet(_verbosity : int):
+	"""Silence stdout if @_verbosity is 0
+	Returns the old stdout to be put back"""
+	_old = sys.stdout
+	if _verbosity == 0: sys.stdout = None
+	return _old
+
+def _switch(_block : Block, _state : dict, _verbosity : int):
+	"""Move the variables of the switch @_block into its language
+
+	@_state is {'r': RObject, 'm': MatlabObject, 'b': dict} and is updated
+	with the environments returned by the move
+	"""
+	if _verbosity >= 2: print('Switching to ' + LANGUAGES[_block.lang])
+	_names, _from, _to = ', '.join(_block.names), _block.source, _block.lang
+
+	if _from == 'p':
+		if _to == 'r': _state['r'] = py_to_r(_names, _state['r'])
+		elif _to == 'm': _state['m'] = py_to_mat(_names, _state['m'])
+		elif _to == 'b': _state['b'] = py_to_bash(_names, _state['b'])
+	elif _from == 'r':
+		if _to == 'p': r_to_py(_names, _state['r'])
+		elif _to == 'm': _state['m'] = r_to_mat(_names, _state['r'], _state['m'])
+		elif _to == 'b': _state['b'] = r_to_bash(_names, _state['r'], _state['b'])
+	elif _from == 'm':
+		if _to == 'p': mat_to_py(_names, _state['m'])
+		elif _to == 'r': _state['r'] = mat_to_r(_names, _state['m'], _state['r'])
+		elif _to == 'b': _state['b'] = mat_to_bash(_names, _state['m'], _state['b'])
+	elif _from == 'b':
+		if _to == 'p': bash_to_py(_names, _state['b'])
+		elif _to == 'r': _state['r'] = bash_to_r(_names, _state['b'], _state['r'])
+		elif _to == 'm': _state['m'] = bash_to_mat(_names, _state['b'], _state['m'])
+
+def _run_python(_block : Block, _verbosity : int):
+	"""Run the Python code or @multilang function of @_block
+
+	Code runs in a namespace of multilang's builtins and the Python
+	variables, and what it defines is stored back in `_VARIABLES`.
+	Functions are added to multilang's builtins.
+	Runs the code object compiled with the script, so tracebacks show
+	lines of the script; see `Block.register`.
+	"""
+	# what it defines may fail later, from anywhere
+	_block.register()
+
+	if _block.kind == 'function':
+		_namespace = {}
+		_old = _quiet(_verbosity)
+		try:
+			exec(_block.compiled, globals(), _namespace)
+		finally:
+			sys.stdout = _old
+		globals().update({_block.names[0]: _namespace[_block.names[0]]})
+		return
+
+	_namespace = dict(globals())
+	_namespace.update(_VARIABLES)
+	_old = _quiet(_verbosity)
+	try:
+		exec(_block.compiled, _namespace)
+	finally:
+		sys.stdout = _old
+
+	_builtins = globals()
+	_VARIABLES.update({k: v for k, v in _namespace.items() if k[0] != '_' and (k not in _builtins or v is not _builtins[k])})
+
+def _run_r(_block : Block, _r_object : RObject, _verbosity : int):
+	"""Run the R code of @_block line by line"""
+	for _l in _block.code:
+		_r_object.sendline(_l)
+		_r_object.forget(assigned(_l, list(_r_object.manifest), 'r'))
+		if _verbosity > 0 and len(_r_object.before.split(_l)) > 1:
+			_temp = _r_object.before.split(_l)[1].strip()
+			if _temp: print(_temp)
+
+def _run_mat(_block : Block, _mat_object : MatlabObject, _verbosity : int):
+	"""Run the Matlab code of @_block line by line"""
+	_done = ''
+	for _l in _block.code:
+		# if command doesn't finish, matlab doesn't send anything in return
+		_mat_object.send(_l + '\n')
+		_mat_object.expect('\r\n')
+		_mat_object.forget(assigned(_l, list(_mat_object.manifest), 'm'))
+
+		if _l[-3:] == '...':
+			# if end with line continuation, nothing
+			continue
+
+		# look for balancing things to see if done
+		for i in _l:
+			if i in '([{':
+				_done += i
+			elif i in ')]}' and _done and _done[-1] == {')': '(', ']': '[', '}': '{'}[i]:
+				_done = _done[:-1]
+
+		if len(_done) == 0:
+			# if everything matches up, start over
+			_mat_object.expect('>>')
+			if _verbosity >= 1 and _mat_object.before != '':
+				# print if we're printing
+				print(_mat_object.before)
+
+def _run_bash(_block : Block, _environ : dict, _verbosity : int):
+	"""Run the bash code of @_block in one shell
+	Raises an error if the return code is not 0"""
+	subprocess.run('\n'.join(_block.code), shell=True, env={k:str(v) for k,v in _environ.items()},
+		executable='/bin/bash', stdout=open('/dev/null', 'w') if _verbosity == 0 else None).check_returncode()
+
+def _run_block(_block : Block, _state : dict, _verbosity : int):
+	"""Run one block of a MulProgram; see `as_multilang_unix`
+
+	Parameters
+	----------
+	_block : Block
+		The block to run
+	_state : dict
+		{'r': RObject, 'm': MatlabObject, 'b': dict} to run it in
+	_verbosity : int
+		How much to print
+	"""
+	if _block.kind == 'switch':
+		_switch(_block, _state, _verbosity)
+	elif _block.lang == 'p':
+		_run_python(_block, _verbosity)
+	elif _block.lang == 'r':
+		_run_r(_block, _state['r'], _verbosity)
+	elif _block.lang == 'm':
+		_run_mat(_block, _state['m'], _verbosity)
+	elif _block.lang == 'b':
+		_run_bash(_block, _state['b'], _verbosity)
+		_state['b'] = os.environ.copy()
+	else: # shouldn't get here ever
+		raise ValueError('Invalid definition of _lang, contact scvannost@gmail.com.')
+
+
+def _run_parallel(_program : MulProgram, _state : dict, _verbosity : int):
+	"""Run each block of @_program once the blocks it depends on are done
+	Blocks using different interpreters run at the same time, on threads;
+	see `MulProgram.dependencies` and `_run_block`"""
+	_dependencies = _program.dependencies()
+	_waiting, _done, _running = set(range(len(_program))), set(), {}
+
+	# at most one block per interpreter runs at once
+	with ThreadPoolExecutor(len(LANGUAGES)) as _pool:
+		while _waiting or _running:
+			for _i in sorted(_waiting):
+				if _done.issuperset(_dependencies[_i]):
+					_running[_pool.submit(_run_block, _program[_i], _state, _verbosity)] = _i
+					_waiting.discard(_i)
+
+			_finished, _ = wait(_running, return_when=FIRST_COMPLETED)
+			for _future in _finished:
+				_i = _running.pop(_future)
+				# raises what the block raised, once the others finish
+				_future.result()
+				_done.add(_i)
+
+
+def _take(_names : tuple, _lang : str, _state : dict):
+	"""Return the variables @_names from the environment of @_lang
+	without moving them; see `_run_memo`"""
+	if not _names:
+		return {}
+	_line = ', '.join(_names)
+	if _lang == 'r': return r_to_py(_line, _state['r'], _load=False) or {}
+	elif _lang == 'm': return mat_to_py(_line, _state['m'], _load=False) or {}
+	else: return bash_to_py(_line, _state['b'], _load=False) or {}
+
+def _give(_out : dict, _lang : str, _state : dict):
+	"""Load the variables @_out into the environment of @_lang
+	instead of moving them there from a replayed block; see `_run_memo`"""
+	if not _out:
+		return
+	if _lang == 'p': _VARIABLES.update(_out)
+	elif _lang == 'r': _state['r'] = to_r(_out, _state['r'])
+	elif _lang == 'm': _state['m'] = to_mat(_out, _state['m'])
+	else: _state['b'].update(_out)
+
+def _run_memo(_program : MulProgram, _state : dict, _memo : Memo, _verbosity : int):
+	"""Run @_program in order, replaying the blocks whose code and inputs
+	are unchanged since they were stored in @_memo; see `multilang.memo`"""
+	# what each language has been given and run so far, as a key
+	_history = {'p': '', 'r': '', 'm': '', 'b': ''}
+	# skipped blocks not run since, and what the last one gave
+	_skipped, _replayed = {'r': [], 'm': [], 'b': []}, {}
+	# the key of the block just run, stored once the switch to Python after it moves its outputs
+	_pending = None
+
+	for _i, _block in enumerate(_program):
+		if _block.kind == 'function':
+			# part of every key from here on
+			_history = {k: Memo.key(v, '\n'.join(_block.code)) for k, v in _history.items()}
+			_run_python(_block, _verbosity)
+
+		elif _block.kind == 'switch':
+			if _block.source == 'p':
+				# the Python variables named, including in as_array(...)
+				_sent = [fingerprint(_VARIABLES.get(t)) for t in re.findall(r'\w+', ', '.join(_block.names))]
+			else:
+				_sent = [_history[_block.source]]
+			if _block.lang != 'p':
+				# Python blocks are keyed on the variables themselves
+				_history[_block.lang] = Memo.key(_history[_block.lang], _block.source, ', '.join(_block.names), *_sent)
+
+			if _block.names and _skipped.get(_block.lang):
+				# run them before they can overwrite what is sent
+				for _b in _skipped[_block.lang]:
+					_run_block(_b, _state, _verbosity)
+				_skipped[_block.lang] = []
+				_replayed.pop(_block.lang, None)
+
+			if _block.source in _replayed:
+				# what the replayed block gave instead of what it would have made
+				if _verbosity >= 2: print('Switching to ' + LANGUAGES[_block.lang])
+				_give(_replayed.pop(_block.source), _block.lang, _state)
+			else:
+				_switch(_block, _state, _verbosity)
+				if _pending is not None:
+					# what the switch moved, rather than moving it twice
+					_memo.put(_pending, {k: _VARIABLES[k] for k in _block.names if k in _VARIABLES})
+					_pending = None
+
+		elif _block.lang == 'p':
+			_before = {k: fingerprint(v) for k, v in _VARIABLES.items() if k[0] != '_'}
+			_key = Memo.key('p', '\n'.join(_block.code), _history['p'], *[x for k in sorted(_before) for x in (k, _before[k])])
+			_out = _memo.get(_key)
+			if _out is not None:
+				if _verbosity >= 2: print('Replaying Python at line ' + str(_block.line))
+				_VARIABLES.update(_out)
+				continue
+
+			_run_python(_block, _verbosity)
+			_after = {k: fingerprint(v) for k, v in _VARIABLES.items() if k[0] != '_'}
+			_memo.put(_key, {k: _VARIABLES[k] for k, v in _after.items() if v is None or v != _before.get(k)})
+
+		else:
+			# what the switch right after takes out of this language
+			_next = _program[_i + 1] if _i + 1 < len(_program) else None
+			_names = _next.names if _next and _next.kind == 'switch' and _next.source == _block.lang else ()
+			_key = Memo.key(_block.lang, '\n'.join(_block.code), _history[_block.lang], ', '.join(_names))
+			_history[_block.lang] = _key
+			_out = _memo.get(_key)
+			if _out is not None:
+				if _verbosity >= 2: print('Replaying ' + LANGUAGES[_block.lang] + ' at line ' + str(_block.line))
+				_skipped[_block.lang].append(_block)
+				_replayed[_block.lang] = _out
+				continue
+
+			# this block may use what the skipped ones made
+			for _b in _skipped[_block.lang]:
+				_run_block(_b, _state, _verbosity)
+			_skipped[_block.lang] = []
+			_replayed.pop(_block.lang, None)
+
+			_run_block(_block, _state, _verbosity)
+			if _names and _next.lang == 'p':
+				_pending = _key
+			else:
+				_memo.put(_key, _take(_names, _block.lang, _state))
+
+
+def _run_checkpointed(_program : MulProgram, _state : dict, _checkpoint : Checkpoint, _resume : bool, _given : dict, _verbosity : int):
+	"""Run @_program in order, saving @_checkpoint after each switch
+	If @_resume, start after the last checkpoint; see `multilang.checkpoint`
+	The variables @_given to this run replace those restored"""
+	_start = 0
+	if _resume:
+		_start = _checkpoint.restore(_program, _VARIABLES, _state, _verbosity)
+		_VARIABLES.update(_given)
+	# @multilang functions are only in the blocks defining them
+	for _block in _program[:_start]:
+		if _block.kind == 'function':
+			_run_python(_block, _verbosity)
+
+	# the first checkpoint has the variables given
+	_changed = set('p')
+	for _i in range(_start, len(_program)):
+		_run_block(_program[_i], _state, _verbosity)
+		_changed.add(_program[_i].lang)
+		if _program[_i].kind == 'switch':
+			_checkpoint.save(_i + 1, _program, _VARIABLES, _state, _changed)
+			_changed = set()
+
+	# finished, so nothing to resume
+	_checkpoint.clear()
+
+
+
 # ---------------------------- Main Functions ---------------------------- #
 def as_multilang_windows(*args, **kwargs):
 	"""A simple interface for multilang coding on Windows.
@@ -1326,13 +1545,15 @@ def as_multilang_windows(*args, **kwargs):
 
 def as_multilang_unix(_lines, _load_r : bool = False, _r_object : RObject = None,
 			_mat_object : MatlabObject = None, _environ : dict = None,
-			_timeout : int = 600, _verbosity : int = 1, **kwargs):
+			_timeout : int = 600, _verbosity : int = 1, _parallel : bool = False,
+			_memo = False, _checkpoint_dir = None, _resume : bool = False, **kwargs):
 	"""Run a multilang script (implementation for Unix)
 
 	Parameters
 	----------
-	_lines : filelike, str, bytes, Iterable[str], Iterable[bytes]
+	_lines : MulProgram, filelike, str, bytes, Iterable[str], Iterable[bytes]
 		The script to be run
+		If MulProgram: an already parsed script; see `compile_mul`
 		If filelike: must have a `readlines` or `read` method
 		If str, bytes: lines separated by line breaks; eg. \\r\\n, \\r, \\n
 		if Iterable: each entry is a line; no line breaks
@@ -1367,6 +1588,27 @@ def as_multilang_unix(_lines, _load_r : bool = False, _r_object : RObject = None
 		If 2: plus when switching between environments
 		If 3: plus additional information
 
+	_parallel : bool
+		Whether to run blocks in different languages at the same time
+		when they don't depend on each other; see Parallel
+		Default: False
+
+	_memo : bool, str
+		Whether to replay blocks whose code and inputs are unchanged
+		instead of running them; see Memoization
+		If str: the directory to store the outputs of blocks in
+		If True: `__mulcache__` next to the script; see `multilang.memo.memo_dir`
+		Default: False
+
+	_checkpoint_dir : None, str, bool
+		Where to save the state of the run after each switch; see Checkpoints
+		If True: `__mulcache__` next to the script; see `multilang.checkpoint.checkpoint_dir`
+		Default: None, for no checkpoints
+
+	_resume : bool
+		Whether to start from the last checkpoint in @_checkpoint_dir
+		Default: False
+
 	**kwargs : dict[str:object]
 		Add as variables to the Python environment by calling `load`
 
@@ -1379,6 +1621,8 @@ def as_multilang_unix(_lines, _load_r : bool = False, _r_object : RObject = None
 	------
 	ValueError
 		If any multilang statement is improperly formatted
+		If more than one of @_parallel, @_memo, @_checkpoint_dir are given
+		If @_resume is given without @_checkpoint_dir
 	NameError
 		If any variable being passed doesn't exist
 	TypeError
@@ -1410,6 +1654,41 @@ def as_multilang_unix(_lines, _load_r : bool = False, _r_object : RObject = None
 	`print` only works in the Python and bash environments.
 	Outputs in R and Matlab are not currently captured.
 
+	Parallel
+	--------
+	With `_parallel`, each block starts as soon as the blocks it depends on
+	are done, so an R analysis and a Matlab analysis can run at once.
+	Blocks in the same language still run in order. A switch that brings
+	no variables, eg. `#! python ->`, does not wait for the language it
+	leaves, so the script can go on while that language works.
+	To also wait for languages that don't pass variables, such as one
+	that writes a file the next block reads, end the switch with
+	`after=<lang>[,<lang>]`, eg. `#! matlab -> a after=R`.
+	See `MulProgram.dependencies`.
+
+	Memoization
+	-----------
+	With `_memo`, what each block gives to the blocks after it is stored,
+	keyed on its code and the content of the variables it gets. Running
+	the script again replays a block with the same key instead of running
+	it, so after editing the last block only that block runs again.
+	A replayed R or Matlab block leaves nothing in its workspace, so it is
+	run after all if a later block in its language has to run, or before
+	a later switch sends variables to its language.
+	Files read and written are not tracked; see `multilang.memo`.
+	Blocks are run in order, so `_memo` can't be used with `_parallel`;
+	a replayed script already goes on from the first block that changed.
+
+	Checkpoints
+	-----------
+	With `_checkpoint_dir`, the Python variables, the bash environment, and
+	the R and Matlab workspaces are saved there after every switch. If the
+	run fails or is killed, run it again with `_resume` to restore the last
+	checkpoint and go on from there. The blocks after the checkpoint can be
+	changed before resuming, but not those before it. Variables given as
+	**kwargs replace those restored.
+	Python variables that can't be pickled are lost; see `multilang.checkpoint`.
+
 	Comments
 	--------
 	Line comments can be marked with either '#' or '%'
@@ -1452,427 +1731,42 @@ def as_multilang_unix(_lines, _load_r : bool = False, _r_object : RObject = None
 		[12]		return {var: np.array(obj)}
 	"""
 
-	# load the code
-	if hasattr(_lines, 'readlines'): # preferred utility
-		_file = _lines
-		_lines = __file.readlines()
-	elif hasattr(_lines, 'read'): # acceptable file usage
-		_file = _lines
-		_lines = _file.readlines()
-	elif type(_lines) is str and _lines[:2] not in ['#!','%!']: # file name
-		_fname = _lines
-		with open(_fname, 'r') as _file:
-			_lines = _file.readlines()
-	
-	# make sure is Iterable[str] without line breaks
-	if type(_lines) in [bytes, str]: # handle not lists
-		_lines = str(_lines).replace('\r\n','\n').replace('\r','\n').split('\n')
-	elif type(_lines[0]) is bytes: # if List[bytes]
-		_lines = [str(i) for i in _lines]
-	if type(_lines[0] is str): # if List[str]
-		_lines = [i.strip('\n') for i in _lines]
-
-	# format validation
-	while _lines[0][:2] not in ['#!','%!'] or 'multilang' not in _lines[0].lower():
-		# find the multilang call
-		_lines = _lines[1:]		
-	for _n, _i in enumerate(_lines[1:]):
-		if len(_i) > 2 and _i[:2] in ['#!', '%!']:
-			# check statements
-			_l = _i[2:].strip().replace(' ','').split('->')
-			if not any([i in _l[0].lower() for i in 'rpmb']) or len(_l) != 2:
-				raise ValueError('Improperly formatted call in line ' + str(_n+2))
-
-	# get the starting environment
-	_temp = _lines[0].split(' ')[-1].lower()
-	if 'multilang' in _temp or 'p' in _temp:
-		_lang = 'p'
-	elif 'r' in _temp:
-			_lang = 'r'
-	elif 'm' in _temp:
-		_lang = 'm'
-	elif 'b' in _temp and not 'matlab' in _temp:
-		# avoid b from matlab
-		_lang = 'b'
-	else:
-		raise ValueError('Unknown language was specified')
+	# before anything is started or set
+	if sum([bool(_parallel), bool(_memo), bool(_checkpoint_dir)]) > 1:
+		raise ValueError('Only one of _parallel, _memo, _checkpoint_dir can be used at once')
+	if _resume and not _checkpoint_dir:
+		raise ValueError('_resume needs a _checkpoint_dir to resume from')
+
+	# parse it once
+	_program = _lines if isinstance(_lines, MulProgram) else compile_mul(_lines)
 
 	# deal with loading kwargs
 	if kwargs: _VARIABLES.update(kwargs)
 
-	# defaults
+	# defaults; only start the environments the script uses
 	if not _environ: _environ = os.environ.copy()
-	if not _r_object: _r_object = RObject(load=_load_r, timeout=_timeout)
-	if not _mat_object: _mat_object = MatlabObject(timeout=_timeout)
+	if not _r_object: _r_object = RObject(connect='r' in _program.languages, load=_load_r, timeout=_timeout)
+	if not _mat_object: _mat_object = MatlabObject(connect='m' in _program.languages, timeout=_timeout)
 
 	# check in range
 	if _verbosity < 0: _verbosity = 0
 	elif _verbosity > 3: _verbosity = 3
 
-	# loop through code
-	# each endpoint increments counter and continues
-	if _verbosity >= 2: print('Starting in ' + ('Python' if _lang == 'p' else 'R' if _lang == 'r' else 'Matlab' if _lang == 'm' else 'bash'))
-	_counter = 1 # skip multilang declaration
-	while _counter < len(_lines):
-		_current_line = _lines[_counter].strip()
-		if _current_line in ['%{','#{']:
-			# block comment
-			_i = _counter+1
-			while _i < len(_lines) and _lines[_i].strip() not in ['%}','#}']:
-				_i += 1
-			_counter = _i+1
-			continue
-		elif not _current_line or (_current_line[0] in '#%' and _current_line[1] != '!'):
-			# line comment
-			_counter += 1
-			continue
-
-		# if currently in python
-		elif _lang == 'p':
-			if _current_line[:2] in ['#!','%!']: # if switching
-				if 'r' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to R')
-					_lang = 'r'
-					_r_object = py_to_r(_current_line, _r_object)
-				elif 'm' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to Matlab')
-					_lang = 'm'
-					_mat_object = py_to_mat(_current_line, _mat_object)
-				elif 'b' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to bash')
-					_lang = 'b'
-					_environ = py_to_bash(_current_line, _environ)
-				_counter += 1
-				continue
-			elif '@multilang' in _current_line and re.search(r'^def\s*[a-zA-Z_]+\s*\(.*?\)\s*:$', _lines[_counter+1].strip()):
-				# declaring function in the local space
-
-				# get the next line
-				_end = _counter + 1
-				_l = _lines[_end].strip(' ')
-				
-				# look for comments
-				_i = 0
-				_ignore = False
-				while _i < len(_l):
-					if _l[_i] in '\'"':
-						_ignore = not _ignore
-					elif not _ignore and (_l[_i] == '#' or (_l[_i] == '%' and _l[_i+1] != '=')):
-						break
-					_i += 1
-				_l = _l[:_i]
-
-				# get the function name
-				_name = _l.split('def ')[1].split('(')[0].strip()
-
-				# find the indent so we know when to stop
-				_search = re.search(r'\t+(?:.)', _l)
-				_tabs = _search.end() if _search and _search.end() > 0 else 0
-
-				# get the code
-				_to_exec = [_l[_tabs:]]
-				while _l and _l[:2] not in ['#!', '%!'] and _end < len(_lines)-1:
-					# get the line
-					_end += 1
-					_l = _lines[_end]
-
-					# get indentation
-					_search = re.search(r'[\t(?: {4})]+(?:.)', _l)
-					_curr_tabs = _search.end() if _search and _search.end() > 0 else 0
-
-					if _curr_tabs <= _tabs: # done!
-						break
-					elif _l and _l[0] not in '%#':
-						# ignore comments
-						_i = 0
-						_ignore = False
-						while _i < len(_l):
-							if _l[_i] in '\'"':
-								_ignore = not _ignore
-							elif not _ignore and (_l[_i] == '#' or (_l[_i] == '%' and _l[_i+1] != '=')):
-								break
-							_i += 1
-
-						# push it!
-						_to_exec.append(_l[:_i])
-
-				# define it and add it
-				if _verbosity == 0:
-					_old = sys.stdout
-					sys.stdout = None
-					try:
-						exec('\n'.join(_to_exec))
-					except Exception as e:
-						sys.stdout = _old
-						raise e
-					else:
-						sys.stdout = _old
-					del _old
-				else:
-					exec('\n'.join(_to_exec))
-
-				globals().update({_name: locals()[_name]})
-				_counter = _end
-				continue
-
-			elif '@multilang' in _current_line:
-				# skip if the next line isn't a `def`
-				_counter += 1
-				continue
-
-			else: # otherwise, do the thing
-				# make sure we're up to date
-				globals().update(_VARIABLES)
-				_end = _counter
-				_l = _lines[_end].strip(' ')
-
-				# remove comments
-				_i = 0
-				_ignore = False
-				while _i < len(_l):
-					if _l[_i] in '\'"':
-						# ignore comment markers in strings
-						_ignore = not _ignore
-					elif not _ignore and (_l[_i] == '#' or (_l[_i] == '%' and _l[_i+1] != '=')):
-						# if we're not in a string and it's a comment but not %=
-						break # stop before here
-					_i += 1
-				_l = _l[:_i]
-
-				# get the code to run
-				# have to build it up for exec
-				_to_exec = [_l] if _l and _l[0] not in '%#' else []
-				while _l and _l[:2] not in ['#!','%!'] and '@multilang' not in _l and _end < len(_lines)-1:
-					# stop at statements or local function declaration
-					_end += 1
-					_l = _lines[_end]
-					if _l and _l[0] not in '%#':
-						# ignore comments
-						_i = 0
-						_ignore = False
-						while _i < len(_l):
-							if _l[_i] in '\'"':
-								# ignore if in string
-								_ignore = not _ignore
-							elif not _ignore and (_l[_i] == '#' or (_l[_i] == '%' and _l[_i+1] != '=')):
-								break # stop before here
-							_i += 1
-
-						_to_exec.append(_l[:_i])
-
-				# define it and add it
-				if _verbosity == 0:
-					_old = sys.stdout
-					sys.stdout = None
-					try:
-						exec('\n'.join(_to_exec))
-					except Exception as e:
-						sys.stdout = _old
-						raise e
-					else:
-						sys.stdout = _old
-					del _old
-				else:
-					exec('\n'.join(_to_exec))
-
-				_VARIABLES.update({k:v for k,v in locals().items() if not k[0] is '_'})
-				_counter = _end+1 if _end == len(_lines)-1 else _end
-				continue
-
-		# if currently in bash
-		elif _lang == 'b':
-			if _current_line[:2] in ['#!', '%!']: # switching environments
-				if 'p' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to Python')
-					_lang = 'p'
-					mat_to_py(_current_line, _mat_object)
-				elif 'r' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to R')
-					_lang = 'r'
-					_r_object = mat_to_r(_current_line, _mat_object, _r_object)
-				elif 'm' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to Matlab')
-					_lang = 'm'
-					_mat_object = py_to_mat(_current_line, _mat_object)
-				_counter += 1
-				continue
-			else: # otherwise do the thing
-				# get the line
-				_end = _counter
-				_l = _lines[_end].strip(' ')
-
-				# remove comments
-				_i = 0
-				_ignore = False
-				while _i < len(_l):
-					if _l[_i] in '\'"':
-						# ignore comment markers in strings
-						_ignore = not _ignore
-					elif not _ignore and _l[_i] in '#%':
-						# if we're not in a string and it's a comment
-						break # stop before here
-					_i += 1
-				_l = _l[:_i]
-
-
-				# get the code to run
-				# have to bundle for subprocess.run
-				_to_exec = [_l] if _l and _l[0] not in '%#' else []
-				while _l and _l[:2] not in ['#!','%!'] and _end < len(_lines)-1:
-					_end += 1
-					_l = _lines[_end]
-					if _l and  _l[0] not in '%#':
-						# ignore comments
-						_i = 0
-						_ignore = False
-						while _i < len(_l):
-							if _l[_i] in '\'"':
-								_ignore = not _ignore
-							elif not _ignore and (_l[_i] in '#%'):
-								break
-							_i += 1
-
-						_to_exec.append(_l[:_i])
-
-				# run in terminal
-				# raises error if return code not 0
-				if _verbosity == 0: subprocess.run('\n'.join(_to_exec), shell=True, env={k:str(v) for k,v in _environ.items()}, executable='/bin/bash', stdout=open('/dev/null', 'w')).check_returncode()
-				else: subprocess.run('\n'.join(_to_exec), shell=True, env={k:str(v) for k,v in _environ.items()}, executable='/bin/bash').check_returncode()
-
-				# update and move on
-				_environ = os.environ.copy()
-				_counter = _end+1 if _end == len(_lines)-1 else _end
-				continue
-
-		# if currently in R
-		elif _lang == 'r':
-			if _current_line[:2] in ['#!','%!']: # switching environments
-				if 'p' in _current_line.lower().split('->')[0]: # if switching to Python
-					if _verbosity >= 2: print('Switching to Python')
-					_lang = 'p'
-					r_to_py(_current_line, _r_object)
-				elif 'm' in _current_line.lower().split('->')[0]: # if switching to Matlab
-					if _verbosity >= 2: print('Switching to Matlab')
-					_lang = 'm'
-					_mat_object = r_to_mat(_current_line, _r_object, _mat_object)
-				elif 'b' in _current_line.lower().split('->')[0]: # if switching to bash
-					if _verbosity >= 2: print('Switching to bash')
-					_lang = 'b'
-					_environ = r_to_bash(_line, _environ)
-				_counter += 1
-				continue
-			else: # otherwise do the thing
-				# go through the code
-				_end = _counter
-				while _end < len(_lines) and _lines[_end].strip()[:2] not in ['#!', '%!']:
-					_l = _lines[_end].strip()
-					if _l and _l[0] not in '#%':
-						# remove comments
-						_i = 0
-						_ignore = False
-						while _i < len(_l):
-							if _l[_i] in '\'"':
-								_ignore = not _ignore
-							elif not _ignore and (
-									_l[_i] == '#' or (
-										_l[_i] == '%' and 
-										# have to ignore all the %...% operators
-										not any([('%' + j + '%') in _l[_i:_i+10] for j in
-											['in','between', 'chin', '+', '+replace',':','do','dopar',
-											 '>','<>','T>','/', '*','o','x','*']
-										])
-									)
-								):
-								break
-							_i += 1
-
-						# do the thing
-						_r_object.sendline(_l[:_i])
-						if _verbosity > 0 and len(_r_object.before.split(_l[:_i])) > 1:
-							_temp = _r_object.before.split(_l[:_i])[1].strip()
-							if _temp: print(_temp)
-					_end += 1
-
-				# move on
-				_counter = _end
-				continue
-
-		# if currently in Matlab
-		elif _lang == 'm':
-			if _current_line[:2] == '#!': # switching environments
-				if 'p' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to Python')
-					_lang = 'p'
-					mat_to_py(_current_line, _mat_object)
-				elif 'r' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to R')
-					_lang = 'r'
-					_r_object = mat_to_r(_current_line, _mat_object, _r_object)
-				elif 'b' in _current_line.lower().split('->')[0]:
-					if _verbosity >= 2: print('Switching to bash')
-					_lang = 'b'
-					_environ = mat_to_bash(_line, _environ)
-				_counter += 1
-				continue
-			else: # otherwise do the thing
-				# go through the code
-				_end = _counter
-				_done = ''
-				while _end < len(_lines) and _lines[_end].strip()[:2] not in ['#!', '%!']:
-					_l = _lines[_end].strip()
-					if _l and  _l[0] not in '%#':
-						# skip comments
-						_i = 0
-						_ignore = False
-						while _i < len(_l):
-							if _l[_i] in '\'"':
-								_ignore = not _ignore
-							elif not _ignore and (_l[_i] in '#%'):
-								break
-							_i += 1
-
-						# do the thing
-						# if command doesn't finish, matlab doesn't send anything in return
-						_mat_object.send(_l[:_i] + '\n')
-						_mat_object.expect('\r\n')
-
-						if _l[-3:] == '...':
-							# if end with line continuation, nothing
-							continue
-
-						# look for balancing things to see if done
-						for i in _l:
-							if i in '([{':
-								_done += i
-							elif i in ')]}':
-								try:
-									if i == ')' and _done[-1] == '(':
-										_done = _done[:-1]
-									elif i == ']' and _done[-1] == '[':
-										_done = _done[:-1]
-									elif i == '}' and _done[-1] == '}':
-										_done = _done[-1]
-								except Exception:
-									pass
-
-						if len(_done) == 0:
-							# if everything matches up, start over
-							_mat_object.expect('>>')
-							if _verbosity >= 1 and _mat_object.before != '':
-								# print if we're printing
-								print(_mat_object.before)
-
-					_end += 1
-
-				# move on
-				_counter = _end
-				continue
-
-		else: # shouldn't get here ever
-			raise ValueError('Invalid definition of _lang, contact scvannost@gmail.com.')
+	# run it
+	if _verbosity >= 2: print('Starting in ' + LANGUAGES[_program.lang])
+	_state = {'r': _r_object, 'm': _mat_object, 'b': _environ}
+	if _parallel:
+		_run_parallel(_program, _state, _verbosity)
+	elif _memo:
+		_run_memo(_program, _state, Memo(_memo if isinstance(_memo, str) else memo_dir(_program.name)), _verbosity)
+	elif _checkpoint_dir:
+		_run_checkpointed(_program, _state, Checkpoint(_checkpoint_dir if isinstance(_checkpoint_dir, str) else checkpoint_dir(_program.name)), _resume, kwargs, _verbosity)
+	else:
+		for _block in _program:
+			_run_block(_block, _state, _verbosity)
 
 	# return
-	ret = Master(r_object = _r_object, mat_object = _mat_object, environ = _environ)
+	ret = Master(r_object = _state['r'], mat_object = _state['m'], environ = _state['b'])
 	ret.load_from_dict(_VARIABLES)
 	return ret
 
@@ -1946,6 +1840,12 @@ class Master:
 		Move variable(s) from R to bash
 	py_to_X
 		Move variable(s) from the Python variable dictionary to X
+
+	For X in [r, mat/m/matlab]:
+	fetch_X
+		Get part of a variable from X, subset in X
+	summarize_X
+		Get summaries of a variable, computed in X
 	dump_to_X
 		Move all variables from the Python variable dictionary to X
 	"""
@@ -2116,28 +2016,10 @@ class Master:
 		elif not self.isalive_mat: raise RuntimeError('mat_object not alive')
 
 		# get all the variables from R
-		names = self.who_r
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.r_object.sendline(random_name + '<- tempfile(); ' + random_name)
-		temp_file = str(self.r_object.before).split('"')[1]
-		self.r_object.sendlines([
-				'writeMat(paste(' + random_name + ',".mat", sep=""), ' + ', '.join([i + '=' + i for i in names]) + ')',
-				'rm(' + random_name + ')'
-			])
-		r = sio.loadmat(temp_file, squeeze_me=True)
-		del r['__globals__'], r['__header__'], r['__version__']
+		r = from_r(self.who_r, self.r_object)
 
 		# get all the variables from Matlab
-		names = self.who_mat
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.mat_object.sendline(random_name + ' = tempname')
-		temp_file = self.mat_object.before.split('\r\n\r\n')[2].strip()[1:-1]
-		self.mat_object.sendlines([
-				'save ' + temp_file + ' ' + ' '.join(names),
-				'clear ' + random_name
-			])
-		mat = sio.loadmat(temp_file, squeeze_me=True)
-		del mat['__globals__'], mat['__header__'], mat['__version__']
+		mat = from_mat(self.who_mat, self.mat_object)
 
 		if not precedence: # no repeats allowed
 			for i in r:
@@ -2210,33 +2092,16 @@ class Master:
 		code = code.replace('\r\n','\n').replace('\r','\n').split('\n')
 
 		end = 0
-		while end < len(code) and code[end].strip()[:2] not in ['#!', '%!']:
-			l = code[end].strip()
-			if l and l[0] not in '#%':
-				# remove comments
-				i = 0
-				ignore = False
-				while i < len(l):
-					if l[i] in '\'"':
-						ignore = not ignore
-					elif not ignore and (
-							l[i] == '#' or (
-								l[i] == '%' and 
-								# have to ignore all the %...% operators
-								any([('%' + j + '%') in _l[i:i+10] for j in
-									['in','between', 'chin', '+', '+replace',':','do','dopar',
-									 '>','<>','T>','/', '*','o','x','*']
-								])
-							)
-						):
-						break
-					i += 1
-
+		while end < len(code) and not _is_switch(code[end].strip()):
+			l = _uncomment(code[end].strip(), 'r').strip()
+			if l:
 				# do the thing
-				self.r_object.sendline(l[:i])
-				temp = self.r_object.before.split(l[:i])[1].strip()
-				if temp: print(temp)
-			_end += 1
+				self.r_object.sendline(l)
+				self.r_object.forget(assigned(l, list(self.r_object.manifest), 'r'))
+				if len(self.r_object.before.split(l)) > 1:
+					temp = self.r_object.before.split(l)[1].strip()
+					if temp: print(temp)
+			end += 1
 
 	def r_to_m(self, names):
 		"""See `r_to_mat`"""
@@ -2269,27 +2134,10 @@ class Master:
 		elif hasattr(names, '__iter__') and all([type(i) is str for i in names]): names = list(names)
 		else: raise ValueError('Unrecognized @names')
 
-		# check the variables
-		who = self.who_r
-		for i in names:
-			if i not in who:
-				raise NameError(str(i) + ' not in R environment')
-
-		# bundle them
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.r_object.sendline(random_name + '<- tempfile(); ' + random_name)
-		temp_file = str(self.r_object.before).split('"')[1]
+		# bundle and load them
+		move_r_to_mat(names, self.r_object, self.mat_object)
 
-		# get them
-		self.r_object.sendlines([
-				'writeMat(paste(' + random_name + ',".mat", sep=""), ' + ', '.join([i + '=' + i for i in names]) + ')',
-				'rm(' + random_name + ')'
-			])
-
-		# load them
-		self.mat_object.sendline('load \'' + temp_file + '\';')
-
-	def r_to_py(self, names, load : bool = True):
+	def r_to_py(self, names, load : bool = True, lazy : bool = False):
 		"""Move variables from R to Python
 		Use `globals().update(r_to_py(@names))` to add directly to local session
 
@@ -2301,11 +2149,17 @@ class Master:
 		load : bool
 			Whether to add to Python variable dict
 			Default: True
+		lazy : bool
+			Whether to return references that only fetch the data
+			when it is used instead of the data itself
+			See `multilang.refs`
+			Default: False
 
 		Returns
 		-------
 		dict[str: object]
 			The requested variables
+			As `RRef` if @lazy
 
 		Raises
 		------
@@ -2322,29 +2176,81 @@ class Master:
 		elif hasattr(names, '__iter__') and all([type(i) is str for i in names]): names = list(names)
 		else: raise ValueError('Unrecognized @names')
 
-		# check the variables
-		who = self.who_r
-		for i in names:
-			if i not in who:
-				raise NameError(str(i) + ' not in R environment')
-
-		# bundle them
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.r_object.sendline(random_name + '<- tempfile(); ' + random_name)
-		temp_file = str(self.r_object.before).split('"')[1]
-
-		# get them
-		self.r_object.sendlines([
-				'writeMat(' + random_name + ', ' + ', '.join([i + '=' + i for i in names]) + ')',
-				'rm(' + random_name + ')'
-			])
-
-		# load them and return
-		ret = sio.loadmat(temp_file, appendmat=False, squeeze_me=True)
-		del ret['__globals__'], ret['__header__'], ret['__version__']
+		# get them and return
+		ret = r_refs(names, self.r_object) if lazy else from_r(names, self.r_object)
 		if load: self._variables.update(ret)
 		return ret
 
+	def fetch_r(self, name : str, rows = None, cols = None):
+		"""Get part of an R variable
+		The subsetting is done in R, so only that part is sent
+
+		Parameters
+		----------
+		name : str
+			The name of the R variable
+		rows : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+			Which rows to get, as a 0-based Python index or names
+			Default: all of them
+		cols : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+			Which columns to get, as for @rows
+			Default: all of them
+
+		Returns
+		-------
+		object
+			The requested part of the variable
+
+		Raises
+		------
+		RuntimeError
+			If the R environment is not alive
+		NameError
+			If the variable is not in the R environment
+		IndexError
+			If an integer in @rows or @cols is out of range
+		"""
+		## input validation
+		if not self.isalive_r: raise RuntimeError('r_object not alive')
+		if name not in self.who_r: raise NameError(str(name) + ' not in R environment')
+
+		return fetch_r(name, self.r_object, rows, cols)
+
+	def summarize_r(self, name : str, ops = ('shape', 'sum', 'mean', 'min', 'max', 'nnz')):
+		"""Get summaries of an R variable
+		They are computed in R, so only the summaries are sent
+
+		Parameters
+		----------
+		name : str
+			The name of the R variable
+		ops : str, Iterable[str]
+			The summaries to compute, from 'shape', 'sum', 'mean', 'min',
+			'max', 'sd', 'nnz', 'nna', 'quantiles', 'colsums', 'colmeans',
+			'rowsums', 'rowmeans'; see `multilang.transfer.SUMMARIES`
+			If str: comma-separated
+			Default: shape, sum, mean, min, max, nnz
+
+		Returns
+		-------
+		dict[str, object]
+			{op: summary} for each of @ops
+
+		Raises
+		------
+		RuntimeError
+			If the R environment is not alive
+		NameError
+			If the variable is not in the R environment
+		ValueError
+			If unrecognized @ops
+		"""
+		## input validation
+		if not self.isalive_r: raise RuntimeError('r_object not alive')
+		if name not in self.who_r: raise NameError(str(name) + ' not in R environment')
+
+		return summarize_r(name, self.r_object, ops)
+
 	def r_to_bash(self, names):
 		"""Move variables from R to bash
 		Variables must be str,int,float
@@ -2430,24 +2336,15 @@ class Master:
 				temp = [as_array(i) for i in temp]
 			to_load = {k:v for d in temp for k,v in d.items()}
 
-		# bundle them
-		temp_file = NamedTemporaryFile(suffix='.mat')
-		sio.savemat(temp_file, to_load)
-		temp_file.seek(0)
+		# references into R only need copying there
+		to_load, alias = resolve(to_load, self.r_object)
+		alias = {k: v for k, v in alias.items() if k != v}
+		if alias:
+			self.r_object.sendline('; '.join([k + ' <- ' + v for k, v in alias.items()]))
+			self.r_object.forget(list(alias))
 
-		# load them
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.r_object.sendlines(
-			[
-				'library("R.matlab")',
-				random_name + ' <- readMat("' + temp_file.name + '")'
-			] + [
-				i.replace('_','.') + ' <- ' + random_name + '$' + i.replace('_','.')
-					for i in to_load.keys()
-			] + [
-				'rm(' + random_name + ')'
-			]
-		)
+		# bundle and load the ones R doesn't have
+		to_r(to_load, self.r_object)
 
 	def dump_r(self, load : bool = False):
 		"""Returns all the variables from the R environment
@@ -2537,42 +2434,26 @@ class Master:
 		# go through the code
 		end = 0
 		done = ''
-		while end < len(code) and code[end].strip()[:2] not in ['#!', '%!']:
-			l = code[end].strip()
-			if l and  l[0] not in '%#':
-				# skip comments
-				i = 0
-				ignore = False
-				while i < len(l):
-					if l[i] in '\'"':
-						ignore = not ignore
-					elif not ignore and (l[i] in '#%'):
-						break
-					i += 1
-
+		while end < len(code) and not _is_switch(code[end].strip()):
+			l = _uncomment(code[end].strip(), 'm').strip()
+			if l:
 				# do the thing
 				# if command doesn't finish, matlab doesn't send anything in return
-				self.mat_object.send(l[:i] + '\n')
+				self.mat_object.send(l + '\n')
 				self.mat_object.expect('\r\n')
+				self.mat_object.forget(assigned(l, list(self.mat_object.manifest), 'm'))
 
 				if l[-3:] == '...':
 					# if end with line continuation, nothing
+					end += 1
 					continue
 
 				# look for balancing things to see if done
 				for i in l:
 					if i in '([{':
 						done += i
-					elif i in ')]}':
-						try:
-							if i == ')' and done[-1] == '(':
-								done = _done[:-1]
-							elif i == ']' and done[-1] == '[':
-								done = _done[:-1]
-							elif i == '}' and done[-1] == '}':
-								done = done[-1]
-						except Exception:
-							pass
+					elif i in ')]}' and done and done[-1] == {')': '(', ']': '[', '}': '{'}[i]:
+						done = done[:-1]
 
 				if len(done) == 0:
 					# if everything matches up, start over and print
@@ -2612,34 +2493,8 @@ class Master:
 		elif hasattr(names, '__iter__') and all([type(i) is str for i in names]): names = list(names)
 		else: raise ValueError('Unrecognized @names')
 
-		# check the variables
-		who = self.who_mat
-		for i in names:
-			if i not in who:
-				raise NameError(str(i) + ' not in Matlab environment')
-
-		# bundle them
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.mat_object.sendline(random_name + ' = tempname')
-		temp_file = self.mat_object.before.split('\r\n\r\n')[2].strip()[1:-1]
-		self.mat_object.sendlines([
-				'save ' + temp_file + ' ' + ' '.join(names),
-				'clear ' + random_name
-			])
-
-		# load them
-		self.random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.r_object.sendlines(
-			[
-				'library("R.matlab")',
-				random_name + ' <- readMat("' + temp_file + '.mat")'
-			] + [
-				n + ' <- ' + random_name + '$' + n
-					for n in names
-			] + [
-				'rm(' + random_name + ')'
-			]
-		)
+		# bundle and load them
+		move_mat_to_r(names, self.mat_object, self.r_object)
 
 	def m_to_py(self, names):
 		"""See `mat_to_py`"""
@@ -2647,7 +2502,7 @@ class Master:
 	def matlab_to_py(self, names):
 		"""See `mat_to_py`"""
 		return self.mat_to_py(names)
-	def mat_to_py(self, names, load=True):
+	def mat_to_py(self, names, load=True, lazy : bool = False):
 		"""Move variables from Matlab to Python
 		Use `globals().update(mat_to_py(@names))` to add directly to local session
 
@@ -2659,11 +2514,17 @@ class Master:
 		load : bool
 			Whether to add to Python variable dict
 			Default: True
+		lazy : bool
+			Whether to return references that only fetch the data
+			when it is used instead of the data itself
+			See `multilang.refs`
+			Default: False
 
 		Returns
 		-------
 		dict[str: object]
 			The requested variables
+			As `MatRef` if @lazy
 
 		Raises
 		------
@@ -2680,29 +2541,88 @@ class Master:
 		elif hasattr(names, '__iter__') and all([type(i) is str for i in names]): names = list(names)
 		else: raise ValueError('Unrecognized @names')
 
-		# check the variables
-		who = self.who_mat
-		for i in names:
-			if i not in who:
-				raise NameError(str(i) + ' not in Matlab environment')
-
-		# bundle them
-		random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
-		self.mat_object.sendline(random_name + ' = tempname')
-		temp_file = self.mat_object.before.split('\r\n\r\n')[2].strip()[1:-1]
-
-		# get them
-		self.mat_object.sendlines([
-				'save ' + temp_file + ' ' + ' '.join(names),
-				'clear ' + random_name
-			])
-		
-		# load them and return
-		ret = sio.loadmat(temp_file, squeeze_me=True)
-		del ret['__globals__'], ret['__header__'], ret['__version__']
+		# get them and return
+		ret = mat_refs(names, self.mat_object) if lazy else from_mat(names, self.mat_object)
 		if load: self._variables.update(ret)
 		return ret
 
+	def fetch_m(self, name : str, rows = None, cols = None):
+		"""See `fetch_mat`"""
+		return self.fetch_mat(name, rows, cols)
+	def fetch_matlab(self, name : str, rows = None, cols = None):
+		"""See `fetch_mat`"""
+		return self.fetch_mat(name, rows, cols)
+	def fetch_mat(self, name : str, rows = None, cols = None):
+		"""Get part of a Matlab variable
+		The subsetting is done in Matlab, so only that part is sent
+
+		Parameters
+		----------
+		name : str
+			The name of the Matlab variable
+		rows : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+			Which rows to get, as a 0-based Python index or table variable names
+			Default: all of them
+		cols : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+			Which columns to get, as for @rows
+			Default: all of them
+
+		Returns
+		-------
+		object
+			The requested part of the variable
+
+		Raises
+		------
+		RuntimeError
+			If the Matlab environment is not alive
+		NameError
+			If the variable is not in the Matlab environment
+		"""
+		## input validation
+		if not self.isalive_mat: raise RuntimeError('mat_object is not alive')
+		if name not in self.who_mat: raise NameError(str(name) + ' not in Matlab environment')
+
+		return fetch_mat(name, self.mat_object, rows, cols)
+
+	def summarize_m(self, name : str, ops = ('shape', 'sum', 'mean', 'min', 'max', 'nnz')):
+		"""See `summarize_mat`"""
+		return self.summarize_mat(name, ops)
+	def summarize_matlab(self, name : str, ops = ('shape', 'sum', 'mean', 'min', 'max', 'nnz')):
+		"""See `summarize_mat`"""
+		return self.summarize_mat(name, ops)
+	def summarize_mat(self, name : str, ops = ('shape', 'sum', 'mean', 'min', 'max', 'nnz')):
+		"""Get summaries of a Matlab variable
+		They are computed in Matlab, so only the summaries are sent
+
+		Parameters
+		----------
+		name : str
+			The name of the Matlab variable
+		ops : str, Iterable[str]
+			The summaries to compute; see `summarize_r`
+			Default: shape, sum, mean, min, max, nnz
+
+		Returns
+		-------
+		dict[str, object]
+			{op: summary} for each of @ops
+
+		Raises
+		------
+		RuntimeError
+			If the Matlab environment is not alive
+		NameError
+			If the variable is not in the Matlab environment
+		ValueError
+			If unrecognized @ops
+		"""
+		## input validation
+		if not self.isalive_mat: raise RuntimeError('mat_object is not alive')
+		if name not in self.who_mat: raise NameError(str(name) + ' not in Matlab environment')
+
+		return summarize_mat(name, self.mat_object, ops)
+
 	def m_to_bash(self, names):
 		"""See `mat_to_bash`"""
 		self.mat_to_bash(names)
@@ -2800,13 +2720,15 @@ class Master:
 				temp = [as_array(i) for i in temp]
 			to_load = {k:v for d in temp for k,v in d.items()}
 
-		# bundle them
-		temp_file = NamedTemporaryFile(suffix='.mat')
-		sio.savemat(temp_file, {i: self._variables[i] for i in names})
-		temp_file.seek(0)
+		# bundle and load the ones Matlab doesn't have
+		# references into Matlab only need copying there
+		to_load, alias = resolve(to_load, self.mat_object)
+		alias = {k: v for k, v in alias.items() if k != v}
+		if alias:
+			self.mat_object.sendline(' '.join([k + ' = ' + v + ';' for k, v in alias.items()]))
+			self.mat_object.forget(list(alias))
 
-		# load them
-		self.mat_object.sendline('load \'' + temp_file.name + '\';')
+		to_mat(to_load, self.mat_object)
 
 	def dump_m(self, load : bool = False):
 		"""See `dump_mat`"""
@@ -2995,6 +2917,7 @@ class Master:
 					for k, v in out.items()
 			]
 		)
+		self._r_object.forget(out)
 
 	def bash_to_mat(self, names):
 		"""Move variables from bash to Matlab
@@ -3028,13 +2951,8 @@ class Master:
 			else:
 				out[i] = self._environ[i]
 		
-		# bundle them
-		temp_file = NamedTemporaryFile(suffix='.mat')
-		sio.savemat(temp_file, out)
-		temp_file.seek(0)
-
-		# load them
-		self._mat_object.sendlines('load \'' + temp_file.name + '\';')
+		# bundle and load them
+		to_mat(out, self._mat_object)
 
 
 
@@ -1,16 +1,80 @@
 
 import argparse
+import json
+import sys
 
-parser = argparse.ArgumentParser(prog='python -m multilang',description='Run code in Python/R/Matlab/bash')
+def _value(text):
+	"""A parameter value given on the command line: JSON if it is, else str"""
+	try:
+		return json.loads(text)
+	except ValueError:
+		return text
+
+if sys.argv[1:2] == ['sweep']:
+	parser = argparse.ArgumentParser(prog='python -m multilang sweep',description='Run a file once for each set of parameters, in worker processes')
+	parser.add_argument('file', help='the file name to run')
+	parser.add_argument('-g', '--grid', action='append', default=[], metavar='NAME=VALUE[,VALUE...]', help='the values to try for a parameter, passed as a Python variable; repeat for each parameter, every combination is run')
+	parser.add_argument('-j', '--workers', type=int, default=None, help='the number of worker processes; default the number of cores')
+	parser.add_argument('-o', '--outputs', default='', help='comma-separated Python variables to print after each run')
+	parser.add_argument('--no-shared', action='store_true', help='run the Python code at the start of the file in every run, even if it does not use the parameters')
+	parser.add_argument('-v', '--verbosity', nargs='?', default=0, type=int, choices=[0, 1, 2, 3], help='the level of things each run prints; default 0')
+	parser.add_argument('-t','--timeout', nargs='?', type=int, default=600, help='the number of seconds to wait for R or matlab to respond; default 600')
+
+	args = parser.parse_args(sys.argv[2:])
+	grid = {}
+	for g in args.grid:
+		if '=' not in g:
+			parser.error('--grid must be NAME=VALUE[,VALUE...], got ' + g)
+		grid[g.split('=', 1)[0].strip()] = [_value(v) for v in g.split('=', 1)[1].split(',')]
+
+	from multilang import sweep
+	outputs = [i for i in args.outputs.replace(' ', '').split(',') if i]
+	results = sweep(args.file, grid, workers=args.workers, outputs=outputs, timeout=args.timeout, verbosity=args.verbosity, shared=not args.no_shared)
+	for r in results:
+		params = ', '.join([k + '=' + repr(v) for k, v in r.params.items()])
+		if r.ok:
+			print(params + ': ok' + ''.join(['\n\t' + k + ' = ' + repr(v) for k, v in r.outputs.items()]))
+		else:
+			print(params + ': failed\n' + r.error, file=sys.stderr)
+	sys.exit(0 if all([r.ok for r in results]) else 1)
+
+if sys.argv[1:2] == ['run-many']:
+	parser = argparse.ArgumentParser(prog='python -m multilang run-many',description='Run many files, in worker processes that keep R and Matlab running between them')
+	parser.add_argument('files', nargs='+', help='the file names to run')
+	parser.add_argument('-j', '--jobs', type=int, default=None, help='the number of worker processes; default the number of cores')
+	parser.add_argument('-o', '--outputs', default='', help='comma-separated Python variables to print after each file')
+	parser.add_argument('-v', '--verbosity', nargs='?', default=0, type=int, choices=[0, 1, 2, 3], help='the level of things each file prints; default 0')
+	parser.add_argument('-t','--timeout', nargs='?', type=int, default=600, help='the number of seconds to wait for R or matlab to respond; default 600')
+
+	args = parser.parse_args(sys.argv[2:])
+
+	from multilang import run_many
+	outputs = [i for i in args.outputs.replace(' ', '').split(',') if i]
+	results = run_many(args.files, jobs=args.jobs, outputs=outputs, timeout=args.timeout, verbosity=args.verbosity)
+	for f, r in zip(args.files, results):
+		if r.ok:
+			print(f + ': ok' + ''.join(['\n\t' + k + ' = ' + repr(v) for k, v in r.outputs.items()]))
+		else:
+			print(f + ': failed\n' + r.error, file=sys.stderr)
+	sys.exit(0 if all([r.ok for r in results]) else 1)
+
+parser = argparse.ArgumentParser(prog='python -m multilang',description='Run code in Python/R/Matlab/bash',epilog='also: python -m multilang {sweep,run-many} --help')
 parser.add_argument('file', help='the file name to run')
 parser.add_argument('-v', '--verbosity', nargs='?', default=1, type=int, choices=[0, 1, 2, 3], help='the level of things to print;\n0 is silent, 1 is default, 2 also prints switching environments, 3 is max')
 parser.add_argument('-s', '--silent', action='store_true', help='same as `--verbosity 0`')
 parser.add_argument('-t','--timeout', nargs='?', type=int, default=600, help='the number of seconds to wait for R or matlab to respond; default 600')
+parser.add_argument('-p', '--parallel', action='store_true', help='run blocks in different languages at the same time when they do not depend on each other')
+parser.add_argument('-m', '--memo', nargs='?', const=True, default=False, metavar='DIR', help='replay blocks whose code and inputs are unchanged since the last run instead of running them; outputs are kept in DIR, default __mulcache__ next to the file')
+parser.add_argument('-c', '--checkpoint', nargs='?', const=True, default=None, metavar='DIR', help='save the state of the run in DIR after every switch between languages; default __mulcache__ next to the file')
+parser.add_argument('-r', '--resume', action='store_true', help='start from the last checkpoint of a failed run; implies --checkpoint')
 
 args = parser.parse_args()
 
 from multilang import as_multilang
 if args.silent:
 	args.verbosity = 0
+if args.resume and not args.checkpoint:
+	args.checkpoint = True
 
-as_multilang(args.file, _verbosity=args.verbosity, _timeout=args.timeout)
\ No newline at end of file
+as_multilang(args.file, _verbosity=args.verbosity, _timeout=args.timeout, _parallel=args.parallel, _memo=args.memo,
+	_checkpoint_dir=args.checkpoint, _resume=args.resume)
\ No newline at end of file
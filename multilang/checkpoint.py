@@ -0,0 +1,255 @@
+"""Checkpoints of long multilang runs
+
+With a checkpoint directory, the state of a run is saved there after
+every switch between languages: the Python variables, the bash
+environment, and snapshots of the R and Matlab workspaces. If the run
+fails or is killed, running the script again with `_resume` restores the
+last of them and goes on from the switch it was saved at, instead of
+from the first line. See Checkpoints in `multilang.as_multilang_unix`.
+
+Only what changed since the last checkpoint is saved again, so a switch
+from R to Matlab doesn't save the Python variables or the R workspace.
+R saves its workspace with `save.image` and loads it with `load`, and
+attaches again the packages that were attached with `library`; Matlab
+uses `save` and `load`. Python variables that can't be pickled, eg. open
+files or functions defined in the script, are not restored; @multilang
+functions are defined again by running their blocks.
+
+A checkpoint is only used if the blocks before it are the same as in the
+script being resumed, so the blocks after it can be fixed before
+resuming. It is deleted once the script finishes.
+
+Classes
+-------
+Checkpoint
+	The last saved state of a run
+
+Functions
+---------
+checkpoint_dir
+	Return where the checkpoints of a script are saved
+"""
+
+
+import glob
+import io
+import json
+import os
+import pickle
+
+from .memo import _Pickler, Memo
+
+
+# ------------------------------ Constants ------------------------------ #
+# the version of the checkpoint format; change it to ignore old ones
+_CHECKPOINT_MAGIC = 'mulk1'
+
+# the file naming the files of the last checkpoint
+_INDEX = 'checkpoint.pkl'
+
+# the files of each part of a checkpoint, by the number of blocks done
+_FILES = {'p': 'py.{}.pkl', 'r': 'r.{}.RData', 'm': 'mat.{}.mat'}
+
+
+
+# --------------------------- Helper Functions --------------------------- #
+def _prefix(_program, _n : int):
+	"""Return a key of the first @_n blocks of @_program"""
+	return Memo.key(*[repr((b.kind, b.lang, b.code, b.names, b.source if b.kind == 'switch' else None)) for b in _program[:_n]])
+
+def _dump_variables(_file : str, _variables : dict):
+	"""Pickle what can be of @_variables to @_file
+	Returns the names of those that can't be"""
+	_out, _lost = {}, []
+	for _k, _v in _variables.items():
+		_buffer = io.BytesIO()
+		try:
+			_Pickler(_buffer, protocol=4).dump(_v)
+		except Exception:
+			_lost.append(_k)
+			continue
+		_out[_k] = _buffer.getvalue()
+
+	with open(_file, 'wb') as _f:
+		pickle.dump(_out, _f, protocol=4)
+	return _lost
+
+def _load_variables(_file : str):
+	"""Return the variables pickled to @_file by `_dump_variables`"""
+	with open(_file, 'rb') as _f:
+		return {_k: pickle.loads(_v) for _k, _v in pickle.load(_f).items()}
+
+def checkpoint_dir(_name : str):
+	"""Return where the checkpoints of the script @_name are saved
+	Next to the script in `__mulcache__` like its MulProgram, or in the
+	working directory for scripts not read from a file
+
+	Parameters
+	----------
+	_name : str
+		The file the script came from, or '<string>'; see `MulProgram.name`
+
+	Returns
+	-------
+	str
+		The directory
+	"""
+	if not os.path.isfile(_name):
+		return os.path.join('__mulcache__', 'checkpoint')
+	_dir, _base = os.path.split(os.path.abspath(_name))
+	return os.path.join(_dir, '__mulcache__', _base + '.ckpt')
+
+
+
+# -------------------------------- Classes -------------------------------- #
+class Checkpoint:
+	"""The last saved state of a run
+	An index file in @path names the files holding each part of it
+
+	Attributes
+	----------
+	path : str
+		The directory the checkpoint is saved in
+
+	Functions
+	---------
+	save
+		Save the state of a run
+	restore
+		Load the last saved state of a run
+	clear
+		Delete the checkpoint
+	"""
+	def __init__(self, path : str):
+		"""Setup a Checkpoint
+
+		Parameters
+		----------
+		path : str
+			The directory to save the checkpoint in; made when first needed
+		"""
+		# R and Matlab may not be in the same working directory
+		self.path = os.path.abspath(path)
+		# the files of the last checkpoint, as {lang: file name}
+		self._files = {}
+		# the Python variables it couldn't save
+		self._lost = []
+		# the packages attached in R, most recent first
+		self._packages = []
+
+	def save(self, done : int, program, variables : dict, state : dict, changed):
+		"""Save the state of a run of @program after its first @done blocks
+
+		Parameters
+		----------
+		done : int
+			The number of blocks of @program that have been run
+		program : MulProgram
+			The script being run
+		variables : dict[str, object]
+			The Python variables; see `multilang._VARIABLES`
+		state : dict
+			{'r': RObject, 'm': MatlabObject, 'b': dict} being run in
+		changed : Iterable[str]
+			The languages whose variables may have changed since the last save
+
+		Raises
+		------
+		OSError
+			If the checkpoint can't be written
+		Exception
+			If R or Matlab can't save their workspace
+		"""
+		os.makedirs(self.path, exist_ok=True)
+		_files, _lost, _packages = dict(self._files), self._lost, self._packages
+		for _lang in changed:
+			if _lang not in _FILES or (_lang in 'rm' and not state[_lang].isalive):
+				continue
+			_files[_lang] = _FILES[_lang].format(done)
+			_file = os.path.join(self.path, _files[_lang])
+			if _lang == 'p':
+				_lost = _dump_variables(_file, variables)
+			elif _lang == 'r':
+				state['r'].sendline('save.image(file=' + json.dumps(_file) + '); writeLines(.packages(), ' + json.dumps(_file + '.packages') + ')')
+				# save.image only saves the global environment
+				try:
+					with open(_file + '.packages') as _f:
+						_packages = _f.read().split()
+				finally:
+					if os.path.exists(_file + '.packages'): os.remove(_file + '.packages')
+			else:
+				state['m'].sendline('save(\'' + _file.replace('\'', '\'\'') + '\');')
+
+		_index = os.path.join(self.path, _INDEX)
+		with open(_index + '.' + str(os.getpid()), 'wb') as _f:
+			pickle.dump({'magic': _CHECKPOINT_MAGIC, 'done': done, 'prefix': _prefix(program, done),
+				'files': _files, 'lost': _lost, 'packages': _packages, 'environ': dict(state['b'])}, _f, protocol=4)
+		# written whole, so the last checkpoint is always complete
+		os.replace(_index + '.' + str(os.getpid()), _index)
+		self._files, self._lost, self._packages = _files, _lost, _packages
+
+		# drop the parts no longer used
+		for _lang, _pattern in _FILES.items():
+			for _file in glob.glob(os.path.join(self.path, _pattern.format('*'))):
+				if os.path.basename(_file) != _files.get(_lang):
+					os.remove(_file)
+
+	def restore(self, program, variables : dict, state : dict, verbosity : int = 1):
+		"""Load the last saved state of a run of @program
+
+		Parameters
+		----------
+		program : MulProgram
+			The script being resumed
+		variables : dict[str, object]
+			The Python variables to update; see `multilang._VARIABLES`
+		state : dict
+			{'r': RObject, 'm': MatlabObject, 'b': dict} to load into
+			Updated with the restored bash environment
+		verbosity : int
+			Whether to print why nothing was restored, if nothing was
+			Default: 1
+
+		Returns
+		-------
+		int
+			The number of blocks of @program the checkpoint was saved after
+			0 if there is no checkpoint of @program
+		"""
+		try:
+			with open(os.path.join(self.path, _INDEX), 'rb') as _f:
+				_index = pickle.load(_f)
+		except (OSError, EOFError, pickle.UnpicklingError):
+			if verbosity >= 1: print('No checkpoint in ' + self.path + '; starting from the beginning')
+			return 0
+		if type(_index) is not dict or _index.get('magic') != _CHECKPOINT_MAGIC or _index['done'] > len(program) \
+				or _index['prefix'] != _prefix(program, _index['done']):
+			if verbosity >= 1: print('Checkpoint in ' + self.path + ' is of a different script; starting from the beginning')
+			return 0
+
+		_files = _index['files']
+		if 'p' in _files:
+			variables.update(_load_variables(os.path.join(self.path, _files['p'])))
+		if 'r' in _files:
+			if _index.get('packages'):
+				# attached in the same order, before what may need them is loaded
+				state['r'].sendline('for (p in rev(c(' + ', '.join([json.dumps(i) for i in _index['packages']]) + '))) library(p, character.only=TRUE)')
+			state['r'].sendline('load(' + json.dumps(os.path.join(self.path, _files['r'])) + ')')
+			state['r'].forget()
+		if 'm' in _files:
+			state['m'].sendline('load(\'' + os.path.join(self.path, _files['m']).replace('\'', '\'\'') + '\');')
+			state['m'].forget()
+		state['b'].update(_index['environ'])
+		self._files, self._lost, self._packages = dict(_files), list(_index['lost']), list(_index.get('packages', []))
+
+		if verbosity >= 1 and _index['lost']:
+			print('Could not restore ' + ', '.join(_index['lost']))
+		if verbosity >= 2: print('Resuming after block ' + str(_index['done']) + ' of ' + str(len(program)))
+		return _index['done']
+
+	def clear(self):
+		"""Delete the checkpoint"""
+		for _file in [_INDEX] + [_p.format('*') for _p in _FILES.values()]:
+			for _f in glob.glob(os.path.join(self.path, _file)):
+				os.remove(_f)
+		self._files, self._lost, self._packages = {}, [], []
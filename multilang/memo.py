@@ -0,0 +1,213 @@
+"""Replaying the blocks of a script whose code and inputs are unchanged
+
+With memoization on, each block of a script is keyed on its code and on
+the content of the variables it gets, and what it gives to the blocks
+after it is stored on disk under that key. When the script runs again,
+a block whose key is already stored is not run; what it gave is given
+again instead. So editing the last block of a long script only runs
+that block again. See Memoization in `multilang.as_multilang_unix`.
+
+Keys
+----
+A Python block gets all the Python variables, so its key has the
+content hash of each of them; see `multilang.transfer.content_hash`.
+It gives the variables it made or changed.
+An R, Matlab, or bash block gets what its language was given by the
+switches before it and what the blocks before it in that language
+did, so its key has the keys of those blocks and the content hashes
+of the Python variables sent. It gives the variables the switch right
+after it takes out of its language.
+The @multilang functions defined so far are part of every key.
+
+Only code and variables are compared, so a block that reads a file
+that has changed, or uses the time or random numbers without a seed,
+is still replayed. Anything a replayed block would have done besides
+giving variables, such as writing files or plotting, is not done.
+Blocks whose inputs can't be hashed or whose outputs can't be pickled
+are always run. Delete the directory of a Memo to forget everything.
+
+Classes
+-------
+Memo
+	The stored outputs of the blocks of scripts
+
+Functions
+---------
+fingerprint
+	Return a digest of the content of a variable
+memo_dir
+	Return where the outputs of the blocks of a script are stored
+"""
+
+
+import hashlib
+from importlib import import_module
+import io
+import os
+import pickle
+import types
+
+from .transfer import content_hash
+
+
+# ------------------------------ Constants ------------------------------ #
+# the version of the stored outputs; change it to ignore old ones
+_MEMO_MAGIC = b'mulm1'
+
+
+
+# --------------------------- Helper Functions --------------------------- #
+class _Pickler(pickle.Pickler):
+	"""Pickles modules by name, eg. `import numpy as np` in a block"""
+	def reducer_override(self, obj):
+		if isinstance(obj, types.ModuleType):
+			return import_module, (obj.__name__,)
+		return NotImplemented
+
+def fingerprint(_value):
+	"""Return a digest of the content of @_value
+	Modules are identified by name; see `multilang.transfer.content_hash`
+
+	Parameters
+	----------
+	_value : object
+		The value to fingerprint
+
+	Returns
+	-------
+	str, None
+		The digest
+		None if @_value cannot be hashed
+	"""
+	if isinstance(_value, types.ModuleType):
+		return 'module:' + _value.__name__
+	return content_hash(_value)
+
+def memo_dir(_name : str):
+	"""Return where the outputs of the blocks of the script @_name are stored
+	Next to the script in `__mulcache__` like its MulProgram, or in the
+	working directory for scripts not read from a file
+
+	Parameters
+	----------
+	_name : str
+		The file the script came from, or '<string>'; see `MulProgram.name`
+
+	Returns
+	-------
+	str
+		The directory
+	"""
+	if not os.path.isfile(_name):
+		return os.path.join('__mulcache__', 'memo')
+	_dir, _base = os.path.split(os.path.abspath(_name))
+	return os.path.join(_dir, '__mulcache__', _base + '.memo')
+
+
+
+# -------------------------------- Classes -------------------------------- #
+class Memo:
+	"""The stored outputs of the blocks of scripts
+	One file per block in @path, named by the key of the block
+
+	Attributes
+	----------
+	path : str
+		The directory the outputs are stored in
+
+	Functions
+	---------
+	key
+		Combine the parts of a key
+	get
+		Return the outputs stored under a key
+	put
+		Store outputs under a key
+	"""
+	def __init__(self, path : str):
+		"""Setup a Memo
+
+		Parameters
+		----------
+		path : str
+			The directory to store the outputs in; made when first needed
+		"""
+		self.path = path
+
+	@staticmethod
+	def key(*parts):
+		"""Return the key combining @parts, or None if any of them is None
+
+		Parameters
+		----------
+		*parts : str, None
+			The code and digests that identify a block
+
+		Returns
+		-------
+		str, None
+			The key
+			None if the block can't be identified, so is not stored
+		"""
+		if any([p is None for p in parts]):
+			return None
+		_h = hashlib.blake2b(_MEMO_MAGIC, digest_size=20)
+		for _p in parts:
+			_p = _p.encode()
+			# lengths first, so the parts can't run into each other
+			_h.update(str(len(_p)).encode() + b':' + _p)
+		return _h.hexdigest()
+
+	def get(self, key : str):
+		"""Return the outputs stored under @key
+
+		Parameters
+		----------
+		key : str, None
+			The key of the block; see `key`
+
+		Returns
+		-------
+		dict[str, object], None
+			The variables the block gave as {name: value}
+			None if nothing readable is stored under @key
+		"""
+		if key is None:
+			return None
+		try:
+			with open(os.path.join(self.path, key + '.pkl'), 'rb') as _f:
+				return pickle.load(_f)
+		except Exception:
+			# never stored, or stored by something that's changed since
+			return None
+
+	def put(self, key : str, outputs : dict):
+		"""Store @outputs under @key
+		Does nothing if @key is None or @outputs can't be pickled
+
+		Parameters
+		----------
+		key : str, None
+			The key of the block; see `key`
+		outputs : dict[str, object]
+			The variables the block gave as {name: value}
+		"""
+		if key is None:
+			return
+		_buffer = io.BytesIO()
+		try:
+			_Pickler(_buffer, protocol=4).dump(outputs)
+		except Exception:
+			# eg. functions defined in the script; always run the block
+			return
+
+		_file = os.path.join(self.path, key + '.pkl')
+		try:
+			os.makedirs(self.path, exist_ok=True)
+			# written whole, so other runs never read half a file
+			with open(_file + '.' + str(os.getpid()), 'wb') as _f:
+				_f.write(_buffer.getbuffer())
+			os.replace(_file + '.' + str(os.getpid()), _file)
+		except OSError:
+			# can't write there, so don't store
+			pass
@@ -16,6 +16,8 @@ MatlabObject
 
 import pexpect
 
+from .transfer import R_SETUP
+
 
 class RObject:
 	"""A simple class that allows for R scripting
@@ -28,6 +30,8 @@ class RObject:
 		The text just produced by the CLI
 	who
 		A list of the variable names in the R environment
+	manifest
+		The content hashes of variables sent from Python
 	
 	Functions
 	---------
@@ -45,6 +49,10 @@ class RObject:
 		Send multiple lines to the R environment's CLI
 	expect
 		Wait for the CLI to say a phrase
+	forget
+		Drop variables from the manifest
+	reset
+		Remove all variables, keeping the environment running
 	"""
 
 	def __init__(self, connect : bool = True, load : bool = False, timeout : int = 600):
@@ -64,6 +72,7 @@ class RObject:
 			Default: 600
 		"""
 		self._r_object = None
+		self._manifest = {}
 		if connect: self.connect(load, timeout)
 
 	def connect(self, load : bool = False, timeout : int = 600):
@@ -89,9 +98,11 @@ class RObject:
 				self._r_object = pexpect.spawn('R --no-restore', timeout=timeout)
 			except pexpect.ExceptionPexpct:
 				raise OSError('R not accessible by the command: `$ R --no-restore\nIf `$ R` should work, try with load = True`')
+		self._manifest = {}
 		self.expect('\r\n>')
 		self._r_object.sendline('library("R.matlab")')
 		self.expect('\r\n>')
+		self.sendlines(R_SETUP)
 
 	def send(self, line : str):
 		"""Send bare text to the R command-line interface
@@ -243,6 +254,7 @@ class RObject:
 					'q(save="'+ ('yes' if save else 'no') + '", runLast=' + ('TRUE' if runLast else 'FALSE') + ')'
 				)
 		self._r_object = None
+		self._manifest = {}
 
 	def reconnect(self, force : bool = False, load : bool = False, save : bool = False, runLast : bool = True):
 		"""Reconnects to the R environment
@@ -266,6 +278,27 @@ class RObject:
 		elif self.isalive: self.close(save, runLast)
 		self.connect(load)
 
+	def forget(self, names = None):
+		"""Drop variables from the manifest so they are sent again
+
+		Parameters
+		----------
+		names : None, str, Iterable[str]
+			The variable name(s) to drop
+			If None: drop everything
+			Default: None
+		"""
+		if names is None: self._manifest = {}
+		elif type(names) is str: self._manifest.pop(names, None)
+		else:
+			for i in names: self._manifest.pop(i, None)
+
+	def reset(self):
+		"""Remove all variables from the R environment, keeping it running
+		Loaded packages and multilang's helpers are kept"""
+		self.sendline('rm(list=ls(envir=globalenv(), all.names=TRUE), envir=globalenv())')
+		self.forget()
+
 	@property
 	def isalive(self):
 		"""Whether is alive"""
@@ -289,6 +322,12 @@ class RObject:
 		ret = self.before.replace('\r\n','').split('"')
 		return ret[1::2]
 
+	@property
+	def manifest(self):
+		"""The content hashes of the variables last sent from Python
+		As {name: (hash, rows)}; see `multilang.transfer`"""
+		return self._manifest
+
 
 class MatlabObject:
 	"""A simple class that allows for Matlab scripting
@@ -301,6 +340,8 @@ class MatlabObject:
 		The text just produced by the CLI
 	who
 		A list of the variable names in the Matlab environment
+	manifest
+		The content hashes of variables sent from Python
 	
 	Functions
 	---------
@@ -318,6 +359,10 @@ class MatlabObject:
 		Send multiple lines to the Matlab environment's CLI
 	expect
 		Wait for the CLI to say a phrase
+	forget
+		Drop variables from the manifest
+	reset
+		Remove all variables, keeping the environment running
 	"""
 	def __init__(self, connect = True, timeout : int = 600):
 		"""Setup an MatlabObject
@@ -333,6 +378,7 @@ class MatlabObject:
 			Default: 600
 		"""
 		self._mat_object = None
+		self._manifest = {}
 		if connect: self.connect(timeout)
 
 	def connect(self, timeout : int = 600):
@@ -350,6 +396,7 @@ class MatlabObject:
 			self._mat_object = pexpect.spawn('matlab -nojvm -nodisplay -nosplash', timeout=timeout)
 		except pexpect.ExceptionPexpct:
 			raise OSError('Matlab not accessible by the command: `$ matlab -nojvm -nodisplay -nosplash`')
+		self._manifest = {}
 		self.expect('>>')
 
 	def send(self, line):
@@ -483,6 +530,7 @@ class MatlabObject:
 		"""
 		if self.isalive: self._mat_object.sendline('exit' + (' force' if force else ''))
 		self._mat_object = None
+		self._manifest = {}
 
 	def reconnect(self, force = False):
 		"""Reconnects to the Matlab environment
@@ -498,6 +546,26 @@ class MatlabObject:
 		elif self.isalive: self.close()
 		self.connect()
 
+	def forget(self, names = None):
+		"""Drop variables from the manifest so they are sent again
+
+		Parameters
+		----------
+		names : None, str, Iterable[str]
+			The variable name(s) to drop
+			If None: drop everything
+			Default: None
+		"""
+		if names is None: self._manifest = {}
+		elif type(names) is str: self._manifest.pop(names, None)
+		else:
+			for i in names: self._manifest.pop(i, None)
+
+	def reset(self):
+		"""Remove all variables from the Matlab environment, keeping it running"""
+		self.sendline('clear;')
+		self.forget()
+
 	@property
 	def isalive(self):
 		"""Whether is alive"""
@@ -519,4 +587,10 @@ class MatlabObject:
 		if not self.isalive: return []
 		self.sendline('who')
 		ret = self.before.split('\r\n\r\n')[2].strip().replace('\r\n','')
-		return [i.strip() for i in ret.split(' ') if i]
\ No newline at end of file
+		return [i.strip() for i in ret.split(' ') if i]
+
+	@property
+	def manifest(self):
+		"""The content hashes of the variables last sent from Python
+		As {name: (hash, rows)}; see `multilang.transfer`"""
+		return self._manifest
\ No newline at end of file
@@ -0,0 +1,570 @@
+"""Compiled multilang scripts
+
+A script is parsed once into a MulProgram: an immutable sequence of typed
+blocks, each holding the code of one stretch of one language with its
+comments already removed, the @multilang functions it defines, and the
+switches between languages with the variables they bring.
+Running a script runs its MulProgram, so a program can be inspected,
+and run many times without parsing the script again; see `compile_mul`.
+The code of Python blocks is compiled once, when the script is parsed,
+as '<file.mul:line>' with the line numbers it has in the script, so
+tracebacks point into the script; see `Block.filename`.
+
+Cache
+-----
+Like .pyc files, the MulProgram of a script read from a file is cached in
+a `__mulcache__` directory next to it, with the code objects of its
+Python blocks. It is used as long as the file has the same path and
+mtime, or the same content, so running a script again skips parsing
+and comment stripping. Set `multilang.program.CACHE` to False to
+neither read nor write the cache.
+
+Classes
+-------
+Block
+	One step of a MulProgram
+MulProgram
+	A parsed multilang script
+
+Functions
+---------
+compile_mul
+	Parse a multilang script into a MulProgram
+"""
+
+
+import ast
+from collections import namedtuple
+from functools import lru_cache
+import hashlib
+from importlib.util import MAGIC_NUMBER
+import linecache
+import marshal
+import os
+import re
+import textwrap
+
+
+# ------------------------------ Constants ------------------------------ #
+# whether scripts read from files are cached in __mulcache__
+CACHE = True
+
+# the version of the cache and of the Python that compiled the code in it
+_CACHE_MAGIC = 'mulc3-' + MAGIC_NUMBER.hex()
+
+# the full names of the languages
+LANGUAGES = {'p': 'Python', 'r': 'R', 'm': 'Matlab', 'b': 'bash'}
+
+# the languages a switch from each can go to, in the order they are checked
+_TARGETS = {'p': 'rmb', 'r': 'pmb', 'm': 'prb', 'b': 'prm'}
+
+# R's %...% operators, which are not comments; '' is %%, the remainder
+_R_OPERATORS = ['in','between', 'chin', '+', '+replace',':','do','dopar',
+	'>','<>','T>','/', '*','o','x','']
+
+# the code on a line before its comment in each language: runs of anything
+# but quotes and comment markers, strings with their escapes, and what isn't
+# a comment though it has a marker; strings left open run to the end
+_CODE = {
+	'p': re.compile(r'''(?:[^'"#%]+|'(?:\\.|[^'\\])*'?|"(?:\\.|[^"\\])*"?|%=)*'''),
+	'r': re.compile(r'''(?:[^'"#%]+|'(?:\\.|[^'\\])*'?|"(?:\\.|[^"\\])*"?|%(?:'''
+		+ '|'.join(sorted(set([re.escape(i) for i in _R_OPERATORS]), key=len, reverse=True)) + r''')%)*'''),
+	# a quote right after a name or closing bracket is a transpose
+	'm': re.compile(r'''(?:[^'"#%]+|(?<=[\w)\]}.'])'|'(?:''|[^'])*'?|"(?:""|[^"])*"?)*'''),
+	# ${...} can have '#' and '%', eg. ${#files[@]} or ${name%.mul}
+	'b': re.compile(r'''(?:[^'"#%$]+|'[^']*'?|"(?:\\.|[^"\\])*"?|\$\{[^}]*\}?|\$#?)*'''),
+}
+
+# what can end a switch: after=<lang>[,<lang>]; see MulProgram.dependencies
+_AFTER = re.compile(r'\s+after\s*=\s*([\w\s,]+)$', re.IGNORECASE)
+
+# the declaration a @multilang line must be followed by
+_DEF = re.compile(r'^def\s*([a-zA-Z_]+)\s*\(.*?\)\s*:$')
+
+# Python names that can read any variable; see MulProgram.split
+_DYNAMIC = ['_VARIABLES', 'globals', 'locals', 'vars', 'eval', 'exec']
+
+
+
+# --------------------------- Helper Functions --------------------------- #
+def _read(_lines):
+	"""Return the lines of a script and the name of its file
+
+	Parameters
+	----------
+	_lines : filelike, str, bytes, Iterable[str], Iterable[bytes]
+		The script; see `compile_mul`
+
+	Returns
+	-------
+	list[str]
+		The lines of the script, without line breaks
+	str
+		The name of the file it came from, or '<string>'
+	"""
+	_name = getattr(_lines, 'name', '<string>')
+	if hasattr(_lines, 'readlines'): # preferred utility
+		_lines = _lines.readlines()
+	elif hasattr(_lines, 'read'): # acceptable file usage
+		_lines = _lines.read()
+	elif type(_lines) is str and _lines[:2] not in ['#!','%!']: # file name
+		_name = _lines
+		with open(_name, 'r') as _file:
+			_lines = _file.readlines()
+
+	# make sure is Iterable[str] without line breaks
+	if type(_lines) is bytes:
+		_lines = _lines.decode()
+	if type(_lines) is str: # handle not lists
+		_lines = _lines.replace('\r\n','\n').replace('\r','\n').split('\n')
+	return [(i.decode() if type(i) is bytes else i).rstrip('\r\n') for i in _lines], _name
+
+def _uncomment(_line : str, _lang : str):
+	"""Return @_line without its comment in @_lang in ['p', 'r', 'm', 'b']
+
+	Comments start at '#' or '%' outside of strings, except for Python's
+	'%=', R's %...% operators, and bash's ${...}; see `_CODE`."""
+	return _line[:_CODE[_lang].match(_line).end()]
+
+def _is_switch(_line : str):
+	"""Whether the stripped @_line switches languages"""
+	return _line[:2] in ['#!', '%!']
+
+def _target(_line : str, _lang : str):
+	"""Return the language the switch @_line goes to from @_lang
+	None if it stays in @_lang"""
+	_head = _line.lower().split('->')[0]
+	for _t in _TARGETS[_lang]:
+		if _t in _head:
+			return _t
+	return None
+
+def _start(_line : str):
+	"""Return the language the declaration @_line starts in"""
+	_temp = _line.split(' ')[-1].lower()
+	if 'multilang' in _temp or 'p' in _temp:
+		return 'p'
+	elif 'r' in _temp:
+		return 'r'
+	elif 'm' in _temp:
+		return 'm'
+	elif 'b' in _temp and not 'matlab' in _temp:
+		# avoid b from matlab
+		return 'b'
+	raise ValueError('Unknown language was specified')
+
+def _language(_name : str):
+	"""Return the language named @_name, as in an after= annotation"""
+	_name = _name.strip().lower()
+	if 'p' in _name: return 'p'
+	elif 'r' in _name: return 'r'
+	elif 'm' in _name: return 'm'
+	elif 'b' in _name: return 'b'
+	raise ValueError('Unknown language in after=: ' + _name)
+
+def _indent(_line : str):
+	"""Return the width of the indentation of @_line"""
+	return len(_line) - len(_line.lstrip())
+
+def _code(_kind : str, _lang : str, _pending : list, _name : str, _names : tuple = ()):
+	"""Return a Block of the [(line number, code)] @_pending in the script @_name
+	Python code is dedented as a whole and compiled; other languages have
+	no indentation"""
+	while _pending and not _pending[-1][1].strip():
+		_pending = _pending[:-1]
+	_lines = tuple([_n for _n, _ in _pending])
+	_code = [_l for _, _l in _pending]
+	if _lang != 'p':
+		return Block(_kind, _lang, _lines[0], tuple(_code), _lines, None, _names, (), None)
+
+	_block = Block(_kind, _lang, _lines[0], tuple(textwrap.dedent('\n'.join(_code)).split('\n')), _lines, _name, _names, (), None)
+	return _block._replace(compiled=compile(''.join(_block.source_lines()), _block.filename, 'exec'))
+
+@lru_cache(maxsize=64)
+def _compile(_lines : tuple, _name : str):
+	"""Parse @_lines; see `compile_mul`"""
+	# find the multilang call
+	_n = 0
+	while _n < len(_lines) and (not _is_switch(_lines[_n]) or 'multilang' not in _lines[_n].lower()):
+		_n += 1
+	if _n == len(_lines):
+		raise ValueError('No `#! multilang` declaration found')
+
+	# check statements
+	for _i in range(_n + 1, len(_lines)):
+		if len(_lines[_i]) > 2 and _is_switch(_lines[_i]):
+			_l = _lines[_i][2:].strip().replace(' ','').split('->')
+			if not any([i in _l[0].lower() for i in 'rpmb']) or len(_l) != 2:
+				raise ValueError('Improperly formatted call in line ' + str(_i + 1))
+
+	_lang = _first = _start(_lines[_n])
+	_blocks, _pending = [], []
+	_i = _n + 1
+	while _i < len(_lines):
+		_line = _lines[_i]
+		_current_line = _line.strip()
+
+		if _current_line in ['%{','#{']:
+			# block comment
+			if _pending and _lang == 'p': _pending.append((_i + 1, ''))
+			_i += 1
+			while _i < len(_lines) and _lines[_i].strip() not in ['%}','#}']:
+				_i += 1
+			_i += 1
+			continue
+
+		elif _is_switch(_current_line):
+			if _pending: _blocks.append(_code('code', _lang, _pending, _name))
+			_pending = []
+
+			_to = _target(_current_line, _lang)
+			if _to:
+				_tail = _current_line.split('->', 1)[1]
+				_after = _AFTER.search(_tail)
+				if _after: _tail = _tail[:_after.start()]
+				_names = tuple([i for i in _tail.replace(' ','').split(',') if i])
+				_after = tuple([_language(i) for i in _after.group(1).split(',')]) if _after else ()
+				_blocks.append(Block('switch', _to, _i + 1, (), (), _lang, _names, _after, None))
+				_lang = _to
+			_i += 1
+			continue
+
+		elif not _current_line or _current_line[0] in '#%':
+			# line comment
+			if _pending and _lang == 'p': _pending.append((_i + 1, ''))
+			_i += 1
+			continue
+
+		elif _lang == 'p' and '@multilang' in _current_line:
+			_def = _uncomment(_lines[_i+1], 'p').strip() if _i + 1 < len(_lines) else ''
+			if not _DEF.search(_def):
+				# skip if the next line isn't a `def`
+				_i += 1
+				continue
+
+			if _pending: _blocks.append(_code('code', _lang, _pending, _name))
+			_pending = [(_i + 2, _uncomment(_lines[_i+1], 'p').rstrip())]
+
+			# the body is everything indented past the `def`
+			_tabs = _indent(_lines[_i+1])
+			_i += 2
+			while _i < len(_lines) and not _is_switch(_lines[_i].strip()) and (not _lines[_i].strip() or _indent(_lines[_i]) > _tabs):
+				_l = _lines[_i].strip()
+				_pending.append((_i + 1, '' if not _l or _l[0] in '#%' else _uncomment(_lines[_i], 'p').rstrip()))
+				_i += 1
+
+			_blocks.append(_code('function', 'p', _pending, _name, (_DEF.search(_def).group(1),)))
+			_pending = []
+			continue
+
+		# otherwise it's code
+		if _lang == 'p':
+			_pending.append((_i + 1, _uncomment(_line, 'p').rstrip()))
+		elif _uncomment(_current_line, _lang).strip():
+			_pending.append((_i + 1, _uncomment(_current_line, _lang).strip()))
+		_i += 1
+
+	if _pending: _blocks.append(_code('code', _lang, _pending, _name))
+	return MulProgram(_name, _first, tuple(_blocks))
+
+def _uses(_node, _names):
+	"""Whether the Python statement @_node may use any of @_names
+	Mentioning one by name or as a str counts, as does anything in _DYNAMIC"""
+	for _n in ast.walk(_node):
+		if isinstance(_n, ast.Name) and (_n.id in _names or _n.id in _DYNAMIC):
+			return True
+		elif isinstance(_n, ast.Attribute) and _n.attr in _DYNAMIC:
+			return True
+		elif isinstance(_n, ast.Constant) and isinstance(_n.value, str) and _n.value in _names:
+			return True
+	return False
+
+def _cache_file(_path : str):
+	"""Return where the MulProgram of the script at @_path is cached"""
+	_dir, _base = os.path.split(os.path.abspath(_path))
+	return os.path.join(_dir, '__mulcache__', _base + '.mulc')
+
+def _load_cache(_path : str):
+	"""Return the cache entry of the script at @_path
+	(magic, path, mtime, size, digest, name, lang, blocks), or None"""
+	try:
+		with open(_cache_file(_path), 'rb') as _f:
+			_entry = marshal.load(_f)
+	except (OSError, EOFError, ValueError, TypeError):
+		return None
+	if type(_entry) is not tuple or len(_entry) != 8 or _entry[:2] != (_CACHE_MAGIC, os.path.abspath(_path)):
+		return None
+	return _entry
+
+def _save_cache(_path : str, _stat, _digest : str, _program):
+	"""Cache @_program as the script at @_path, as of @_stat"""
+	_entry = (_CACHE_MAGIC, os.path.abspath(_path), _stat.st_mtime_ns, _stat.st_size,
+		_digest, _program.name, _program.lang, tuple([tuple(b) for b in _program.blocks]))
+	_file = _cache_file(_path)
+	try:
+		os.makedirs(os.path.dirname(_file), exist_ok=True)
+		# written whole, so other runs never read half a file
+		with open(_file + '.' + str(os.getpid()), 'wb') as _f:
+			marshal.dump(_entry, _f)
+		os.replace(_file + '.' + str(os.getpid()), _file)
+	except OSError:
+		# can't write next to the script, so don't cache
+		pass
+
+def _compile_file(_path : str):
+	"""Parse the script at @_path, using and updating its cache; see `compile_mul`"""
+	_stat = os.stat(_path)
+	_entry = _load_cache(_path)
+	if _entry and _entry[2:4] == (_stat.st_mtime_ns, _stat.st_size):
+		# untouched
+		return MulProgram(_entry[5], _entry[6], [Block(*b) for b in _entry[7]])
+
+	with open(_path, 'rb') as _f:
+		_data = _f.read()
+	_digest = hashlib.sha256(_data).hexdigest()
+	if _entry and _entry[4] == _digest:
+		# touched but the same
+		_program = MulProgram(_entry[5], _entry[6], [Block(*b) for b in _entry[7]])
+	else:
+		_program = _compile(tuple(_read(_data)[0]), _path)
+	_save_cache(_path, _stat, _digest, _program)
+	return _program
+
+def _unmarshal(_data : bytes):
+	"""Return the MulProgram marshalled to @_data; see `MulProgram.__reduce__`"""
+	_name, _lang, _blocks = marshal.loads(_data)
+	return MulProgram(_name, _lang, [Block(*b) for b in _blocks])
+
+
+
+# -------------------------------- Classes -------------------------------- #
+class Block(namedtuple('Block', ['kind', 'lang', 'line', 'code', 'lines', 'source', 'names', 'after', 'compiled'])):
+	"""One step of a MulProgram
+
+	Attributes
+	----------
+	kind : str in ['code', 'function', 'switch']
+		'code' runs @code in @lang
+		'function' defines the @multilang function @names[0] in Python
+		'switch' switches from @source to @lang, bringing @names
+	lang : str in ['p', 'r', 'm', 'b']
+		The language of the block; see LANGUAGES
+	line : int
+		Where the block starts in the script, counting from 1
+	code : tuple[str]
+		The lines of code, without comments
+	lines : tuple[int]
+		The line in the script of each of @code
+	source : str, None
+		The language a switch comes from
+		or the name of the script a Python block comes from
+	names : tuple[str]
+		The variables a switch brings, as written in the script
+	after : tuple[str]
+		The languages a switch also waits for; see `MulProgram.dependencies`
+	compiled : code, None
+		The compiled @code of a Python block
+
+	Properties
+	----------
+	filename
+		The file name Python code is compiled as
+
+	Functions
+	---------
+	source_lines
+		The code of a Python block at its lines in the script
+	register
+		Show the code of a Python block in tracebacks
+	"""
+	__slots__ = ()
+
+	@property
+	def filename(self):
+		"""The file name Python code is compiled as: '<file.mul:line>'"""
+		return '<' + os.path.basename(str(self.source)).strip('<>') + ':' + str(self.line) + '>'
+
+	def source_lines(self):
+		"""Return the code of a Python block placed at its lines in the
+		script, with blank lines before and between, as for `linecache`"""
+		_out = ['\n'] * self.lines[-1]
+		for _n, _l in zip(self.lines, self.code):
+			_out[_n - 1] = _l + '\n'
+		return _out
+
+	def register(self):
+		"""Put the code of a Python block in `linecache` under `filename`
+		so that tracebacks show it"""
+		_lines = self.source_lines()
+		linecache.cache[self.filename] = (sum([len(i) for i in _lines]), None, _lines, self.filename)
+
+
+class MulProgram:
+	"""A parsed multilang script
+	Immutable, so it can be run any number of times; see `compile_mul`
+
+	Attributes
+	----------
+	name : str
+		The file the script came from, or '<string>'
+	lang : str in ['p', 'r', 'm', 'b']
+		The language the script starts in
+	blocks : tuple[Block]
+		The steps of the script, in order
+
+	Properties
+	----------
+	languages
+		The languages the script runs code in
+
+	Functions
+	---------
+	dependencies
+		Which blocks each block must wait for
+	split
+		Split off the Python code at the start that doesn't use some variables
+	run
+		Run the script; see `multilang.as_multilang`
+	"""
+	__slots__ = ('name', 'lang', 'blocks')
+
+	def __init__(self, name : str, lang : str, blocks : tuple):
+		"""Setup a MulProgram; see `compile_mul`"""
+		object.__setattr__(self, 'name', name)
+		object.__setattr__(self, 'lang', lang)
+		object.__setattr__(self, 'blocks', tuple(blocks))
+
+	def __setattr__(self, name, value):
+		raise AttributeError('MulProgram is immutable')
+
+	def __reduce__(self):
+		# code objects can't be pickled, so send it to other processes as in the cache
+		return _unmarshal, (marshal.dumps((self.name, self.lang, tuple([tuple(b) for b in self.blocks]))),)
+
+	@property
+	def languages(self):
+		"""The languages the script runs code in"""
+		return set([self.lang] + [b.lang for b in self.blocks])
+
+	def dependencies(self):
+		"""Return which blocks each block must wait for
+
+		Each language has one interpreter, so a block waits for the last
+		block before it that used the same interpreter. Code uses the
+		interpreter of its language. A switch uses the one it goes to,
+		and also the one it comes from if it brings any variables, so
+		a switch with no variables does not wait for the language it
+		leaves. A switch ending in `after=<lang>[,<lang>]` also waits
+		for those languages, eg. for files written by them.
+
+		Returns
+		-------
+		tuple[tuple[int]]
+			The indices in `blocks` each block depends on
+		"""
+		_last, _out = {}, []
+		for _i, _b in enumerate(self.blocks):
+			_uses = set([_b.lang] + ([_b.source] if _b.kind == 'switch' and _b.names else []))
+			_out.append(tuple(sorted(set([_last[l] for l in _uses.union(_b.after) if l in _last]))))
+			_last.update({l: _i for l in _uses})
+		return tuple(_out)
+
+	def split(self, names):
+		"""Split off the Python code at the start that doesn't use @names
+		The script is split before the first top-level statement that may use
+		any of them, even in the middle of a block. Statements that mention
+		`_VARIABLES`, `globals`, `vars`, `eval`, etc. may use anything.
+		@multilang functions before it go with the start, but any that may
+		use @names are then used like them, so calls to them are split off.
+
+		Parameters
+		----------
+		names : Iterable[str]
+			The names of the variables, eg. the parameters of a sweep
+
+		Returns
+		-------
+		MulProgram
+			The start of the script; may have no blocks
+		MulProgram
+			The rest of it, starting in Python if the start has any blocks
+		"""
+		_names = set(names)
+		_head = []
+		for _i, _b in enumerate(self.blocks):
+			if _b.lang != 'p' or _b.kind == 'switch':
+				break
+			_tree = ast.parse('\n'.join(_b.code)).body
+			if _b.kind == 'function':
+				# defining it uses nothing, but calling it may
+				_names.update([t.name for t in _tree if isinstance(t, ast.FunctionDef) and _uses(t, _names)])
+				_head.append(_b)
+				continue
+			_stop = next((t for t in _tree if _uses(t, _names)), None)
+			if _stop is None:
+				_head.append(_b)
+				continue
+
+			# decorators come before the line of the `def`
+			_at = min([_stop.lineno] + [d.lineno for d in getattr(_stop, 'decorator_list', [])]) - 1
+			_pairs = list(zip(_b.lines, _b.code))
+			if any([l.strip() for _, l in _pairs[:_at]]):
+				_head.append(_code('code', 'p', _pairs[:_at], _b.source))
+			_rest = [_code('code', 'p', _pairs[_at:], _b.source)] + list(self.blocks[_i + 1:])
+			return MulProgram(self.name, self.lang, _head), MulProgram(self.name, self.lang, _rest)
+
+		return MulProgram(self.name, self.lang, _head), MulProgram(self.name, self.lang, self.blocks[len(_head):])
+
+	def run(self, **kwargs):
+		"""Run the script
+		Takes the same arguments as `multilang.as_multilang`"""
+		from . import as_multilang
+		return as_multilang(self, **kwargs)
+
+	def __iter__(self):
+		return iter(self.blocks)
+
+	def __len__(self):
+		return len(self.blocks)
+
+	def __getitem__(self, key):
+		return self.blocks[key]
+
+	def __repr__(self):
+		return 'MulProgram(' + repr(self.name) + ', ' + LANGUAGES[self.lang] + ', ' + str(len(self.blocks)) + ' blocks)'
+
+
+
+# ---------------------------- Main Functions ---------------------------- #
+def compile_mul(_lines):
+	"""Parse a multilang script into a MulProgram
+
+	Parsing is cached, so compiling the same script again is cheap.
+	Scripts read from files are also cached on disk; see CACHE.
+
+	Parameters
+	----------
+	_lines : filelike, str, bytes, Iterable[str], Iterable[bytes]
+		The script to be parsed
+		If filelike: must have a `readlines` or `read` method
+		If str starting with '#!' or '%!', bytes: lines separated by
+			line breaks; eg. \\r\\n, \\r, \\n
+		If other str: the name of the file
+		If Iterable: each entry is a line; no line breaks
+
+	Returns
+	-------
+	MulProgram
+		The parsed script
+
+	Raises
+	------
+	ValueError
+		If any multilang statement is improperly formatted
+	"""
+	if type(_lines) is str and _lines[:2] not in ['#!','%!'] and CACHE:
+		# file name
+		return _compile_file(_lines)
+
+	_lines, _name = _read(_lines)
+	return _compile(tuple(_lines), _name)
@@ -0,0 +1,262 @@
+"""Lazy references to variables in the R and Matlab environments
+
+`Master.r_to_py` and `Master.mat_to_py` can return these instead of
+copying the variables into Python. A reference only holds the name of the
+variable and its class, dtype and shape; the data itself is fetched the
+first time it is used through `values` or `np.asarray`, and then kept until
+`refresh`. Indexing a reference whose data hasn't been fetched only fetches
+the requested rows and columns; see `multilang.transfer.fetch_r`.
+
+Passing a reference back to the environment it points into copies the
+variable there instead of moving the data through Python; see `resolve`.
+
+Classes
+-------
+RRef
+	A lazy reference to a variable in an R environment
+MatRef
+	A lazy reference to a variable in a Matlab environment
+
+Functions
+---------
+r_refs
+	Make references to variables in an R environment
+mat_refs
+	Make references to variables in a Matlab environment
+resolve
+	Split references out of variables to be sent to an environment
+"""
+
+
+from abc import ABC, abstractmethod
+import numpy as np
+import re
+
+from .transfer import _check_missing, fetch_mat, fetch_r, FROM_MAT, FROM_R, from_mat, from_r
+
+
+# ------------------------------ Constants ------------------------------ #
+# what multilang.meta prints in R: |multilang.meta|name|class|mode|dims|
+_R_META = re.compile(r'\|multilang\.meta\|([^|\r\n]+)\|([^|\r\n]+)\|([^|\r\n]+)\|([\d,]*)\|')
+# what is printed in Matlab: |multilang.meta|name|class|dims|
+_MAT_META = re.compile(r'\|multilang\.meta\|([^|%\r\n]+)\|([^|%\r\n]+)\|([\d,]*)\|')
+
+
+
+# -------------------------------- Classes -------------------------------- #
+class _Ref(ABC):
+	"""A lazy reference to a variable in another environment
+
+	Attributes
+	----------
+	name : str
+		The name of the variable
+	object : RObject, MatlabObject
+		The environment that holds it
+	cls : str
+		Its class in that environment
+	dtype : np.dtype, None
+		The dtype it will have in Python, if it is an array
+	shape : tuple[int]
+		Its dimensions in that environment
+
+	Properties
+	----------
+	values
+		The variable itself; fetched on first use
+
+	Functions
+	---------
+	refresh
+		Drop the fetched values so they are fetched again
+	"""
+	def __init__(self, name : str, object, cls : str, dtype, shape : tuple):
+		"""Setup a reference; see `r_refs` and `mat_refs`
+
+		Parameters
+		----------
+		name : str
+			The name of the variable
+		object : RObject, MatlabObject
+			The environment that holds it
+		cls : str
+			Its class in that environment
+		dtype : np.dtype, None
+			The dtype it will have in Python, if it is an array
+		shape : tuple[int]
+			Its dimensions in that environment
+		"""
+		self.name = name
+		self.object = object
+		self.cls = cls
+		self.dtype = dtype
+		self.shape = shape
+		self._values = None
+		self._fetched = False
+
+	@abstractmethod
+	def _fetch(self):
+		"""Get the variable from its environment"""
+
+	@abstractmethod
+	def _subset(self, rows, cols):
+		"""Get part of the variable from its environment"""
+
+	@property
+	def values(self):
+		"""The variable itself; fetched on first use"""
+		if not self._fetched:
+			if not self.object.isalive:
+				raise RuntimeError('The environment holding ' + self.name + ' is not alive')
+			self._values = self._fetch()
+			self._fetched = True
+		return self._values
+
+	def refresh(self):
+		"""Drop the fetched values so the next use fetches them again"""
+		self._values = None
+		self._fetched = False
+
+	def __array__(self, dtype=None, copy=None):
+		return np.asarray(self.values, dtype=dtype)
+
+	def __getitem__(self, key):
+		key = key if isinstance(key, tuple) else (key,)
+		if self._fetched or len(key) > 2 or any([k is Ellipsis or k is np.newaxis for k in key]):
+			return self.values[key if len(key) > 1 else key[0]]
+
+		# integers drop their dimension, as in numpy
+		drop = [i for i, k in enumerate(key) if isinstance(k, (int, np.integer)) and not isinstance(k, (bool, np.bool_))]
+		for i in drop:
+			n = (self.shape[i] if i < len(self.shape) else 1) if self.shape else 0
+			if not -n <= key[i] < n:
+				raise IndexError('index ' + str(key[i]) + ' is out of bounds for axis ' + str(i) + ' with size ' + str(n))
+		key = [slice(k, k + 1 if k != -1 else None) if i in drop else k for i, k in enumerate(key)]
+		out = self._subset(*(key + [None] * (2 - len(key))))
+		if drop and isinstance(out, np.ndarray) and out.ndim == len(self.shape):
+			out = out.squeeze(axis=tuple(drop))
+		return out
+
+	def __len__(self):
+		return self.shape[0] if self.shape else 0
+
+	def __repr__(self):
+		return type(self).__name__ + '(' + ', '.join([repr(self.name), self.cls, str(self.dtype), str(self.shape)]) + ')'
+
+
+class RRef(_Ref):
+	"""A lazy reference to a variable in an R environment
+	See `_Ref`
+	"""
+	def _fetch(self):
+		return from_r([self.name], self.object)[self.name]
+
+	def _subset(self, rows, cols):
+		return fetch_r(self.name, self.object, rows, cols, self.shape)
+
+
+class MatRef(_Ref):
+	"""A lazy reference to a variable in a Matlab environment
+	See `_Ref`
+	"""
+	def _fetch(self):
+		return from_mat([self.name], self.object)[self.name]
+
+	def _subset(self, rows, cols):
+		return fetch_mat(self.name, self.object, rows, cols)
+
+
+
+# ---------------------------- Main Functions ---------------------------- #
+def r_refs(_names, _r_object):
+	"""Make references to variables in R
+	Gets the class, storage mode and dimensions of all of them at once
+
+	Parameters
+	----------
+	_names : Iterable[str]
+		The names of the R variables
+	_r_object : RObject
+		The R environment where the variables are stored
+
+	Returns
+	-------
+	dict[str, RRef]
+		A reference to each of @_names
+
+	Raises
+	------
+	NameError
+		If a variable is not in the R environment
+	"""
+	_r_object.sendline('multilang.meta(c(' + ', '.join(['"' + i + '"' for i in _names]) + '))')
+	_check_missing(_r_object, 'r')
+
+	_out = {}
+	for _name, _cls, _mode, _dims in _R_META.findall(_r_object.before):
+		_dtype = np.dtype(FROM_R[_mode]) if _mode in FROM_R else None
+		_out[_name] = RRef(_name, _r_object, _cls, _dtype, tuple([int(i) for i in _dims.split(',') if i]))
+	return _out
+
+def mat_refs(_names, _mat_object):
+	"""Make references to variables in Matlab
+	Gets the class and dimensions of all of them at once
+
+	Parameters
+	----------
+	_names : Iterable[str]
+		The names of the Matlab variables
+	_mat_object : MatlabObject
+		The Matlab environment where the variables are stored
+
+	Returns
+	-------
+	dict[str, MatRef]
+		A reference to each of @_names
+
+	Raises
+	------
+	NameError
+		If a variable is not in the Matlab environment
+	"""
+	_mat_object.sendline(' '.join([
+			'if exist(\'' + i + '\', \'var\'), fprintf(\'|multilang.meta|%s|%s|%s|\\n\', \'' + i + '\', class(' + i + '), sprintf(\'%d,\', size(' + i + ')));'
+				+ ' else, fprintf(\'\\n|multilang.missing|%s|\\n\', \'' + i + '\'); end;'
+				for i in _names
+		]))
+	_check_missing(_mat_object, 'm')
+
+	_out = {}
+	for _name, _cls, _dims in _MAT_META.findall(_mat_object.before):
+		_dtype = np.dtype(FROM_MAT[_cls]) if _cls in FROM_MAT else None
+		_out[_name] = MatRef(_name, _mat_object, _cls, _dtype, tuple([int(i) for i in _dims.split(',') if i]))
+	return _out
+
+def resolve(_out : dict, _object):
+	"""Split references out of variables to be sent to @_object
+
+	Parameters
+	----------
+	_out : dict[str, object]
+		The variables to send as {name: value}
+	_object : RObject, MatlabObject
+		The environment they are being sent to
+
+	Returns
+	-------
+	dict[str, object]
+		The variables to send, with references into other environments
+		replaced by their values
+	dict[str, str]
+		{name: remote name} for references into @_object itself,
+		which only need to be copied there
+	"""
+	_send, _alias = {}, {}
+	for _k, _v in _out.items():
+		if isinstance(_v, _Ref) and _v.object is _object:
+			_alias[_k] = _v.name
+		elif isinstance(_v, _Ref):
+			_send[_k] = _v.values
+		else:
+			_send[_k] = _v
+	return _send, _alias
@@ -0,0 +1,350 @@
+"""Running scripts many times in a pool of worker processes
+
+`sweep` parses a script once and runs it once for each set of parameters,
+given as **kwargs to `multilang.as_multilang` like `check` and `value`
+in examples/deseq.mul. The runs are shared out to a pool of worker
+processes, one per core by default. Each worker starts the R and Matlab
+sessions the script uses once, and keeps them for all of its runs,
+removing all their variables between runs; see `RObject.reset`.
+
+A run that raises does not stop the others; its traceback is kept
+instead of its outputs. See `Run`.
+
+Shared Prefix
+-------------
+The Python code at the start of the script that doesn't use any of the
+parameters, such as loading the data, is run only once, before the
+workers start; see `MulProgram.split`. Workers are forked from that
+state, and each run is forked again from its worker, so every run starts
+from it without copying it: memory is shared until a run changes it.
+The bash environment starts fresh for every run.
+
+Many Scripts
+------------
+`run_many` runs a queue of independent scripts in the same kind of pool.
+Workers start R and Matlab when a script first needs them and keep them
+for the next scripts, so each interpreter starts once per worker rather
+than once per script.
+
+Classes
+-------
+Run
+	The result of one run of a sweep
+
+Functions
+---------
+expand
+	Return every set of parameters of a grid
+sweep
+	Run a script once for each set of parameters
+run_many
+	Run many independent scripts
+"""
+
+
+from collections import namedtuple
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from itertools import product
+from multiprocessing import get_context
+import os
+import pickle
+import sys
+import traceback
+
+from .memo import fingerprint
+from .objects import MatlabObject, RObject
+from .program import compile_mul, MulProgram
+
+
+# ------------------------------ Constants ------------------------------ #
+# the script, settings, and sessions of a worker process; see _start_worker
+_WORKER = {}
+
+
+
+# -------------------------------- Classes -------------------------------- #
+class Run(namedtuple('Run', ['params', 'outputs', 'error'])):
+	"""The result of one run of a sweep
+
+	Attributes
+	----------
+	params : dict[str, object]
+		The parameters it was run with
+	outputs : dict[str, object], None
+		The Python variables at the end of the run, or None if it failed
+	error : str, None
+		The traceback of what it raised, or None if it didn't
+
+	Properties
+	----------
+	ok
+		Whether the run finished
+	"""
+	__slots__ = ()
+
+	@property
+	def ok(self):
+		"""Whether the run finished"""
+		return self.error is None
+
+
+
+# --------------------------- Helper Functions --------------------------- #
+def _start_worker(_program, _timeout : int, _load_r : bool, _base : dict):
+	"""Setup a worker process running @_program, or any script if None
+	@_base is the fingerprint of each variable runs start with; see `_collect`
+	Sessions are started when a script first needs them; see `_connect`"""
+	_WORKER.update({'program': _program, 'timeout': _timeout, 'load_r': _load_r, 'base': _base,
+		'r': RObject(connect=False), 'm': MatlabObject(connect=False)})
+	if _program is not None:
+		_connect(_program)
+
+def _connect(_program : MulProgram):
+	"""Start the sessions @_program uses that this worker hasn't yet"""
+	if 'r' in _program.languages and not _WORKER['r'].isalive:
+		_WORKER['r'].connect(_WORKER['load_r'], _WORKER['timeout'])
+	if 'm' in _program.languages and not _WORKER['m'].isalive:
+		_WORKER['m'].connect(_WORKER['timeout'])
+
+def _restart_worker(_program : MulProgram):
+	"""Start the sessions of this worker @_program used again, as a failed
+	run may have left them in the middle of a command"""
+	for _lang in 'rm':
+		if _lang in _program.languages:
+			# the old session is closed when dropped
+			_WORKER[_lang] = RObject(connect=False) if _lang == 'r' else MatlabObject(connect=False)
+	_connect(_program)
+
+def _collect(_variables : dict, _outputs, _base : dict):
+	"""Return the variables of @_variables named in @_outputs, or if None all
+	but those unchanged from the fingerprints @_base, eg. the shared prefix,
+	leaving out those that can't be sent back, eg. modules"""
+	if _outputs is not None:
+		_variables = {k: _variables[k] for k in _outputs if k in _variables}
+	elif _base:
+		_variables = {k: v for k, v in _variables.items() if _base.get(k) is None or fingerprint(v) != _base[k]}
+
+	_out = {}
+	for _k, _v in _variables.items():
+		try:
+			pickle.dumps(_v, protocol=4)
+		except Exception:
+			continue
+		_out[_k] = _v
+	return _out
+
+def _run_here(_program : MulProgram, _params : dict, _outputs, _verbosity : int):
+	"""Run @_program in the sessions of this worker with @_params; see `_run`"""
+	from . import as_multilang
+	try:
+		for _lang in 'rm':
+			if _lang in _program.languages:
+				_WORKER[_lang].reset()
+		_ml = as_multilang(_program, _r_object=_WORKER['r'], _mat_object=_WORKER['m'],
+			_verbosity=_verbosity, **_params)
+		return Run(_params, _collect(_ml.dump_py(), _outputs, _WORKER['base']), None)
+	except Exception:
+		return Run(_params, None, traceback.format_exc())
+
+def _run(_params : dict, _outputs, _verbosity : int, _program : MulProgram = None):
+	"""Run @_program, or the script of this worker, with @_params in a fork
+	of this worker, so that every run starts from the state it started with
+	The fork uses the sessions of the worker, which waits for it"""
+	_program = _program if _program is not None else _WORKER['program']
+	_connect(_program)
+
+	_read, _write = os.pipe()
+	_pid = os.fork()
+	if _pid == 0:
+		try:
+			os.close(_read)
+			_data = pickle.dumps(_run_here(_program, _params, _outputs, _verbosity), protocol=4)
+			with os.fdopen(_write, 'wb') as _f:
+				_f.write(_data)
+			sys.stdout.flush()
+		finally:
+			# skip the cleanup of the worker, eg. closing its sessions
+			os._exit(0)
+
+	os.close(_write)
+	with os.fdopen(_read, 'rb') as _f:
+		_data = _f.read()
+	_, _status = os.waitpid(_pid, 0)
+	_result = pickle.loads(_data) if _data else Run(_params, None, 'The run exited with status ' + str(_status) + ' before finishing')
+	if not _result.ok:
+		_restart_worker(_program)
+	return _result
+
+def _map(_tasks : list, _workers : int, _program, _timeout : int, _load_r : bool, _base : dict = None):
+	"""Run each (params, outputs, verbosity, program) of @_tasks with `_run`
+	in a pool of @_workers forked from this process; see `_start_worker`
+
+	Returns
+	-------
+	list[Run]
+		The result of each task, in order
+	"""
+	_results = [None] * len(_tasks)
+	with ProcessPoolExecutor(_workers, mp_context=get_context('fork'),
+			initializer=_start_worker, initargs=(_program, _timeout, _load_r, _base or {})) as _pool:
+		_futures = {_pool.submit(_run, *t): i for i, t in enumerate(_tasks)}
+		for _future in as_completed(_futures):
+			_i = _futures[_future]
+			try:
+				_results[_i] = _future.result()
+			except Exception:
+				# the worker itself died, eg. R couldn't start
+				_results[_i] = Run(_tasks[_i][0], None, traceback.format_exc())
+	return _results
+
+
+
+# ---------------------------- Main Functions ---------------------------- #
+def expand(grid):
+	"""Return every set of parameters of @grid
+
+	Parameters
+	----------
+	grid : dict[str, Iterable], Iterable[dict[str, object]]
+		If dict: the values to try for each parameter;
+			every combination of them is a set, eg.
+			{'check': ['Condition', 'Sac'], 'value': ['Heat', 'TcMax']}
+			is 4 sets
+		If Iterable[dict]: the sets themselves
+
+	Returns
+	-------
+	list[dict[str, object]]
+		The sets of parameters, the first parameter changing slowest
+	"""
+	if isinstance(grid, dict):
+		_names = list(grid)
+		return [dict(zip(_names, v)) for v in product(*[list(grid[k]) for k in _names])]
+	return [dict(i) for i in grid]
+
+def sweep(script, grid, workers : int = None, outputs = None, timeout : int = 600,
+		verbosity : int = 0, load_r : bool = False, shared : bool = True):
+	"""Run a multilang script once for each set of parameters
+
+	Parameters
+	----------
+	script : MulProgram, filelike, str, bytes, Iterable[str], Iterable[bytes]
+		The script to run; parsed once; see `compile_mul`
+	grid : dict[str, Iterable], Iterable[dict[str, object]]
+		The sets of parameters to run it with, as **kwargs of
+		`multilang.as_multilang`; see `expand`
+	workers : int
+		The number of worker processes to run them in
+		Default: the number of cores
+	outputs : None, str, Iterable[str]
+		The Python variables to keep from each run
+		If str: comma-separated names
+		If None: all of them that can be pickled, except those left as
+			the shared prefix made them
+		Default: None
+	timeout : int
+		Number of seconds until R or Matlab time out
+		Default: 600
+	verbosity : int
+		How much each run prints; see `multilang.as_multilang`
+		Default: 0
+	load_r : bool
+		Whether to load the existing R workspace when starting R
+		Default: False
+	shared : bool
+		Whether to run the Python code at the start that doesn't use the
+		parameters only once; see Shared Prefix
+		Default: True
+
+	Returns
+	-------
+	list[Run]
+		The result of each run, in the order of @grid
+	"""
+	_program = script if isinstance(script, MulProgram) else compile_mul(script)
+	_params = expand(grid)
+	if not _params:
+		return []
+	if isinstance(outputs, str):
+		outputs = outputs.replace(' ', '').split(',')
+	workers = max(1, min(workers or os.cpu_count() or 1, len(_params)))
+
+	from . import _VARIABLES, as_multilang
+	_head, _program = _program.split(set([k for p in _params for k in p])) if shared else (None, _program)
+	# runs start from the shared prefix only, not what this process has
+	_saved = dict(_VARIABLES)
+	_VARIABLES.clear()
+	try:
+		if _head:
+			as_multilang(_head, _verbosity=verbosity)
+		# so runs don't each send back a copy of it
+		_base = {k: fingerprint(v) for k, v in _VARIABLES.items()} if outputs is None else {}
+		return _map([(p, outputs, verbosity) for p in _params], workers, _program, timeout, load_r, _base)
+	finally:
+		_VARIABLES.clear()
+		_VARIABLES.update(_saved)
+
+def run_many(scripts, jobs : int = None, outputs = None, timeout : int = 600,
+		verbosity : int = 0, load_r : bool = False, **kwargs):
+	"""Run many independent multilang scripts in a pool of worker processes
+
+	Each worker starts R and Matlab when a script first needs them and
+	keeps them for the next scripts, removing all their variables between
+	scripts; see `RObject.reset`. Each script starts with only @kwargs as
+	Python variables and a fresh bash environment.
+	A script that fails to parse or raises does not stop the others.
+
+	Parameters
+	----------
+	scripts : Iterable[MulProgram, filelike, str, bytes, Iterable[str]]
+		The scripts to run; see `compile_mul`
+	jobs : int
+		The number of worker processes to run them in
+		Default: the number of cores
+	outputs : None, str, Iterable[str]
+		The Python variables to keep from each script
+		If str: comma-separated names
+		If None: all of them that can be pickled
+		Default: None
+	timeout : int
+		Number of seconds until R or Matlab time out
+		Default: 600
+	verbosity : int
+		How much each script prints; see `multilang.as_multilang`
+		Default: 0
+	load_r : bool
+		Whether to load the existing R workspace when starting R
+		Default: False
+	**kwargs : dict[str:object]
+		Python variables to give every script
+
+	Returns
+	-------
+	list[Run]
+		The result of each script, in the order of @scripts
+	"""
+	if isinstance(outputs, str):
+		outputs = outputs.replace(' ', '').split(',')
+
+	_results, _tasks, _where = [], [], []
+	for _script in scripts:
+		try:
+			_tasks.append((kwargs, outputs, verbosity, _script if isinstance(_script, MulProgram) else compile_mul(_script)))
+			_where.append(len(_results))
+			_results.append(None)
+		except Exception:
+			_results.append(Run(kwargs, None, traceback.format_exc()))
+	if not _tasks:
+		return _results
+
+	from . import _VARIABLES
+	# scripts start with only kwargs, not what this process has
+	_saved = dict(_VARIABLES)
+	_VARIABLES.clear()
+	try:
+		for _i, _result in zip(_where, _map(_tasks, max(1, min(jobs or os.cpu_count() or 1, len(_tasks))), None, timeout, load_r)):
+			_results[_i] = _result
+	finally:
+		_VARIABLES.clear()
+		_VARIABLES.update(_saved)
+	return _results
@@ -0,0 +1,1791 @@
+"""Moving variables between Python and the R and Matlab environments
+
+Every RObject and MatlabObject keeps a manifest of {name: (hash, rows)}
+for the variables it was last sent from Python. Sending a variable whose
+hash matches the manifest is skipped, so scripts that switch languages
+in a loop do not re-serialize the same large values over and over.
+
+If an np.ndarray or pd.DataFrame has only had rows appended since it was
+last sent, only the new rows are sent and they are appended remotely:
+`rbind`/`cbind` in R and `[x; new]`/`[x, new]` in Matlab.
+1D arrays arrive as row vectors, so they grow along columns.
+
+The manifest is dropped whenever the environment reconnects, and entries
+are forgotten whenever code run in that environment may have assigned to
+them; see `assigned`.
+
+Transports
+----------
+Set `multilang.transfer.TRANSPORT` to choose how data reaches R.
+'file'
+	Default. Write a .mat file, then read it in the other environment
+'fifo'
+	Stream the .mat data through a named pipe, served from a thread
+	on the Python end, so it never touches the disk and R starts
+	decoding while Python is still writing.
+	Matlab's `load` and `save` need a real file, so transfers to and
+	from Matlab always use 'file'.
+
+Memory Layout
+-------------
+R, Matlab and .mat files are all column-major, so arrays that come from R
+or Matlab stay Fortran-ordered in Python, and dense numeric arrays are
+written to .mat files straight from their buffers; see `_mat_chunks`.
+Sending back an array that came from R or Matlab copies nothing and
+reorders nothing. C-ordered arrays are reordered once, as they were by
+`scipy.io.savemat`.
+
+Parallel Encoding
+-----------------
+When several variables with at least 1 MiB between them are sent at once,
+each is encoded as its own .mat file on one of `multilang.transfer.WORKERS`
+threads, and R or Matlab loads them all in one command.
+Set WORKERS to 1 to encode them together in one file.
+
+Round Trips
+-----------
+Getting variables from R or Matlab takes one command: Python picks the
+file, and the command checks that the variables exist, saves them and
+prints the names of any that don't, which are raised as a NameError.
+
+Scratch Files
+-------------
+Files used to move variables live in one directory per session, managed
+by `multilang.transfer.SCRATCH`; see `Scratch`.
+They are deleted as soon as the other environment has loaded them.
+
+Literals
+--------
+Scalars, short strings and arrays of up to `multilang.transfer.LITERAL`
+elements are written into the command as literals instead of going
+through a file; they arrive with the same values and types.
+
+Sparse Matrices
+---------------
+scipy.sparse matrices are sent as they are, and arrive as `dgCMatrix` in R
+and `sparse` in Matlab. R.matlab's `writeMat` can't write sparse matrices,
+so R sends the index, indptr and data buffers of each one instead, using a
+helper that `R_SETUP` attaches to every RObject, and they are put back
+together in Python or Matlab; see `_SPARSE`.
+
+Strings
+-------
+Vectors of strings, such as the `_index` and `_columns` lists made by
+`multilang.as_array`, are sent as their joined text and the offsets where
+each string ends instead of as padded char matrices; see `_STRINGS`.
+They arrive as character vectors in R, `string` arrays in Matlab and
+np.ndarrays of str in Python, ready to be a pd.Index or column.
+
+Data Types
+----------
+Arrays keep compact types instead of all becoming doubles. How each numpy
+dtype is stored in R and Matlab is set by `multilang.transfer.PROMOTION`,
+and what R storage modes and Matlab classes become in Python by
+`multilang.transfer.FROM_R` and `multilang.transfer.FROM_MAT`.
+By default, int32 arrays are 'integer' in R and 'int32' in Matlab, bool
+arrays are 'logical' in both, and float32 arrays are 'single' in Matlab.
+R has no 64-bit integers or single precision, so those become 'double'.
+Integer and logical vectors from R with NA become float64, with NaN for NA.
+
+Compression
+-----------
+Set `multilang.transfer.COMPRESSION` to choose how .mat files written by
+Python are stored.
+'auto'
+	Default. Pick per transfer; see `compression`
+'none'
+	Never compress
+'fast'
+	Always compress
+R's `writeMat` cannot compress, and Matlab's `save` keeps its default.
+
+Classes
+-------
+Scratch
+	A per-session directory for the files used to move variables
+
+Functions
+---------
+compression
+	How to store a .mat file for some variables
+content_hash
+	A fast digest of a Python value
+assigned
+	Which variables a piece of R or Matlab code may have changed
+to_r
+	Send a dict of variables to an R environment
+to_mat
+	Send a dict of variables to a Matlab environment
+from_r
+	Get a dict of variables from an R environment
+from_mat
+	Get a dict of variables from a Matlab environment
+fetch_r
+	Get part of a variable from an R environment
+fetch_mat
+	Get part of a variable from a Matlab environment
+summarize_r
+	Get summaries of a variable computed in an R environment
+summarize_mat
+	Get summaries of a variable computed in a Matlab environment
+move_r_to_mat
+	Move variables from R to Matlab
+move_mat_to_r
+	Move variables from Matlab to R
+"""
+
+
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from io import BytesIO
+import itertools
+import numpy as np
+import os
+import pandas as pd
+import pickle
+from random import choices
+import re
+import scipy.io as sio
+import scipy.sparse as sp
+import shutil
+import struct
+import sys
+from tempfile import gettempdir, mkdtemp
+import threading
+import time
+import weakref
+import zlib
+
+
+# ------------------------------ Constants ------------------------------ #
+TRANSPORT = 'file'
+COMPRESSION = 'auto'
+
+# how many threads encode the variables of one transfer
+WORKERS = min(4, os.cpu_count() or 1)
+
+# the most elements an array, or characters a str, sent as a literal may have
+LITERAL = 64
+_LITERAL_STR = 1024
+
+# smaller payloads are never compressed
+_SMALL = 2**20
+# how much of a payload is compressed to guess how well the rest will
+_SAMPLE = 2**16
+
+# {id: (weakref, hash)} for read-only np.ndarrays
+_HASHES = {}
+
+# {op: (R code, Matlab code)} computing a summary of {x}; see summarize_r
+# quantiles are R's default type 7 in both
+SUMMARIES = {
+		'shape'	: ('if (is.null(dim({x}))) length({x}) else dim({x})', 'size({x})'),
+		'sum'	: ('sum(if (is.integer({x})) as.numeric({x}) else {x}, na.rm=TRUE)', 'full(sum(double({x}(:)), \'omitnan\'))'),
+		'mean'	: ('mean({x}, na.rm=TRUE)', 'full(mean(double({x}(:)), \'omitnan\'))'),
+		'min'	: ('min({x}, na.rm=TRUE)', 'full(min({x}(:)))'),
+		'max'	: ('max({x}, na.rm=TRUE)', 'full(max({x}(:)))'),
+		'sd'	: ('sd(as.numeric({x}), na.rm=TRUE)', 'full(std(double({x}(:)), \'omitnan\'))'),
+		'nnz'	: ('if (methods::is({x}, "sparseMatrix")) Matrix::nnzero({x}) else sum({x} != 0, na.rm=TRUE)', 'nnz({x})'),
+		'nna'	: ('sum(is.na({x}))', 'nnz(isnan({x}))'),
+		'quantiles': ('quantile(as.numeric({x}), c(0, .25, .5, .75, 1), na.rm=TRUE, names=FALSE)',
+			'feval(@(s) feval(@(h) s(floor(h)) + (h - floor(h)) .* (s(min(floor(h) + 1, numel(s))) - s(floor(h))), (numel(s) - 1) * [0 .25 .5 .75 1] + 1), sort(double(full({x}(~isnan({x}))))))'),
+		'colsums': ('if (methods::is({x}, "sparseMatrix")) Matrix::colSums({x}) else colSums({x}, na.rm=TRUE)', 'full(sum({x}, 1, \'omitnan\'))'),
+		'colmeans': ('if (methods::is({x}, "sparseMatrix")) Matrix::colMeans({x}) else colMeans({x}, na.rm=TRUE)', 'full(mean({x}, 1, \'omitnan\'))'),
+		'rowsums': ('if (methods::is({x}, "sparseMatrix")) Matrix::rowSums({x}) else rowSums({x}, na.rm=TRUE)', 'full(sum({x}, 2, \'omitnan\'))'),
+		'rowmeans': ('if (methods::is({x}, "sparseMatrix")) Matrix::rowMeans({x}) else rowMeans({x}, na.rm=TRUE)', 'full(mean({x}, 2, \'omitnan\'))')
+	}
+
+# how numpy dtypes are stored in R and Matlab
+# {dtype: (R storage.mode, Matlab class)}; other dtypes are sent as they are
+PROMOTION = {
+		'bool'	: ('logical', 'logical'),
+		'int8'	: ('integer', 'int8'),
+		'int16'	: ('integer', 'int16'),
+		'int32'	: ('integer', 'int32'),
+		'int64'	: ('double', 'int64'),
+		'uint8'	: ('integer', 'uint8'),
+		'uint16': ('integer', 'uint16'),
+		'uint32': ('double', 'uint32'),
+		'uint64': ('double', 'uint64'),
+		'float16': ('double', 'single'),
+		'float32': ('double', 'single'),
+		'float64': ('double', 'double')
+	}
+
+# what R storage modes become in Python
+FROM_R = {
+		'logical': 'bool',
+		'integer': 'int32',
+		'double': 'float64'
+	}
+
+# what Matlab classes become in Python
+FROM_MAT = {
+		'logical': 'bool',
+		'int8'	: 'int8',
+		'int16'	: 'int16',
+		'int32'	: 'int32',
+		'int64'	: 'int64',
+		'uint8'	: 'uint8',
+		'uint16': 'uint16',
+		'uint32': 'uint32',
+		'uint64': 'uint64',
+		'single': 'float32',
+		'double': 'float64'
+	}
+
+# the dtypes that carry each R storage mode and Matlab class in a .mat file
+_R_DTYPES = {'logical': 'bool', 'integer': 'int32', 'double': 'float64'}
+_MAT_DTYPES = dict(FROM_MAT)
+
+# printed by R and Matlab for variables that don't exist
+_MISSING = re.compile(r'\|multilang\.missing\|([^|"%\r\n]+)\|')
+
+# the error R stops with for indices out of range; see multilang.index
+_RANGE = '|multilang.range|'
+
+# suffix of the storage mode R sends with integer and logical arrays
+_MODE = '__mode'
+
+# suffixes of the buffers R sends in place of a sparse matrix
+_SPARSE = ['__sparse_i', '__sparse_p', '__sparse_x', '__sparse_dim']
+
+# suffixes of the text and end offsets a vector of strings is sent as
+# the text is UTF-8 bytes from Python and Matlab and a string from R;
+# offsets count UTF-8 bytes in every language
+_STRINGS = ['__str', '__str_offsets']
+
+# {dtype: (MAT 5 array class, MAT 5 data type)} of the arrays written
+# straight from their buffers; see _mat_chunks
+_MAT5 = {
+		'bool'	: (9, 2),
+		'int8'	: (8, 1),
+		'uint8'	: (9, 2),
+		'int16'	: (10, 3),
+		'uint16': (11, 4),
+		'int32'	: (12, 5),
+		'uint32': (13, 6),
+		'int64'	: (14, 12),
+		'uint64': (15, 13),
+		'float32': (7, 7),
+		'float64': (6, 9)
+	}
+
+# run in every new R session; see RObject.connect
+R_SETUP = [
+		'local({',
+			'multilang <- attach(NULL, name="multilang")',
+			'multilang$multilang.export <- function(names, envir=globalenv()) {',
+				'out <- list()',
+				'for (n in names) {',
+					'v <- get(n, envir=envir)',
+					'if (methods::is(v, "sparseMatrix")) {',
+						'v <- tryCatch(methods::as(methods::as(methods::as(v, "CsparseMatrix"), "generalMatrix"), "dMatrix"), error=function(e) methods::as(v, "dgCMatrix"))',
+						'out[[paste0(n, "' + _SPARSE[0] + '")]] <- v@i',
+						'out[[paste0(n, "' + _SPARSE[1] + '")]] <- v@p',
+						'out[[paste0(n, "' + _SPARSE[2] + '")]] <- v@x',
+						'out[[paste0(n, "' + _SPARSE[3] + '")]] <- v@Dim',
+					'} else if (is.character(v) && is.null(dim(v)) && length(v) && !anyNA(v)) {',
+						'v <- enc2utf8(v)',
+						'out[[paste0(n, "' + _STRINGS[0] + '")]] <- paste(v, collapse="")',
+						'out[[paste0(n, "' + _STRINGS[1] + '")]] <- cumsum(c(0, nchar(v, type="bytes")))',
+					'} else {',
+						'out[[n]] <- v',
+						# NA arrives as NaN, which has no integer or logical value
+						'if (is.atomic(v) && !is.factor(v) && storage.mode(v) %in% c("integer", "logical") && !anyNA(v)) out[[paste0(n, "' + _MODE + '")]] <- storage.mode(v)',
+					'}',
+				'}',
+				'out',
+			'}',
+			# strings sent as text and offsets, named as by readMat
+			'multilang$multilang.unpack <- function(l) {',
+				'for (n in names(l)[endsWith(names(l), "' + _STRINGS[1].replace('_', '.') + '")]) {',
+					'name <- substr(n, 1, nchar(n) - ' + str(len(_STRINGS[1])) + ')',
+					'text <- l[[paste0(name, "' + _STRINGS[0].replace('_', '.') + '")]]',
+					'bytes <- if (!length(text)) raw(0) else if (is.character(text)) charToRaw(enc2utf8(text[1])) else as.raw(text)',
+					'text <- rawToChar(bytes)',
+					'Encoding(text) <- "UTF-8"',
+					# bytes to characters: count the bytes that start one
+					'offsets <- c(0, cumsum(bitwAnd(as.integer(bytes), 192L) != 128L))[as.vector(l[[n]]) + 1]',
+					'l[[name]] <- substring(text, offsets[-length(offsets)] + 1, offsets[-1])',
+					'l[[n]] <- NULL',
+					'l[[paste0(name, "' + _STRINGS[0].replace('_', '.') + '")]] <- NULL',
+				'}',
+				'l',
+			'}',
+			# printed as |multilang.missing|names|; see _check_missing
+			'multilang$multilang.write <- function(con, names, envir=globalenv()) {',
+				'missing <- names[!vapply(names, exists, logical(1), envir=envir, inherits=FALSE)]',
+				'if (length(missing)) cat("\\n|multilang.missing|", paste(missing, collapse=","), "|\\n", sep="")',
+				'else do.call(writeMat, c(list(con), multilang.export(names, envir)))',
+				'invisible()',
+			'}',
+			# printed as |multilang.meta|name|class|mode|dims|; see multilang.refs
+			'multilang$multilang.meta <- function(names, envir=globalenv()) {',
+				'for (n in names) {',
+					'if (!exists(n, envir=envir, inherits=FALSE)) { cat("\\n|multilang.missing|", n, "|\\n", sep=""); next }',
+					'v <- get(n, envir=envir)',
+					'd <- dim(v)',
+					'if (is.null(d)) d <- length(v)',
+					'm <- storage.mode(v)',
+					'if (m %in% c("integer", "logical") && is.atomic(v) && anyNA(v)) m <- "double"',
+					'cat("\\n", paste("", "multilang.meta", n, class(v)[1], m, paste(d, collapse=","), "", sep="|"), "\\n", sep="")',
+				'}',
+			'}',
+			# Python indices along a dimension of length n, as 1-based R indices
+			'multilang$multilang.index <- function(n, i) {',
+				'if (any(i < -n | i >= n)) stop("' + _RANGE + '")',
+				'ifelse(i < 0, i + n, i) + 1',
+			'}',
+			'multilang$multilang.slice <- function(n, start, stop, step) {',
+				'if (step > 0) {',
+					'start <- if (is.null(start)) 0 else if (start < 0) max(start + n, 0) else min(start, n)',
+					'stop <- if (is.null(stop)) n else if (stop < 0) max(stop + n, 0) else min(stop, n)',
+					'if (start >= stop) integer(0) else seq(start, stop - 1, by=step) + 1',
+				'} else {',
+					'start <- if (is.null(start)) n - 1 else if (start < 0) max(start + n, -1) else min(start, n - 1)',
+					'stop <- if (is.null(stop)) -1 else if (stop < 0) max(stop + n, -1) else min(stop, n - 1)',
+					'if (start <= stop) integer(0) else seq(start, stop + 1, by=step) + 1',
+				'}',
+			'}',
+		'})'
+	]
+
+# Matlab indexing with up to 3 levels of brackets, eg. (f(g(1))) or {i}
+_BRACKETS = r'\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)|\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\}'
+
+# calls that can touch any variable
+_DYNAMIC = {
+		'r': re.compile(r'<<-|->>|(?<![\w.])(?:assign|eval|evalq|source|sys\.source|load|attach|rm|remove|list2env|local)\s*\('),
+		'm': re.compile(r'(?<!\w)(?:eval|evalin|assignin|load|clear|clearvars|run|importdata)(?!\w)')
+	}
+
+
+
+# --------------------------- Helper Functions --------------------------- #
+def content_hash(_value):
+	"""Return a fast digest of the content of @_value
+
+	Hashes of read-only np.ndarrays are cached until the array is freed.
+
+	Parameters
+	----------
+	_value : object
+		The value to hash
+
+	Returns
+	-------
+	str, None
+		The hex digest
+		None if @_value cannot be hashed
+	"""
+	if isinstance(_value, np.ndarray) and not _value.flags.writeable:
+		# immutable buffer, so the hash can be reused
+		_cached = _HASHES.get(id(_value))
+		if _cached and _cached[0]() is _value:
+			return _cached[1]
+
+		_digest = _hash(_value)
+		if _digest is not None:
+			_key = id(_value)
+			_HASHES[_key] = (weakref.ref(_value, lambda _ref: _HASHES.pop(_key, None)), _digest)
+		return _digest
+
+	return _hash(_value)
+
+def _hash(_value):
+	"""Return the hex digest of @_value without the cache; see `content_hash`"""
+	_h = hashlib.blake2b(digest_size=16)
+	_h.update(type(_value).__name__.encode())
+	try:
+		if isinstance(_value, np.ndarray) and _value.dtype.kind not in 'OV':
+			_h.update((_value.dtype.str + str(_value.shape)).encode())
+			if _value.flags.f_contiguous and not _value.flags.c_contiguous:
+				# hash the buffer in place, but mark the layout
+				_h.update(b'F')
+				_h.update(_value.T)
+			elif not _value.flags.c_contiguous and _value.ndim > 1 and _value.strides[0] < _value.strides[-1]:
+				# eg. the first rows of a Fortran-ordered array
+				_h.update(b'F')
+				_h.update(np.asfortranarray(_value).T)
+			else:
+				_h.update(np.ascontiguousarray(_value))
+
+		elif sp.issparse(_value):
+			# only the buffers, in canonical CSC form, without changing @_value
+			_value = _value.tocsc()
+			if not _value.has_canonical_format:
+				_value = _value.copy()
+				_value.sum_duplicates()
+			_h.update((_value.dtype.str + str(_value.shape)).encode())
+			for _i in [_value.indptr, _value.indices, _value.data]:
+				_h.update(np.ascontiguousarray(_i))
+
+		elif isinstance(_value, (pd.DataFrame, pd.Series)):
+			_h.update(pickle.dumps((_value.shape, list(_value.axes[-1]), [str(i) for i in np.atleast_1d(_value.dtypes)]), protocol=4))
+			_h.update(np.ascontiguousarray(pd.util.hash_pandas_object(_value, index=True).values))
+
+		else:
+			_h.update(pickle.dumps(_value, protocol=4))
+	except Exception:
+		# not something we know how to hash
+		return None
+
+	return _h.hexdigest()
+
+def _nbytes(_value):
+	"""Return roughly how many bytes @_value takes in a .mat file"""
+	if isinstance(_value, np.ndarray):
+		return _value.nbytes
+	elif isinstance(_value, (pd.DataFrame, pd.Series)):
+		return int(_value.memory_usage(index=False, deep=False).sum())
+	elif sp.issparse(_value):
+		_value = _value.tocsc()
+		return _value.data.nbytes + _value.indices.nbytes + _value.indptr.nbytes
+	return 0
+
+def _sample(_out : dict):
+	"""Return up to _SAMPLE bytes taken evenly from the arrays in @_out"""
+	_arrays = []
+	for _v in _out.values():
+		if isinstance(_v, pd.DataFrame): _arrays += [_v.iloc[:, _i].values for _i in range(_v.shape[1])]
+		elif isinstance(_v, pd.Series): _arrays.append(_v.values)
+		elif isinstance(_v, np.ndarray): _arrays.append(_v)
+		elif sp.issparse(_v): _arrays.append(_v.tocsc().data)
+	_arrays = [_a for _a in _arrays if isinstance(_a, np.ndarray) and _a.dtype.kind not in 'OV' and _a.size]
+	if not _arrays: return b''
+
+	_per = _SAMPLE // len(_arrays)
+	_bytes = []
+	for _a in _arrays:
+		_flat = _a.reshape(-1, order='A')
+		# whole elements in short runs, so repeats within a run still count
+		_run = max(1, 64 // _flat.itemsize)
+		_step = max(_run, _flat.size * _flat.itemsize // max(_per, 1))
+		_take = np.concatenate([_flat[_i:_i + _run] for _i in range(0, _flat.size, _step)[:max(1, _per // (_run * _flat.itemsize))]])
+		_bytes.append(np.ascontiguousarray(_take).tobytes())
+	return b''.join(_bytes)
+
+def compression(_out : dict, _scratch = None):
+	"""Decide how to store a .mat file of @_out
+
+	Small payloads are written as they are. Larger ones are written raw to
+	'/dev/shm' when it has room and @_scratch isn't there already;
+	otherwise they are compressed if compressing a sample suggests that
+	writing less to @_scratch would outweigh the time spent compressing.
+
+	Parameters
+	----------
+	_out : dict[str, object]
+		The variables to store
+	_scratch : optional[Scratch]
+		Where the file would go
+		Default: SCRATCH
+
+	Returns
+	-------
+	str in ['none', 'fast', 'shm']
+		'none' to write the file uncompressed
+		'fast' to compress it
+		'shm' to write it uncompressed to shared memory
+	"""
+	if COMPRESSION != 'auto': return COMPRESSION
+	_scratch = _scratch or SCRATCH
+
+	_size = sum([_nbytes(_v) for _v in _out.values()])
+	if _size < _SMALL or _scratch.shared:
+		# not worth it, or already in memory
+		return 'none'
+
+	if _SHM.shared:
+		try:
+			if shutil.disk_usage('/dev/shm').free >= 2 * _size:
+				return 'shm'
+		except OSError:
+			pass
+
+	_data = _sample(_out)
+	if not _data: return 'none'
+
+	# how well and how fast the sample compresses, at the level savemat uses
+	_start = time.perf_counter()
+	_ratio = len(zlib.compress(_data, zlib.Z_DEFAULT_COMPRESSION)) / len(_data)
+	_speed = len(_data) / max(time.perf_counter() - _start, 1e-9)
+
+	# write it all, or compress it, write less and decompress it again
+	_raw = _size / _scratch.bandwidth
+	_packed = 2 * _size / _speed + _ratio * _size / _scratch.bandwidth
+	return 'fast' if _packed < _raw else 'none'
+
+def _savemat(_file, _out : dict, _how : str):
+	"""Write @_out to @_file as decided by `compression`"""
+	if _how == 'fast':
+		sio.savemat(_file, _out, do_compression=True)
+		return
+
+	with open(_file, 'wb') as _f:
+		for _chunk in _mat_chunks(_out):
+			_f.write(_chunk)
+
+def _direct(_value):
+	"""Whether @_value is an array `_mat_chunks` can write from its own buffer"""
+	return (isinstance(_value, np.ndarray) and _value.dtype.name in _MAT5
+		and _value.dtype.isnative and sys.byteorder == 'little'
+		and 0 < _value.nbytes < 2**31)
+
+def _pad(_n : int):
+	"""Return the zero bytes that pad @_n bytes to a multiple of 8"""
+	return b'\0' * (-_n % 8)
+
+def _mat_chunks(_out : dict):
+	"""Return the contents of a .mat file of @_out as a list of buffers
+
+	R and Matlab are column-major, as are .mat files, so dense numeric
+	arrays are written from memoryviews of their column-major buffers.
+	F-contiguous arrays, such as everything that came from R or Matlab,
+	are not copied or reordered at all; other arrays are reordered once.
+	Everything else is written by `scipy.io.savemat`.
+	"""
+	_rest = BytesIO()
+	sio.savemat(_rest, {_k: _v for _k, _v in _out.items() if not _direct(_v)})
+	_chunks = [_rest.getvalue()]
+
+	for _k, _v in _out.items():
+		if not _direct(_v): continue
+
+		# as savemat: scalars are 1x1 and 1D arrays are rows
+		_shape = _v.shape if _v.ndim > 1 else (1, _v.size)
+		_class, _type = _MAT5[_v.dtype.name]
+		_flags = _class | (0x200 if _v.dtype == bool else 0)
+		_name = _k.encode()
+
+		# the transpose of an F-contiguous array is a C-contiguous view
+		_data = memoryview(np.asfortranarray(_v).T).cast('B')
+
+		_head = (
+			struct.pack('<4I', 6, 8, _flags, 0)
+			+ struct.pack('<2I', 5, 4 * len(_shape)) + struct.pack('<' + str(len(_shape)) + 'i', *_shape) + _pad(4 * len(_shape))
+			+ struct.pack('<2I', 1, len(_name)) + _name + _pad(len(_name))
+			+ struct.pack('<2I', _type, _data.nbytes)
+		)
+		_size = len(_head) + _data.nbytes + len(_pad(_data.nbytes))
+		_chunks += [struct.pack('<2I', 14, _size) + _head, _data, _pad(_data.nbytes)]
+	return _chunks
+
+def _cast(_value, _dtype : str):
+	"""Return @_value as @_dtype if it is a numpy array or scalar"""
+	if isinstance(_value, np.ndarray) and _value.dtype != _dtype:
+		return _value.astype(_dtype)
+	elif isinstance(_value, np.generic) and _value.dtype != _dtype:
+		return np.dtype(_dtype).type(_value)
+	return _value
+
+def _dtype(_value):
+	"""Return the name of the dtype of @_value if it is a numpy array or scalar"""
+	if isinstance(_value, (np.ndarray, np.generic)):
+		return _value.dtype.name
+	return None
+
+def _strings(_value):
+	"""Return @_value as a list if it is a non-empty vector of strings
+	None otherwise"""
+	if isinstance(_value, np.ndarray) and _value.ndim == 1 and _value.dtype.kind in 'UO':
+		_value = _value.tolist()
+	if isinstance(_value, (list, tuple)) and _value and all([isinstance(i, str) for i in _value]):
+		return list(_value)
+	return None
+
+def _pack_strings(_value : list):
+	"""Return the strings @_value as the UTF-8 bytes of their text
+	and the byte where each ends"""
+	_encoded = [i.encode('utf-8', 'surrogatepass') for i in _value]
+	_offsets = np.cumsum([0] + [len(i) for i in _encoded])
+	_text = np.frombuffer(b''.join(_encoded), dtype=np.uint8)
+	return _text, _offsets.astype(np.int32 if _offsets[-1] < 2**31 else np.float64)
+
+def _unpack_strings(_text, _offsets):
+	"""Return the text @_text, as UTF-8 bytes or a str, split at the
+	byte offsets @_offsets as an np.ndarray of str"""
+	_text = np.atleast_1d(_text)
+	if _text.dtype.kind in 'iuf':
+		_text = _text.astype(np.uint8).tobytes()
+	else:
+		_text = ''.join(_text.astype(str).tolist()).encode('utf-8', 'surrogatepass')
+	_offsets = np.atleast_1d(_offsets).astype(np.int64)
+	_out = np.empty(len(_offsets) - 1, dtype=object)
+	_out[:] = [_text[i:j].decode('utf-8', 'surrogatepass') for i, j in zip(_offsets[:-1], _offsets[1:])]
+	return _out
+
+def _for_r(_out : dict):
+	"""Cast @_out as set by PROMOTION for R
+	Vectors of strings are packed; see `_pack_strings`
+
+	Returns
+	-------
+	dict[str, object]
+		@_out with each array as the dtype that carries its R storage mode
+	dict[str, str]
+		{name: mode} for those whose mode must be set once in R
+	"""
+	_cast_out, _modes = {}, {}
+	for _k, _v in _out.items():
+		if _strings(_v) is not None:
+			_cast_out[_k + _STRINGS[0]], _cast_out[_k + _STRINGS[1]] = _pack_strings(_strings(_v))
+			continue
+		_mode = PROMOTION.get(_dtype(_v), (None,))[0]
+		if _mode in _R_DTYPES:
+			_v = _cast(_v, _R_DTYPES[_mode])
+			if _mode != 'double': _modes[_k] = _mode
+		_cast_out[_k] = _v
+	return _cast_out, _modes
+
+def _for_mat(_out : dict):
+	"""Return @_out cast as set by PROMOTION for Matlab
+	Vectors of strings are packed; see `_pack_strings`"""
+	_cast_out = {}
+	for _k, _v in _out.items():
+		if _strings(_v) is not None:
+			_cast_out[_k + _STRINGS[0]], _cast_out[_k + _STRINGS[1]] = _pack_strings(_strings(_v))
+		elif PROMOTION.get(_dtype(_v), (0, 0))[1] in _MAT_DTYPES:
+			_cast_out[_k] = _cast(_v, _MAT_DTYPES[PROMOTION[_dtype(_v)][1]])
+		else:
+			_cast_out[_k] = _v
+	return _cast_out
+
+def _storage_mode(_modes : dict):
+	"""Return the R code setting the storage mode of each of @_modes"""
+	return ['storage.mode(' + _k + ') <- "' + _v + '"' for _k, _v in _modes.items()]
+
+def _index(_key):
+	"""Sort a Python index along one dimension
+	Returns ('all' | 'slice' | 'names' | 'mask' | 'ints', @_key as a list or slice)"""
+	if _key is None:
+		return 'all', None
+	elif isinstance(_key, slice):
+		if _key.step == 0: raise ValueError('slice step cannot be zero')
+		return 'slice', _key
+	elif isinstance(_key, (str, int, np.integer, bool, np.bool_)):
+		_key = [_key]
+
+	_key = list(_key)
+	if _key and all([isinstance(i, str) for i in _key]):
+		return 'names', _key
+	elif _key and all([isinstance(i, (bool, np.bool_)) for i in _key]):
+		return 'mask', _key
+	elif all([isinstance(i, (int, np.integer)) for i in _key]):
+		return 'ints', [int(i) for i in _key]
+	raise TypeError('Unrecognized index: ' + str(_key))
+
+def _r_index(_key, _extent : str, _length : int = None):
+	"""Return R code indexing like the Python index @_key
+	along a dimension whose length is the R code @_extent
+	Integers out of range raise an IndexError if @_length is given,
+	and stop in R otherwise"""
+	_kind, _key = _index(_key)
+	if _kind == 'all':
+		return ''
+	elif _kind == 'slice':
+		return 'multilang.slice(' + ', '.join([_extent] + ['NULL' if i is None else str(int(i)) for i in [_key.start, _key.stop]] + [str(int(_key.step or 1))]) + ')'
+	elif _kind == 'names':
+		return 'c(' + ', '.join(['"' + i.replace('\\', '\\\\').replace('"', '\\"') + '"' for i in _key]) + ')'
+	elif _kind == 'mask':
+		return 'c(' + ', '.join(['TRUE' if i else 'FALSE' for i in _key]) + ')'
+
+	if _length is not None:
+		for i in _key:
+			if not -_length <= i < _length:
+				raise IndexError('index ' + str(i) + ' is out of bounds for length ' + str(_length))
+	return 'multilang.index(' + _extent + ', c(' + ', '.join([str(i) for i in _key]) + '))' if _key else 'integer(0)'
+
+def _end(_offset : int):
+	"""Return Matlab's `end` shifted by @_offset"""
+	return 'end' if not _offset else 'end' + ('+' if _offset > 0 else '') + str(_offset)
+
+def _mat_index(_key):
+	"""Return Matlab code indexing like the Python index @_key"""
+	_kind, _key = _index(_key)
+	if _kind == 'all':
+		return ':'
+	elif _kind == 'names':
+		return '{' + ', '.join(['\'' + i.replace('\'', '\'\'') + '\'' for i in _key]) + '}'
+	elif _kind == 'mask':
+		return 'logical([' + ' '.join(['1' if i else '0' for i in _key]) + '])'
+	elif _kind == 'ints':
+		return '[' + ' '.join([str(i + 1) if i >= 0 else _end(i + 1) for i in _key]) + ']'
+
+	# slices are clamped to the dimension, as in Python
+	_start, _stop, _step = _key.start, _key.stop, _key.step or 1
+	if _step > 0:
+		_start = '1' if _start is None else str(_start + 1) if _start >= 0 else 'max(' + _end(_start + 1) + ', 1)'
+		_stop = 'end' if _stop is None else 'min(' + str(_stop) + ', end)' if _stop >= 0 else _end(_stop)
+	else:
+		_start = 'end' if _start is None else 'min(' + str(_start + 1) + ', end)' if _start >= 0 else _end(_start + 1)
+		_stop = '1' if _stop is None else str(_stop + 2) if _stop >= 0 else 'max(' + _end(_stop + 2) + ', 1)'
+	return _start + ':' + (str(_step) + ':' if _step != 1 else '') + _stop
+
+def _number(_x, _kind : str, _lang : str):
+	"""Return the literal of one number of numpy dtype kind @_kind in @_lang"""
+	if _kind == 'b':
+		return ('TRUE' if _x else 'FALSE') if _lang == 'r' else ('true' if _x else 'false')
+	elif _kind in 'iu':
+		return str(int(_x))
+	elif np.isnan(_x):
+		return 'NaN'
+	elif np.isinf(_x):
+		return ('-' if _x < 0 else '') + 'Inf'
+	return repr(float(_x))
+
+def _literal(_value, _lang : str):
+	"""Return @_value as an R or Matlab literal
+
+	Parameters
+	----------
+	_value : object
+		The value to write
+	_lang : str in ['r', 'm']
+		The language to write it in
+
+	Returns
+	-------
+	str, None
+		The code for @_value, as it would have arrived through a .mat file
+		None if @_value is too big or can't be written as a literal
+	"""
+	if isinstance(_value, str):
+		# printable ASCII only, as the terminal may not be UTF-8
+		if len(_value) > _LITERAL_STR or not all([' ' <= i <= '~' for i in _value]):
+			return None
+		elif _lang == 'r':
+			return '"' + _value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+		return '\'' + _value.replace('\'', '\'\'') + '\''
+
+	if isinstance(_value, (bool, int, float, np.generic)) or (isinstance(_value, (list, tuple)) and _value and all([isinstance(i, (bool, int, float)) for i in _value])):
+		_value = np.asarray(_value)
+	if not isinstance(_value, np.ndarray) or _value.dtype.kind not in 'biuf' or _value.ndim > 2 or not 0 < _value.size <= LITERAL:
+		return None
+	if _value.dtype.kind in 'iu' and max(-int(_value.min()), int(_value.max())) >= 2**31:
+		# past what R integers hold, and Matlab's parser reads numbers as doubles
+		return None
+
+	_mode = PROMOTION.get(_value.dtype.name, (None, None))[0 if _lang == 'r' else 1]
+	if not _mode:
+		return None
+	_value = _cast(_value, _R_DTYPES[_mode] if _lang == 'r' else _MAT_DTYPES[_mode])
+	_kind = _value.dtype.kind
+
+	if _lang == 'r':
+		_numbers = [_number(i, _kind, 'r') + ('L' if _kind in 'iu' else '') for i in _value.ravel(order='F')]
+		# scalars are 1x1 and 1D arrays are row vectors, as readMat makes them
+		return 'matrix(c(' + ', '.join(_numbers) + '), nrow=' + str(_value.shape[0] if _value.ndim == 2 else 1) + ')'
+
+	_rows = np.atleast_2d(_value)
+	_code = '[' + '; '.join([' '.join([_number(i, _kind, 'm') for i in _row]) for _row in _rows]) + ']' if _value.ndim else _number(_value, _kind, 'm')
+	return _code if _mode in ['double', 'logical'] else _mode + '(' + _code + ')'
+
+def _literals(_send : dict, _lang : str):
+	"""Split the literals out of @_send
+
+	Returns
+	-------
+	dict[str, object]
+		The variables to send through a file
+	list[str]
+		The code assigning the rest as literals
+	"""
+	_rest, _code = {}, []
+	for _k, _v in _send.items():
+		_lit = _literal(_v, _lang)
+		if _lit is None: _rest[_k] = _v
+		else: _code.append(_k + (' <- ' if _lang == 'r' else ' = ') + _lit + ('' if _lang == 'r' else ';'))
+	return _rest, _code
+
+def _rows(_value):
+	"""Return the number of rows @_value can be appended along
+	None if rows can't be appended to @_value"""
+	if isinstance(_value, np.ndarray) and _value.ndim in [1, 2] and _value.dtype.kind not in 'OVSU':
+		return _value.shape[0]
+	elif isinstance(_value, pd.DataFrame):
+		return _value.shape[0]
+	return None
+
+def _head(_value, _n : int):
+	"""Return the first @_n rows of @_value"""
+	return _value.iloc[:_n] if isinstance(_value, pd.DataFrame) else _value[:_n]
+
+def _tail(_value, _n : int):
+	"""Return all but the first @_n rows of @_value"""
+	return _value.iloc[_n:] if isinstance(_value, pd.DataFrame) else _value[_n:]
+
+def _unchanged(_out : dict, _object):
+	"""Split @_out by the manifest of @_object
+
+	Parameters
+	----------
+	_out : dict[str, object]
+		The variables to send
+	_object : RObject, MatlabObject
+		The environment they are being sent to
+
+	Returns
+	-------
+	dict[str, object]
+		The variables that need to be sent whole
+	dict[str, object]
+		The new rows of variables that only had rows appended
+	dict[str, tuple(str, int)]
+		The manifest entries for all of @_out
+	"""
+	_send, _append, _entries = {}, {}, {}
+	for _k, _v in _out.items():
+		_entries[_k] = (content_hash(_v), _rows(_v))
+		_old = _object.manifest.get(_k)
+
+		if _entries[_k][0] is None or not _old:
+			# unknown, so send it
+			_send[_k] = _v
+		elif _old == _entries[_k]:
+			# unchanged
+			continue
+		elif _old[1] and _entries[_k][1] and _entries[_k][1] > _old[1] and content_hash(_head(_v, _old[1])) == _old[0]:
+			# only had rows added
+			_append[_k] = _tail(_v, _old[1])
+		else:
+			_send[_k] = _v
+	return _send, _append, _entries
+
+def _remember(_entries : dict, _object):
+	"""Record @_entries in the manifest of @_object after a successful send"""
+	_object.manifest.update({_k: _v for _k, _v in _entries.items() if _v[0] is not None})
+
+def assigned(_code : str, _names, _lang : str):
+	"""Find which of @_names may have been assigned to by @_code
+
+	Errs on the side of caution: any name that looks like the target of an
+	assignment is returned, as is everything if @_code uses a construct
+	that can change arbitrary variables (e.g. `assign`, `eval`, `load`).
+
+	Parameters
+	----------
+	_code : str
+		The R or Matlab code that was run
+	_names : Iterable[str]
+		The variable names to check
+	_lang : str in ['r', 'm']
+		The language of @_code
+
+	Returns
+	-------
+	None, list[str]
+		None if any variable may have changed
+		Otherwise the names in @_names that may have changed
+	"""
+	if _DYNAMIC[_lang].search(_code):
+		return None
+
+	_out = []
+	for _name in _names:
+		_n = re.escape(_name)
+		if _lang == 'r':
+			# x <- , x[i] <- , x$a = , x %<>% , levels(x)[i] <- , -> x ,
+			# for (x in , x[, a := 1] , setnames(x,
+			_pattern = (r'(?<![\w.])' + _n + r'(?![\w.])\s*(?:\[[^\]]*\]+|\$[\w.]+|@[\w.]+)*\s*(?:<-|=(?!=)|%<>%)'
+				+ r'|[\w.]+\(\s*' + _n + r'(?![\w.])[^)]*\)+\s*(?:\[[^\]]*\]+|\$[\w.]+|@[\w.]+)*\s*(?:<-|=(?!=))'
+				+ r'|->\s*' + _n + r'(?![\w.])'
+				+ r'|\bfor\s*\(\s*' + _n + r'\s+in\b'
+				+ r'|(?<![\w.])' + _n + r'(?![\w.])\s*\[[^\]]*:='
+				+ r'|(?<![\w.])set\w*\(\s*' + _n + r'(?![\w.])')
+		else:
+			# x = , x(f(i)) = , x{i}.a = , [a, x] =
+			_pattern = (r'(?<!\w)' + _n + r'(?!\w)\s*(?:' + _BRACKETS + r'|\.\w+)*\s*=(?!=)'
+				+ r'|\[[^\]]*(?<!\w)' + _n + r'(?!\w)[^\]]*\]\s*=(?!=)')
+		if re.search(_pattern, _code):
+			_out.append(_name)
+	return _out
+
+
+
+class Scratch:
+	"""A per-session directory for the files used to move variables
+
+	The directory is made on first use in the fastest writable location:
+	'/dev/shm' if it has room for the whole quota, otherwise the system
+	temp directory. It is removed when Python exits.
+	Files are deleted as soon as they have been loaded; if leftovers from
+	failed transfers push the directory over its quota, the oldest are
+	deleted first. Only leftovers are deleted: files handed out and not yet
+	released, and those of other processes still running, eg. other workers
+	of a sweep, are kept.
+
+	Attributes
+	----------
+	quota : int
+		The most bytes the directory may hold
+	path : str
+		The directory; made if needed
+	shared : bool
+		Whether the directory is in memory
+	bandwidth : float
+		How many bytes per second can be written to the directory
+
+	Functions
+	---------
+	file
+		Get a new path in the directory
+	release
+		Delete a file from the directory
+	cleanup
+		Delete the directory
+	"""
+	def __init__(self, base : str = None, quota : int = 4 * 2**30):
+		"""Setup a Scratch
+
+		Parameters
+		----------
+		base : optional[str]
+			Where to make the directory
+			Default: '/dev/shm' if there's space, else the system temp directory
+		quota : int
+			The most bytes the directory may hold
+			Default: 4 GiB
+		"""
+		self._base = base
+		self._path = None
+		self._counter = itertools.count()
+		self._bandwidth = None
+		self._lock = threading.Lock()
+		# the paths handed out and not yet released
+		self._live = set()
+		self.quota = quota
+
+	@property
+	def path(self):
+		"""The scratch directory; made if needed"""
+		with self._lock:
+			# files may be made from several threads
+			if self._path and os.path.isdir(self._path):
+				return self._path
+			return self._make()
+
+	def _make(self):
+		"""Make the scratch directory"""
+		_base = self._base
+		if not _base:
+			# tmpfs if there's room for everything
+			_base = gettempdir()
+			if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+				try:
+					if shutil.disk_usage('/dev/shm').free >= self.quota:
+						_base = '/dev/shm'
+				except OSError:
+					pass
+
+		self._path = mkdtemp(prefix='multilang-', dir=_base)
+		atexit.register(shutil.rmtree, self._path, True)
+		return self._path
+
+	@property
+	def shared(self):
+		"""Whether the scratch directory is in memory"""
+		_base = self._base or self.path
+		return os.path.realpath(_base).startswith('/dev/shm') and os.access(_base, os.W_OK)
+
+	@property
+	def bandwidth(self):
+		"""How many bytes per second can be written to the scratch directory
+		Measured once by writing 4 MiB"""
+		if self._bandwidth is None:
+			_file = self.file('.probe')
+			_data = os.urandom(4 * 2**20)
+			try:
+				_start = time.perf_counter()
+				with open(_file, 'wb') as _f:
+					_f.write(_data)
+					_f.flush()
+					os.fsync(_f.fileno())
+				self._bandwidth = len(_data) / max(time.perf_counter() - _start, 1e-9)
+			except OSError:
+				# assume a slow disk
+				self._bandwidth = 100 * 2**20
+			finally:
+				self.release(_file)
+		return self._bandwidth
+
+	def file(self, suffix : str = '.mat'):
+		"""Return a new path in the scratch directory
+		Makes room for it if over quota; the file is not created
+
+		Parameters
+		----------
+		suffix : str
+			The file extension
+			Default: '.mat'
+
+		Returns
+		-------
+		str
+			The full path of the new file
+		"""
+		_path = self.path
+
+		# the oldest leftovers go first
+		_files = []
+		for _i in os.scandir(_path):
+			try: _files.append((_i.stat().st_mtime, _i.stat().st_size, _i.path))
+			except OSError: pass
+		_used = sum([_i[1] for _i in _files])
+		for _, _size, _file in sorted(_files):
+			if _used <= self.quota: break
+			if self._stale(_file):
+				self.release(_file)
+				_used -= _size
+
+		# the pid keeps forked workers apart
+		_file = os.path.join(_path, str(os.getpid()) + '-' + str(next(self._counter)) + suffix)
+		with self._lock:
+			self._live.add(_file)
+		return _file
+
+	def _stale(self, path : str):
+		"""Whether @path is a leftover: made by this process and released,
+		or by a process that has exited"""
+		_pid = os.path.basename(path).split('-')[0]
+		if not _pid.isdigit():
+			return False
+		elif int(_pid) == os.getpid():
+			with self._lock:
+				return path not in self._live
+		try:
+			os.kill(int(_pid), 0)
+		except ProcessLookupError:
+			return True
+		except OSError:
+			# running, as someone else
+			pass
+		return False
+
+	def release(self, path : str):
+		"""Delete @path if it exists"""
+		with self._lock:
+			self._live.discard(path)
+		try: os.remove(path)
+		except OSError: pass
+
+	def cleanup(self):
+		"""Delete the scratch directory and everything in it"""
+		if self._path: shutil.rmtree(self._path, ignore_errors=True)
+		self._path = None
+
+SCRATCH = Scratch()
+# raw files that didn't fit in SCRATCH's memory budget
+_SHM = Scratch('/dev/shm')
+
+
+
+class _Pipe:
+	"""A named pipe whose Python end is served from a thread
+
+	Attributes
+	----------
+	name : str
+		The path of the pipe, to be opened by R
+	buffer : BytesIO
+		What was read from the pipe if @mode is 'r'
+	"""
+	def __init__(self, mode : str, data : list = None):
+		"""Make the pipe and start serving it
+
+		Parameters
+		----------
+		mode : str in ['r', 'w']
+			Whether Python reads from or writes to the pipe
+		data : list[bytes-like]
+			What to write if @mode is 'w', in order
+		"""
+		self.name = SCRATCH.file('.fifo')
+		os.mkfifo(self.name)
+
+		self._mode = mode
+		self._data = data or []
+		self.buffer = BytesIO()
+
+		# opening blocks until R opens the other end
+		self._thread = threading.Thread(target=self._serve, daemon=True)
+		self._thread.start()
+
+	def _serve(self):
+		"""Write or read the whole pipe"""
+		try:
+			with open(self.name, 'wb' if self._mode == 'w' else 'rb') as _f:
+				if self._mode == 'w':
+					for _chunk in self._data: _f.write(_chunk)
+				else: shutil.copyfileobj(_f, self.buffer)
+		except OSError:
+			# R went away or never opened its end
+			pass
+
+	def close(self):
+		"""Wait for the thread to finish and remove the pipe"""
+		self._thread.join(0.05)
+		while self._thread.is_alive():
+			# if R never opened its end, open it ourselves so the thread returns
+			try: os.close(os.open(self.name, (os.O_RDONLY if self._mode == 'w' else os.O_WRONLY) | os.O_NONBLOCK))
+			except OSError: pass
+			self._thread.join(0.05)
+		SCRATCH.release(self.name)
+		self.buffer.seek(0)
+
+def _classes(_file):
+	"""Return {name: Matlab class} for the variables in a .mat file"""
+	if hasattr(_file, 'seek'): _file.seek(0)
+	_out = {_i[0]: _i[2] for _i in sio.whosmat(_file)}
+	if hasattr(_file, 'seek'): _file.seek(0)
+	return _out
+
+def _segments(_bundle : dict):
+	"""Split @_bundle into the parts to encode
+	One per variable if there are WORKERS to share them and enough data,
+	keeping the text and offsets of packed strings together"""
+	if WORKERS > 1 and len(_bundle) > 1 and sum([_nbytes(_v) for _v in _bundle.values()]) >= _SMALL:
+		_parts = {}
+		for _k, _v in _bundle.items():
+			_base = _k[:-len(_STRINGS[1])] + _STRINGS[0] if _k.endswith(_STRINGS[1]) else _k
+			_parts.setdefault(_base, {})[_k] = _v
+		return list(_parts.values())
+	return [_bundle]
+
+def _encode(_parts : list, _fifo : bool = False):
+	"""Encode each of @_parts as its own .mat file, in parallel if more than one
+
+	Parameters
+	----------
+	_parts : list[dict[str, object]]
+		The variables to put in each file
+	_fifo : bool
+		Whether to encode into memory for a named pipe instead of a file
+		Default: False
+
+	Returns
+	-------
+	list[tuple(list[bytes-like], None)]
+		The encoded data of each of @_parts if @_fifo; see `_mat_chunks`
+	list[tuple(str, Scratch)]
+		Otherwise the file each was written to and where it lives
+	"""
+	def _one(_part):
+		if _fifo:
+			# already in memory
+			return _mat_chunks(_part), None
+
+		_how = compression(_part)
+		_scratch = _SHM if _how == 'shm' else SCRATCH
+		_file = _scratch.file()
+		try:
+			_savemat(_file, _part, _how)
+		except Exception:
+			_scratch.release(_file)
+			raise
+		return _file, _scratch
+
+	if len(_parts) == 1:
+		return [_one(_parts[0])]
+	with ThreadPoolExecutor(min(WORKERS, len(_parts))) as _pool:
+		_futures = [_pool.submit(_one, _part) for _part in _parts]
+	# all finished, so the files of the others can be released if one failed
+	_failed = [_f.exception() for _f in _futures if _f.exception() is not None]
+	if _failed:
+		for _f in _futures:
+			if _f.exception() is None and _f.result()[1] is not None:
+				_f.result()[1].release(_f.result()[0])
+		raise _failed[0]
+	return [_f.result() for _f in _futures]
+
+def _loadmat(_file, _lang : str = 'r'):
+	"""Load a .mat file without its metadata
+	Unpacks vectors of strings into np.ndarrays of str
+	Puts back together sparse matrices sent as buffers by R
+	and casts arrays as set by FROM_R or FROM_MAT for @_lang in ['r', 'm']"""
+	_loaded = sio.loadmat(_file, squeeze_me=True)
+	del _loaded['__globals__'], _loaded['__header__'], _loaded['__version__']
+
+	for _k in [_k for _k in _loaded if _k.endswith(_STRINGS[1])]:
+		_name = _k[:-len(_STRINGS[1])]
+		_loaded[_name] = _unpack_strings(_loaded.pop(_name + _STRINGS[0]), _loaded.pop(_k))
+
+	if _lang == 'm':
+		# logical arrays load as uint8
+		_names = {np.dtype(_v).name: _k for _k, _v in _MAT_DTYPES.items()}
+		_class = _classes(_file) if any([_dtype(_v) == 'uint8' for _v in _loaded.values()]) else {}
+		for _k, _v in _loaded.items():
+			_c = _class.get(_k, _names.get(_dtype(_v)))
+			if _c in FROM_MAT: _loaded[_k] = _cast(_v, FROM_MAT[_c])
+		return _loaded
+
+	for _k in [_k for _k in _loaded if _k.endswith(_MODE)]:
+		_name, _mode = _k[:-len(_MODE)], str(_loaded.pop(_k))
+		if _name in _loaded and _mode in FROM_R: _loaded[_name] = _cast(_loaded[_name], FROM_R[_mode])
+
+	for _k in [_k for _k in _loaded if _k.endswith(_SPARSE[2])]:
+		_name = _k[:-len(_SPARSE[2])]
+		_i, _p, _x, _dim = [np.atleast_1d(_loaded.pop(_name + _s)) for _s in _SPARSE]
+		_loaded[_name] = sp.csc_matrix((_x, _i.astype(np.int64), _p.astype(np.int64)), shape=tuple(_dim.astype(int)))
+	return _loaded
+
+def _r_export(_con : str, _names):
+	"""Return the R code to write @_names to the connection or file @_con
+	Nothing is written if any are missing; see `_check_missing`
+	Sparse matrices are written as buffers; see `_loadmat`"""
+	return 'multilang.write(' + _con + ', c(' + ', '.join(['"' + i + '"' for i in _names]) + '))'
+
+def _mat_export(_file : str, _names):
+	"""Return the Matlab code to save @_names to @_file
+	Nothing is saved if any are missing; see `_check_missing`
+	String arrays are saved as text and offsets; see `_STRINGS`"""
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	_ok, _s = _random_name + 'ok', _random_name + 's'
+	return ' '.join(
+		[
+			_ok + ' = true;'
+		] + [
+			'if ~exist(\'' + i + '\', \'var\'), fprintf(\'\\n|multilang.missing|%s|\\n\', \'' + i + '\'); ' + _ok + ' = false; end;'
+				for i in _names
+		] + [
+			'if ' + _ok + ', ' + _s + ' = struct();'
+		] + [
+			'if isstring(' + i + ') && isvector(' + i + ') && ~any(ismissing(' + i + ')), '
+				+ _s + '.' + i + _STRINGS[0] + ' = unicode2native(char(join(' + i + '(:)\', \'\')), \'UTF-8\'); '
+				+ _s + '.' + i + _STRINGS[1] + ' = cumsum([0 cellfun(@(c) numel(unicode2native(c, \'UTF-8\')), cellstr(' + i + '(:)\'))]); '
+				+ 'else, ' + _s + '.' + i + ' = ' + i + '; end;'
+				for i in _names
+		] + [
+			'save(\'' + _file + '\', \'-struct\', \'' + _s + '\'); end;',
+			'clear ' + _ok + ' ' + _s + ';'
+		]
+	)
+
+def _check_missing(_object, _lang : str):
+	"""Raise a NameError for any variables the last command said were missing"""
+	_missing = [j for i in _MISSING.findall(_object.before) for j in i.split(',')]
+	if _missing:
+		raise NameError(', '.join(_missing) + ' not in ' + ('R' if _lang == 'r' else 'Matlab') + ' environment')
+
+def _mat_import(_file : str, _append : dict = None):
+	"""Return the Matlab code to load @_file
+	Puts back together sparse matrices sent as buffers by R,
+	unpacks vectors of strings into string arrays
+	and gives integer and logical arrays from R their class in PROMOTION
+	The variables in @_append as {name: ndim} are new rows to append"""
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	_s, _f, _n, _d, _t = [_random_name + i for i in 'sfndt']
+	_i, _p, _x, _dim = ['[' + _n + ' \'' + i + '\']' for i in _SPARSE]
+	return ' '.join([
+			_s + ' = load(\'' + _file + '\');',
+			'for ' + _f + ' = fieldnames(' + _s + ')\',',
+				_f + ' = ' + _f + '{1};',
+				'if numel(' + _f + ') > ' + str(len(_SPARSE[2])) + ' && strcmp(' + _f + '(end-' + str(len(_SPARSE[2]) - 1) + ':end), \'' + _SPARSE[2] + '\'),',
+					_n + ' = ' + _f + '(1:end-' + str(len(_SPARSE[2])) + ');',
+					_d + ' = double(' + _s + '.(' + _dim + '));',
+					# CSC to triplets, with 1-based indices
+					_s + '.(' + _n + ') = sparse(double(' + _s + '.(' + _i + ')(:)) + 1, repelem((1:' + _d + '(2))\', diff(double(' + _s + '.(' + _p + ')(:)))), double(' + _s + '.(' + _x + ')(:)), ' + _d + '(1), ' + _d + '(2));',
+					_s + ' = rmfield(' + _s + ', {' + _i + ', ' + _p + ', ' + _x + ', ' + _dim + '});',
+				'end;',
+			'end;',
+			'for ' + _f + ' = fieldnames(' + _s + ')\',',
+				_f + ' = ' + _f + '{1};',
+				'if numel(' + _f + ') > ' + str(len(_MODE)) + ' && strcmp(' + _f + '(end-' + str(len(_MODE) - 1) + ':end), \'' + _MODE + '\'),',
+					_n + ' = ' + _f + '(1:end-' + str(len(_MODE)) + ');',
+					# R integer and logical to their Matlab class
+					'switch ' + _s + '.(' + _f + '),',
+				] + [
+					'case \'' + _k + '\', ' + _s + '.(' + _n + ') = ' + PROMOTION[_v][1] + '(' + _s + '.(' + _n + '));'
+						for _k, _v in _R_DTYPES.items() if _k != 'double' and _v in PROMOTION
+				] + [
+					'end;',
+					_s + ' = rmfield(' + _s + ', ' + _f + ');',
+				'end;',
+			'end;',
+			'for ' + _f + ' = fieldnames(' + _s + ')\',',
+				_f + ' = ' + _f + '{1};',
+				'if numel(' + _f + ') > ' + str(len(_STRINGS[1])) + ' && strcmp(' + _f + '(end-' + str(len(_STRINGS[1]) - 1) + ':end), \'' + _STRINGS[1] + '\'),',
+					_n + ' = ' + _f + '(1:end-' + str(len(_STRINGS[1])) + ');',
+					_t + ' = ' + _s + '.([' + _n + ' \'' + _STRINGS[0] + '\']);',
+					# UTF-8 bytes from Python, text from R
+					'if ischar(' + _t + '), ' + _t + ' = unicode2native(' + _t + '(:)\', \'UTF-8\'); end;',
+					_s + '.(' + _n + ') = string(cellfun(@(b) native2unicode(b, \'UTF-8\'), mat2cell(uint8(' + _t + '(:)\'), 1, diff(double(' + _s + '.(' + _f + ')(:)\'))), \'UniformOutput\', false));',
+					_s + ' = rmfield(' + _s + ', {[' + _n + ' \'' + _STRINGS[0] + '\'], ' + _f + '});',
+				'end;',
+			'end;',
+		] + [
+			# 1D arrays are row vectors
+			_k + ' = [' + _k + (', ' if _ndim == 1 else '; ') + _s + '.' + _k + ']; ' + _s + ' = rmfield(' + _s + ', \'' + _k + '\');'
+				for _k, _ndim in (_append or {}).items()
+		] + [
+			'for ' + _f + ' = fieldnames(' + _s + ')\',',
+				'assignin(\'base\', ' + _f + '{1}, ' + _s + '.(' + _f + '{1}));',
+			'end;',
+			'clear ' + ' '.join([_s, _f, _n, _d, _t]) + ';'
+		])
+
+
+
+# ---------------------------- Main Functions ---------------------------- #
+def to_r(_out : dict, _r_object):
+	"""Send variables to R, skipping those R already has
+
+	Parameters
+	----------
+	_out : dict[str, object]
+		The variables to send as {name: value}
+	_r_object : RObject
+		The R environment to load the variables into
+
+	Returns
+	-------
+	RObject
+		@_r_object with the given variables loaded
+	"""
+	_send, _append, _entries = _unchanged(_out, _r_object)
+	if not _send and not _append:
+		# nothing new
+		return _r_object
+
+	# small things go straight into the command
+	_send, _code = _literals(_send, 'r')
+	if not _send and not _append:
+		# one per line, as R's console limits line length
+		_r_object.sendlines(_code)
+		_remember(_entries, _r_object)
+		return _r_object
+
+	# bundle the variables
+	_bundle, _modes = _for_r(dict(_send, **_append))
+	_parts = _encode(_segments(_bundle), TRANSPORT == 'fifo')
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	if TRANSPORT == 'fifo':
+		_pipes = [_Pipe('w', _data) for _data, _ in _parts]
+		_read = [
+				_random_name + 'con' + str(_i) + ' <- fifo("' + _pipe.name + '", open="rb", blocking=TRUE); '
+					+ _random_name + str(_i) + ' <- readMat(' + _random_name + 'con' + str(_i) + '); '
+					+ 'close(' + _random_name + 'con' + str(_i) + ')'
+					for _i, _pipe in enumerate(_pipes)
+			] + [
+				_random_name + ' <- c(' + ', '.join([_random_name + str(_i) for _i in range(len(_pipes))]) + ')',
+				'rm(' + ', '.join([_random_name + _j + str(_i) for _i in range(len(_pipes)) for _j in ['con', '']]) + ')'
+			]
+	else:
+		# the segments are loaded together
+		_read = [_random_name + ' <- c(' + ', '.join(['readMat("' + _file + '")' for _file, _ in _parts]) + ')']
+
+	if any([_k.endswith(_STRINGS[1]) for _k in _bundle]):
+		_read.append(_random_name + ' <- multilang.unpack(' + _random_name + ')')
+
+	# send them
+	# R.matlab replaces '_' with '.' in names
+	try:
+		_r_object.sendlines(
+			[
+				'library("R.matlab")'
+			] + _code + _read + [
+				_current + ' <- ' + _random_name + '$' + _current.replace('_','.')
+					for _current in _send
+			] + [
+				# 1D arrays are row vectors
+				_current + ' <- ' + ('cbind(' if np.ndim(_v) == 1 else 'rbind(') + _current + ', '
+					+ _random_name + '$' + _current.replace('_','.') + ')'
+					for _current, _v in _append.items()
+			] + _storage_mode(_modes) + [
+				'rm(' + _random_name + ')'
+			]
+		)
+	finally:
+		if TRANSPORT == 'fifo':
+			for _pipe in _pipes: _pipe.close()
+		else:
+			for _file, _scratch in _parts: _scratch.release(_file)
+
+	_remember(_entries, _r_object)
+	return _r_object
+
+def to_mat(_out : dict, _mat_object):
+	"""Send variables to Matlab, skipping those Matlab already has
+
+	Parameters
+	----------
+	_out : dict[str, object]
+		The variables to send as {name: value}
+	_mat_object : MatlabObject
+		The Matlab environment to load the variables into
+
+	Returns
+	-------
+	MatlabObject
+		@_mat_object with the given variables loaded
+	"""
+	_send, _append, _entries = _unchanged(_out, _mat_object)
+	if not _send and not _append:
+		# nothing new
+		return _mat_object
+
+	# small things go straight into the command
+	_send, _code = _literals(_send, 'm')
+	if not _send and not _append:
+		_mat_object.sendline(' '.join(_code))
+		_remember(_entries, _mat_object)
+		return _mat_object
+
+	# bundle them
+	_bundle = _for_mat(dict(_send, **_append))
+	_parts = _segments(_bundle)
+	_files = _encode(_parts)
+
+	# load them all at once
+	try:
+		_lines = list(_code)
+		for (_file, _), _part in zip(_files, _parts):
+			if any([_current.endswith(_STRINGS[1]) for _current in _part]):
+				# strings are never appended, but what they are sent with may be; see _rows
+				_lines.append(_mat_import(_file, {_current: np.ndim(_append[_current]) for _current in _part if _current in _append}))
+				continue
+			elif not any([_current in _append for _current in _part]):
+				_lines.append('load \'' + _file + '\';')
+				continue
+
+			# load into a struct so the new rows can be appended
+			_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+			_lines += [
+					_random_name + ' = load(\'' + _file + '\');'
+				] + [
+					_current + ' = ' + _random_name + '.' + _current + ';'
+						for _current in _part if _current in _send
+				] + [
+					# 1D arrays are row vectors
+					_current + ' = [' + _current + (', ' if np.ndim(_append[_current]) == 1 else '; ') + _random_name + '.' + _current + '];'
+						for _current in _part if _current in _append
+				] + [
+					'clear ' + _random_name + ';'
+				]
+		_mat_object.sendline(' '.join(_lines))
+	finally:
+		for _file, _scratch in _files: _scratch.release(_file)
+
+	_remember(_entries, _mat_object)
+	return _mat_object
+
+def from_r(_names, _r_object):
+	"""Get variables from R
+
+	Parameters
+	----------
+	_names : Iterable[str]
+		The names of the R variables
+	_r_object : RObject
+		The R environment where the variables are stored
+
+	Returns
+	-------
+	dict[str, object]
+		The requested variables and their corresponding values
+
+	Raises
+	------
+	NameError
+		If a variable is not in the R environment
+	"""
+	if TRANSPORT == 'fifo':
+		_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+		_pipe = _Pipe('r')
+		try:
+			_r_object.sendlines([
+					_random_name + ' <- fifo("' + _pipe.name + '", open="wb", blocking=TRUE)',
+					_r_export(_random_name, _names) + '; close(' + _random_name + '); rm(' + _random_name + ')'
+				])
+		finally:
+			_pipe.close()
+		_check_missing(_r_object, 'r')
+		return _loadmat(_pipe.buffer)
+
+	_temp_file = SCRATCH.file()
+	try:
+		_r_object.sendline(_r_export('"' + _temp_file + '"', _names))
+		_check_missing(_r_object, 'r')
+		return _loadmat(_temp_file)
+	finally:
+		SCRATCH.release(_temp_file)
+
+def fetch_r(_name : str, _r_object, _rows = None, _cols = None, _shape : tuple = None):
+	"""Get part of a variable from R
+	The subsetting is done in R, so only that part is sent
+
+	Parameters
+	----------
+	_name : str
+		The name of the R variable
+	_r_object : RObject
+		The R environment where the variable is stored
+	_rows : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+		Which rows to get, as a 0-based Python index or names
+		Default: all of them
+	_cols : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+		Which columns to get, as for @_rows
+		Default: all of them
+	_shape : optional[tuple[int]]
+		The dimensions of the variable, if known, to check @_rows and @_cols
+		before asking R
+		Default: let R check them
+
+	Returns
+	-------
+	object
+		The requested part of the variable
+
+	Raises
+	------
+	IndexError
+		If an integer in @_rows or @_cols is out of range
+	"""
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	_nrow, _ncol = (None, None) if _shape is None else (_shape[0] if _shape else 1, _shape[1] if len(_shape) > 1 else 1)
+	_i, _j = _r_index(_rows, 'NROW(' + _name + ')', _nrow), _r_index(_cols, 'NCOL(' + _name + ')', _ncol)
+	if _cols is None:
+		# vectors have no columns
+		_r_object.sendline(_random_name + ' <- if (is.null(dim(' + _name + '))) ' + _name + '[' + _i + '] else ' + _name + '[' + _i + ', , drop=FALSE]')
+	else:
+		_r_object.sendline(_random_name + ' <- ' + _name + '[' + _i + ', ' + _j + ', drop=FALSE]')
+	if _RANGE in _r_object.before:
+		raise IndexError('index out of range for ' + _name)
+
+	try:
+		return from_r([_random_name], _r_object)[_random_name]
+	finally:
+		_r_object.sendline('rm(' + _random_name + ')')
+
+def fetch_mat(_name : str, _mat_object, _rows = None, _cols = None):
+	"""Get part of a variable from Matlab
+	The subsetting is done in Matlab, so only that part is sent
+
+	Parameters
+	----------
+	_name : str
+		The name of the Matlab variable
+	_mat_object : MatlabObject
+		The Matlab environment where the variable is stored
+	_rows : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+		Which rows to get, as a 0-based Python index or table variable names
+		Default: all of them
+	_cols : optional[slice, int, Iterable[int], Iterable[bool], Iterable[str]]
+		Which columns to get, as for @_rows
+		Default: all of them
+
+	Returns
+	-------
+	object
+		The requested part of the variable
+	"""
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	_i, _j = _mat_index(_rows), _mat_index(_cols)
+	if _cols is None:
+		# 1D arrays from Python are row vectors, so index them linearly
+		_mat_object.sendline('if isvector(' + _name + '), ' + _random_name + ' = ' + _name + '(' + _i + '); else, ' + _random_name + ' = ' + _name + '(' + _i + ', :); end;')
+	else:
+		_mat_object.sendline(_random_name + ' = ' + _name + '(' + _i + ', ' + _j + ');')
+
+	try:
+		return from_mat([_random_name], _mat_object)[_random_name]
+	finally:
+		_mat_object.sendline('clear ' + _random_name + ';')
+
+def _check_ops(_ops):
+	"""Check and return the list of summaries @_ops; see `summarize_r`"""
+	if type(_ops) is str: _ops = _ops.replace(' ','').split(',')
+	_ops = [i.lower() for i in _ops]
+	for i in _ops:
+		if i not in SUMMARIES:
+			raise ValueError('Unrecognized summary: ' + i + '. Expected one of ' + ', '.join(SUMMARIES))
+	return _ops
+
+def summarize_r(_name : str, _r_object, _ops = ('shape', 'sum', 'mean', 'min', 'max', 'nnz')):
+	"""Get summaries of a variable, computed in R
+	Only the summaries are sent back
+
+	Parameters
+	----------
+	_name : str
+		The name of the R variable
+	_r_object : RObject
+		The R environment where the variable is stored
+	_ops : str, Iterable[str]
+		The summaries to compute, from the keys of SUMMARIES
+		If str: comma-separated
+		Default: shape, sum, mean, min, max, nnz
+
+	Returns
+	-------
+	dict[str, object]
+		{op: summary} for each of @_ops
+
+	Raises
+	------
+	ValueError
+		If an op is not in SUMMARIES
+	"""
+	_ops = _check_ops(_ops)
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	_names = {i: _random_name + '_' + i for i in _ops}
+	_r_object.sendline('; '.join([_names[i] + ' <- ' + SUMMARIES[i][0].format(x=_name) for i in _ops]))
+
+	try:
+		_out = from_r(list(_names.values()), _r_object)
+	finally:
+		_r_object.sendline('rm(' + ', '.join(_names.values()) + ')')
+	return {i: _out[_names[i]] for i in _ops}
+
+def summarize_mat(_name : str, _mat_object, _ops = ('shape', 'sum', 'mean', 'min', 'max', 'nnz')):
+	"""Get summaries of a variable, computed in Matlab
+	Only the summaries are sent back
+
+	Parameters
+	----------
+	_name : str
+		The name of the Matlab variable
+	_mat_object : MatlabObject
+		The Matlab environment where the variable is stored
+	_ops : str, Iterable[str]
+		The summaries to compute, from the keys of SUMMARIES
+		If str: comma-separated
+		Default: shape, sum, mean, min, max, nnz
+
+	Returns
+	-------
+	dict[str, object]
+		{op: summary} for each of @_ops
+
+	Raises
+	------
+	ValueError
+		If an op is not in SUMMARIES
+	"""
+	_ops = _check_ops(_ops)
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	_names = {i: _random_name + '_' + i for i in _ops}
+	_mat_object.sendline(' '.join([_names[i] + ' = ' + SUMMARIES[i][1].format(x=_name) + ';' for i in _ops]))
+
+	try:
+		_out = from_mat(list(_names.values()), _mat_object)
+	finally:
+		_mat_object.sendline('clear ' + ' '.join(_names.values()) + ';')
+	return {i: _out[_names[i]] for i in _ops}
+
+def from_mat(_names, _mat_object):
+	"""Get variables from Matlab
+
+	Parameters
+	----------
+	_names : Iterable[str]
+		The names of the Matlab variables
+	_mat_object : MatlabObject
+		The Matlab environment where the variables are stored
+
+	Returns
+	-------
+	dict[str, object]
+		The requested variables and their corresponding values
+
+	Raises
+	------
+	NameError
+		If a variable is not in the Matlab environment
+	"""
+	_temp_file = SCRATCH.file()
+	try:
+		_mat_object.sendline(_mat_export(_temp_file, _names))
+		_check_missing(_mat_object, 'm')
+		return _loadmat(_temp_file, 'm')
+	finally:
+		SCRATCH.release(_temp_file)
+
+def move_r_to_mat(_names, _r_object, _mat_object):
+	"""Move variables from R to Matlab
+
+	Parameters
+	----------
+	_names : Iterable[str]
+		The names of the R variables
+	_r_object : RObject
+		The R environment where the variables are stored
+	_mat_object : MatlabObject
+		The Matlab environment to load the variables into
+
+	Returns
+	-------
+	MatlabObject
+		@_mat_object with the given variables loaded
+
+	Raises
+	------
+	NameError
+		If a variable is not in the R environment
+	"""
+	_temp_file = SCRATCH.file()
+	try:
+		_r_object.sendline(_r_export('"' + _temp_file + '"', _names))
+		_check_missing(_r_object, 'r')
+		_mat_object.sendline(_mat_import(_temp_file))
+	finally:
+		SCRATCH.release(_temp_file)
+
+	_mat_object.forget(_names)
+	return _mat_object
+
+def move_mat_to_r(_names, _mat_object, _r_object):
+	"""Move variables from Matlab to R
+
+	Parameters
+	----------
+	_names : Iterable[str]
+		The names of the Matlab variables
+	_mat_object : MatlabObject
+		The Matlab environment where the variables are stored
+	_r_object : RObject
+		The R environment to load the variables into
+
+	Returns
+	-------
+	RObject
+		@_r_object with the given variables loaded
+
+	Raises
+	------
+	NameError
+		If a variable is not in the Matlab environment
+	"""
+	_temp_file = SCRATCH.file()
+	_random_name = ''.join(choices('abcdefghijklmnopqrstuvwxyz', k=10))
+	try:
+		_mat_object.sendline(_mat_export(_temp_file, _names))
+		_check_missing(_mat_object, 'm')
+
+		# integer and logical arrays get their storage mode in PROMOTION
+		_modes, _class = {}, _classes(_temp_file)
+		for _k, _c in _class.items():
+			_mode = PROMOTION.get(_MAT_DTYPES.get(_c), (None,))[0]
+			if _mode in _R_DTYPES and _mode != 'double': _modes[_k] = _mode
+
+		_r_object.sendlines(
+			[
+				'library("R.matlab")',
+				_random_name + ' <- readMat("' + _temp_file + '")'
+			] + [
+				_random_name + ' <- multilang.unpack(' + _random_name + ')'
+					for _k in _class if _k.endswith(_STRINGS[1])
+			][:1] + [
+				_current + ' <- ' + _random_name + '$' + _current.replace('_','.')
+					for _current in _names
+			] + _storage_mode(_modes) + [
+				'rm(' + _random_name + ')'
+			]
+		)
+	finally:
+		SCRATCH.release(_temp_file)
+
+	_r_object.forget(_names)
+	return _r_object
@@ -1,6 +1,17 @@
 import numpy as np
-from multilang import as_multilang, Master
+import os
+import pandas as pd
+import scipy.sparse as sp
+import shutil
+from multilang import as_multilang, compile_mul, expand, Master, run_many, sweep, transfer
+from multilang.transfer import _literal, _mat_chunks, _pack_strings, _r_index, _unpack_strings, assigned, compression, content_hash, Scratch
+from tempfile import TemporaryDirectory
+import traceback
 import unittest
+from unittest import mock
+
+# the Matlab tests of transfers are skipped without it
+_MATLAB = shutil.which('matlab') is not None
 
 
 class Test_Multilang_Func(unittest.TestCase):
@@ -94,6 +105,246 @@ a = 7''', _verbosity=0)
 			del p,r
 
 
+	def test_program(self):
+		script = '''#! multilang
+a = 3
+#! r -> a
+b <- a * 2
+#! py -> b'''
+		prog = compile_mul(script)
+		with self.subTest('blocks'):
+			self.assertListEqual([i.kind for i in prog], ['code', 'switch', 'code', 'switch'])
+			self.assertListEqual([i.lang for i in prog], ['p', 'r', 'r', 'p'])
+			self.assertTupleEqual(prog[1].names, ('a',))
+			self.assertEqual(prog[2].line, 4)
+		with self.subTest('parsed once'):
+			self.assertIs(compile_mul(script), prog)
+		with self.subTest('run twice'):
+			for _ in range(2):
+				ry = prog.run(_verbosity=0)
+				self.assertEqual(ry.dump_py()['b'], 6)
+
+	def test_comments(self):
+		prog = compile_mul('''#! multilang
+s = "it's # not" # comment
+t = 'a\\'#b' % comment
+n %= 3
+#! r ->
+y <- x %in% z %% 2 # comment
+#! mat ->
+y = x'; s = 'it''s % not'; % comment
+#! bash ->
+echo ${#a[@]} ${f%.mul} # comment''')
+		with self.subTest('python'):
+			self.assertTupleEqual(prog[0].code, ('s = "it\'s # not"', "t = 'a\\'#b'", 'n %= 3'))
+		with self.subTest('r'):
+			self.assertTupleEqual(prog[2].code, ('y <- x %in% z %% 2',))
+		with self.subTest('matlab'):
+			self.assertTupleEqual(prog[4].code, ("y = x'; s = 'it''s % not';",))
+		with self.subTest('bash'):
+			self.assertTupleEqual(prog[6].code, ('echo ${#a[@]} ${f%.mul}',))
+
+	def test_cache(self):
+		with TemporaryDirectory() as d:
+			fname = os.path.join(d, 'script.mul')
+			with open(fname, 'w') as f:
+				f.write('#! multilang\na = 3\n')
+			prog = compile_mul(fname)
+			self.assertTrue(os.path.exists(os.path.join(d, '__mulcache__', 'script.mul.mulc')))
+			self.assertEqual(compile_mul(fname).blocks, prog.blocks)
+
+			with open(fname, 'w') as f:
+				f.write('#! multilang\na = 42\n')
+			self.assertTupleEqual(compile_mul(fname)[0].code, ('a = 42',))
+
+	def test_traceback(self):
+		prog = compile_mul('#! multilang\na = 1\n# comment\nb = 1/0\n')
+		self.assertEqual(prog[0].filename, '<string:2>')
+		with self.assertRaises(ZeroDivisionError) as e:
+			prog.run(_verbosity=0)
+		tb = traceback.extract_tb(e.exception.__traceback__)[-1]
+		self.assertTupleEqual((tb.filename, tb.lineno, tb.line), ('<string:2>', 4, 'b = 1/0'))
+
+	def test_parallel(self):
+		prog = compile_mul('''#! multilang
+a = 1
+#! r -> a
+b <- a
+#! py ->
+c = 2
+#! mat -> c
+d = c
+#! r -> after=mat
+e <- b
+#! py -> e''')
+		with self.subTest('dependencies'):
+			# the Python block doesn't wait for R, the Matlab switch waits for both
+			self.assertTupleEqual(prog.dependencies()[4], (3,))
+			self.assertTupleEqual(prog.dependencies()[7], (2, 6))
+		with self.subTest('run'):
+			ry = prog.run(_verbosity=0, _parallel=True)
+			self.assertEqual(ry.dump_py()['e'], 1)
+
+	def test_memo(self):
+		with TemporaryDirectory() as d:
+			log = os.path.join(d, 'log')
+			script = '''#! multilang
+a = k * 2
+#! r -> a, log
+cat("r\\n", file=log, append=TRUE)
+b <- a + 1
+#! py -> b
+c = b * 10'''
+			for k, runs in [(1, 1), (1, 1), (2, 2)]:
+				with self.subTest(k=k, runs=runs):
+					ry = as_multilang(script, _verbosity=0, _memo=os.path.join(d, 'memo'), k=k, log=log)
+					self.assertEqual(ry.dump_py()['c'], (k * 2 + 1) * 10)
+					with open(log) as f:
+						self.assertEqual(len(f.readlines()), runs)
+
+			with self.subTest('last block edited'):
+				ry = as_multilang(script + ' + 1', _verbosity=0, _memo=os.path.join(d, 'memo'), k=2, log=log)
+				self.assertEqual(ry.dump_py()['c'], 51)
+				with open(log) as f:
+					self.assertEqual(len(f.readlines()), 2)
+
+	def test_memo_skipped(self):
+		with TemporaryDirectory() as d:
+			script = '''#! multilang R
+x <- 1
+#! py -> x
+x = 2
+#! r -> x, k
+y <- x * 10 + k
+#! py -> y'''
+			as_multilang(script, _verbosity=0, _memo=d, k=0)
+			# the first R block is replayed, the second isn't
+			ry = as_multilang(script, _verbosity=0, _memo=d, k=1)
+			self.assertEqual(ry.dump_py()['y'], 21)
+
+	def test_bad_options(self):
+		for kwargs in [{'_memo': True, '_parallel': True}, {'_resume': True}]:
+			with self.subTest(**kwargs):
+				with self.assertRaises(ValueError):
+					as_multilang('#! multilang R\na <- 1', _verbosity=0, unused=1, **kwargs)
+				self.assertNotIn('unused', as_multilang('#! multilang\n', _verbosity=0).who_py)
+
+	def test_checkpoint(self):
+		with TemporaryDirectory() as d:
+			log = os.path.join(d, 'log')
+			script = '''#! multilang
+a = 2
+#! r -> a, log
+cat("r\\n", file=log, append=TRUE)
+b <- a + 1
+#! py ->
+c = 1 // k
+#! r ->
+d <- b * 10
+#! py -> d'''
+			with self.subTest('fails'):
+				with self.assertRaises(ZeroDivisionError):
+					as_multilang(script, _verbosity=0, _checkpoint_dir=d, k=0, log=log)
+				self.assertTrue(os.path.exists(os.path.join(d, 'checkpoint.pkl')))
+			with self.subTest('resumes'):
+				ry = as_multilang(script, _verbosity=0, _checkpoint_dir=d, _resume=True, k=1)
+				self.assertEqual(ry.dump_py()['d'], 30)
+				with open(log) as f:
+					self.assertEqual(len(f.readlines()), 1)
+				self.assertFalse(os.path.exists(os.path.join(d, 'checkpoint.pkl')))
+
+	def test_checkpoint_packages(self):
+		with TemporaryDirectory() as d:
+			script = '''#! multilang R
+library(tools)
+a <- 1
+#! py ->
+c = 1 // k
+#! r ->
+e <- file_ext("x.mul")
+#! py -> e'''
+			with self.assertRaises(ZeroDivisionError):
+				as_multilang(script, _verbosity=0, _checkpoint_dir=d, k=0)
+			ry = as_multilang(script, _verbosity=0, _checkpoint_dir=d, _resume=True, k=1)
+			self.assertEqual(ry.dump_py()['e'], 'mul')
+
+	def test_sweep(self):
+		script = '''#! multilang
+a = k * 2
+#! r -> a
+b <- a + 1
+#! py -> b
+c = 1 // (b - 3)'''
+		with self.subTest('grid'):
+			self.assertEqual(len(expand({'k': [0, 1, 2], 'j': ['x', 'y']})), 6)
+			self.assertDictEqual(expand({'k': [0, 1], 'j': ['x']})[1], {'k': 1, 'j': 'x'})
+		results = sweep(script, {'k': [0, 1, 2, 3]}, workers=2, outputs='b')
+		with self.subTest('order'):
+			self.assertListEqual([r.params['k'] for r in results], [0, 1, 2, 3])
+		with self.subTest('outputs'):
+			self.assertListEqual([r.outputs['b'] for r in results if r.ok], [1, 5, 7])
+		with self.subTest('failures'):
+			self.assertFalse(results[1].ok)
+			self.assertIn('ZeroDivisionError', results[1].error)
+
+	def test_shared_prefix(self):
+		with TemporaryDirectory() as d:
+			log = os.path.join(d, 'log')
+			script = '''#! multilang
+with open(''' + repr(log) + ''', 'a') as f:
+	f.write('setup\\n')
+data = list(range(5))
+data.append(k)
+#! r -> data
+b <- sum(data)
+#! py -> b'''
+			with self.subTest('split'):
+				head, rest = compile_mul(script).split(['k'])
+				self.assertEqual(len(head), 1)
+				self.assertEqual(rest[0].line, 5)
+			with self.subTest('run once'):
+				results = sweep(script, {'k': [1, 2, 3]}, workers=2, outputs='b, data')
+				self.assertListEqual([r.outputs['b'] for r in results], [11, 12, 13])
+				# each run changed its own copy
+				self.assertListEqual([len(r.outputs['data']) for r in results], [6, 6, 6])
+				with open(log) as f:
+					self.assertEqual(len(f.readlines()), 1)
+
+	def test_shared_function(self):
+		script = '''#! multilang
+data = list(range(1000))
+@multilang
+def f():
+	return _VARIABLES['k'] * 2
+y = f()'''
+		with self.subTest('split'):
+			head, rest = compile_mul(script).split(['k'])
+			self.assertListEqual([b.kind for b in head], ['code', 'function'])
+			self.assertTupleEqual(rest[0].code, ('y = f()',))
+		results = sweep(script, {'k': [1, 2]}, workers=2)
+		with self.subTest('outputs'):
+			self.assertListEqual([r.outputs['y'] for r in results], [2, 4])
+		with self.subTest('prefix not sent back'):
+			self.assertNotIn('data', results[0].outputs)
+
+	def test_run_many(self):
+		with TemporaryDirectory() as d:
+			scripts = []
+			for i, code in enumerate(['x <- 3\n#! py -> x', 'y <- exists("x")\n#! py -> y', 'stop("no")']):
+				scripts.append(os.path.join(d, str(i) + '.mul'))
+				with open(scripts[-1], 'w') as f:
+					f.write('#! multilang R\n' + code + '\n')
+
+			# one worker, so the same R session runs all of them
+			results = run_many(scripts, jobs=1, outputs='x, y')
+			with self.subTest('outputs'):
+				self.assertEqual(results[0].outputs['x'], 3)
+			with self.subTest('reset between scripts'):
+				self.assertFalse(results[1].outputs['y'])
+				self.assertNotIn('x', results[1].outputs)
+			with self.subTest('failures'):
+				self.assertFalse(results[2].ok)
+
 
 class Test_Multilang_Master_Base(unittest.TestCase):
 	def test_r_only(self):
@@ -414,5 +665,347 @@ class Test_Multilang_Master_RMat(unittest.TestCase):
 			self.assertIs(type(m['i']), type(r['i']))
 			self.assertListEqual(m['i'].tolist(), r['i'].tolist())
 
+class Test_Multilang_Transfer(unittest.TestCase):
+	def test_index(self):
+		with self.subTest('names'):
+			self.assertEqual(_r_index(['a"b', 'c\\'], 'NROW(x)'), 'c("a\\"b", "c\\\\")')
+		with self.subTest('in range'):
+			self.assertEqual(_r_index([-3, 2], 'NROW(x)', 3), 'multilang.index(NROW(x), c(-3, 2))')
+		for i in [-4, 3]:
+			with self.subTest('out of range', index=i):
+				with self.assertRaises(IndexError):
+					_r_index([i], 'NROW(x)', 3)
+
+	def test_hash(self):
+		a = np.arange(12.).reshape(3,4)
+		with self.subTest('same content'):
+			self.assertEqual(content_hash(a), content_hash(a.copy()))
+		with self.subTest('different layout'):
+			self.assertNotEqual(content_hash(a), content_hash(np.asfortranarray(a)))
+		with self.subTest('changed'):
+			b = a.copy()
+			b[0,0] = 7
+			self.assertNotEqual(content_hash(a), content_hash(b))
+		with self.subTest('sparse left as it is'):
+			c = sp.csc_matrix((np.ones(3), [0, 0, 1], [0, 2, 3]), shape=(2, 2))
+			content_hash(c)
+			self.assertEqual(c.nnz, 3)
+			self.assertEqual(content_hash(c), content_hash(c.copy()))
+
+	def test_assigned(self):
+		self.assertListEqual(assigned('x[1] <- 3; y + z', ['x','y','z'], 'r'), ['x'])
+		self.assertListEqual(assigned('[a, b] = size(c);', ['a','b','c'], 'm'), ['a','b'])
+		self.assertIsNone(assigned('rm(x)', ['x'], 'r'))
+		for code in ['for (x in 1:3) print(x)', 'levels(x)[2] <- "b"', 'x %<>% sort', 'x[, b := 1]', 'setnames(x, "a", "b")']:
+			with self.subTest(code):
+				self.assertListEqual(assigned(code, ['x','y'], 'r'), ['x'])
+		with self.subTest('x(f(1)) = 3;'):
+			self.assertListEqual(assigned('x(f(1)) = 3; disp(y(f(1)))', ['x','y'], 'm'), ['x'])
+
+	def test_compression(self):
+		with self.subTest('small'):
+			self.assertEqual(compression({'a': np.arange(5)}), 'none')
+		zeros, noise = {'a': np.zeros((1000,1000))}, {'a': np.frombuffer(os.urandom(2**21), np.uint8)}
+		no_shm, shm = mock.Mock(shared=False), mock.Mock(shared=True)
+		with TemporaryDirectory() as d:
+			scratch = Scratch(d)
+			with mock.patch('multilang.transfer._SHM', no_shm):
+				with mock.patch.object(Scratch, 'bandwidth', new_callable=mock.PropertyMock, return_value=2**10):
+					with self.subTest('slow disk'):
+						self.assertEqual(compression(zeros, scratch), 'fast')
+					with self.subTest('incompressible'):
+						self.assertEqual(compression(noise, scratch), 'none')
+				with mock.patch.object(Scratch, 'bandwidth', new_callable=mock.PropertyMock, return_value=2**50):
+					with self.subTest('fast disk'):
+						self.assertEqual(compression(zeros, scratch), 'none')
+			with mock.patch('multilang.transfer._SHM', shm), mock.patch('shutil.disk_usage', return_value=mock.Mock(free=2**40)):
+				with self.subTest('shared memory'):
+					self.assertEqual(compression(zeros, scratch), 'shm')
+				with self.subTest('already shared'):
+					with mock.patch.object(Scratch, 'shared', new_callable=mock.PropertyMock, return_value=True):
+						self.assertEqual(compression(zeros, scratch), 'none')
+			scratch.cleanup()
+
+	def test_string_offsets(self):
+		genes = ['ACTB', '', 'ß-gene', '😀x', '𠀀'] * 3
+		text, offsets = _pack_strings(genes)
+		with self.subTest('UTF-8 bytes'):
+			self.assertEqual(offsets[-1], len(''.join(genes).encode('utf-8')))
+		with self.subTest('from bytes'):
+			self.assertListEqual(_unpack_strings(text, offsets).tolist(), genes)
+		with self.subTest('from text'):
+			self.assertListEqual(_unpack_strings(''.join(genes), offsets).tolist(), genes)
+
+	def test_scratch_quota(self):
+		with TemporaryDirectory() as d:
+			scratch = Scratch(d, quota=100)
+			mine = scratch.file()
+			other = os.path.join(scratch.path, str(os.getppid()) + '-0.mat')
+			left = os.path.join(scratch.path, str(os.getpid()) + '-999.mat')
+			for f in [left, other, mine]:
+				with open(f, 'wb') as g:
+					g.write(b'0' * 80)
+			scratch.file()
+			with self.subTest('in flight'):
+				self.assertTrue(os.path.exists(mine))
+			with self.subTest('other process'):
+				self.assertTrue(os.path.exists(other))
+			with self.subTest('leftover'):
+				self.assertFalse(os.path.exists(left))
+			scratch.cleanup()
+
+	def test_encode_failure(self):
+		real = transfer._savemat
+		def savemat(f, out, how):
+			if 'b' in out: raise ValueError('cannot write b')
+			real(f, out, how)
+		before = set(os.listdir(transfer.SCRATCH.path))
+		with mock.patch('multilang.transfer.WORKERS', 3), mock.patch('multilang.transfer._savemat', savemat):
+			with self.assertRaises(ValueError):
+				transfer._encode([{'a': np.zeros(10)}, {'b': np.zeros(10)}, {'c': np.zeros(10)}])
+		# the files of the parts that were written are released
+		self.assertSetEqual(set(os.listdir(transfer.SCRATCH.path)), before)
+
+	def test_skip_unchanged(self):
+		ry = Master(mat=False)
+		ry.load('a', np.arange(5))
+		ry.py_to_r('a')
+		self.assertIn('a', ry.r_object.manifest)
+		ry.r('a <- a + 1')
+		self.assertNotIn('a', ry.r_object.manifest)
+		ry.py_to_r('a')
+		self.assertListEqual(ry.dump_r()['a'].tolist(), [0,1,2,3,4])
+		ry.r_object.close()
+
+	def test_append(self):
+		ry = Master(mat=False)
+		ry.load('a', np.array([[1,2],[3,4]]))
+		ry.py_to_r('a')
+		ry.load('a', np.array([[1,2],[3,4],[5,6]]))
+		ry.py_to_r('a')
+		self.assertListEqual(ry.dump_r()['a'].tolist(), [[1,2],[3,4],[5,6]])
+		ry.r_object.close()
+
+	def test_sparse(self):
+		ry = Master(mat=False)
+		a = sp.random(30, 20, density=0.1, format='csc')
+		ry.load('a', a)
+		ry.py_to_r('a')
+		b = ry.r_to_py('a', load=False)['a']
+		self.assertTrue(sp.issparse(b))
+		self.assertEqual(abs(b - a).max(), 0)
+		ry.r_object.close()
+
+	def test_dtypes(self):
+		ry = Master(mat=False)
+		ry.load('a', np.arange(5, dtype='int32'))
+		ry.load('b', np.array([True, False]))
+		ry.py_to_r('a, b')
+		ry.r('c <- is.integer(a) && is.logical(b)')
+		out = ry.r_to_py('a, b, c', load=False)
+		self.assertEqual(out['a'].dtype, np.int32)
+		self.assertEqual(out['b'].dtype, np.bool_)
+		self.assertTrue(out['c'])
+		ry.r_object.close()
+
+	def test_na(self):
+		ry = Master(mat=False)
+		ry.r('a <- c(1L, NA); b <- c(TRUE, NA)')
+		out = ry.r_to_py('a, b', load=False)
+		for k, v in [('a', 1), ('b', 1)]:
+			with self.subTest(k):
+				self.assertEqual(out[k].dtype, np.float64)
+				self.assertEqual(out[k][0], v)
+				self.assertTrue(np.isnan(out[k][1]))
+		ry.r_object.close()
+
+	def test_lazy(self):
+		ry = Master(mat=False)
+		ry.r('a <- matrix(1:6, nrow=2)')
+		a = ry.r_to_py('a', lazy=True)['a']
+		with self.subTest('metadata'):
+			self.assertEqual(a.shape, (2,3))
+			self.assertEqual(a.dtype, np.int32)
+		with self.subTest('values'):
+			with mock.patch('multilang.refs.from_r', wraps=transfer.from_r) as fetch:
+				self.assertListEqual(np.asarray(a).tolist(), [[1,3,5],[2,4,6]])
+				self.assertListEqual(a.values.tolist(), [[1,3,5],[2,4,6]])
+			self.assertEqual(fetch.call_count, 1)
+		with self.subTest('copy in R'):
+			ry.load('b', a)
+			ry.py_to_r('b')
+			self.assertListEqual(ry.r_to_py('b', load=False)['b'].tolist(), [[1,3,5],[2,4,6]])
+		ry.r_object.close()
+
+	def test_fetch(self):
+		ry = Master(mat=False)
+		ry.r('a <- matrix(1:12, nrow=4, dimnames=list(NULL, c("x","y","z")))')
+		with self.subTest('rows'):
+			self.assertListEqual(ry.fetch_r('a', rows=slice(1,3)).tolist(), [[2,6,10],[3,7,11]])
+		with self.subTest('cols'):
+			self.assertListEqual(ry.fetch_r('a', rows=[-1], cols=['x','z']).tolist(), [4,12])
+		with self.subTest('reference'):
+			self.assertListEqual(ry.r_to_py('a', lazy=True)['a'][::2, 0].tolist(), [1,3])
+		with self.subTest('out of range'):
+			with self.assertRaises(IndexError):
+				ry.fetch_r('a', rows=[-5])
+			with self.assertRaises(IndexError):
+				ry.r_to_py('a', lazy=True)['a'][0, 3]
+		with self.subTest('quoted names'):
+			ry.r('b <- c(1, 2); names(b) <- c(\'x"y\', "z")')
+			self.assertListEqual(ry.fetch_r('b', rows=['x"y']).tolist(), [1])
+		ry.r_object.close()
+
+	def test_summarize(self):
+		ry = Master(mat=False)
+		ry.r('a <- matrix(c(0,1,2,3,0,5), nrow=2)')
+		out = ry.summarize_r('a', ['shape', 'sum', 'nnz', 'colsums', 'quantiles'])
+		self.assertListEqual(out['shape'].tolist(), [2,3])
+		self.assertEqual(out['sum'], 11)
+		self.assertEqual(out['nnz'], 4)
+		self.assertListEqual(out['colsums'].tolist(), [1,5,5])
+		self.assertListEqual(out['quantiles'].tolist(), np.quantile([0,1,2,3,0,5], [0,.25,.5,.75,1]).tolist())
+		with self.subTest('no integer overflow'):
+			ry.r('b <- c(.Machine$integer.max, 1L)')
+			self.assertEqual(ry.summarize_r('b', 'sum')['sum'], 2**31)
+		with self.assertRaises(ValueError):
+			ry.summarize_r('a', 'median')
+		ry.r_object.close()
+
+	def test_literals(self):
+		ry = Master(mat=False)
+		ry.load('a', 3)
+		ry.load('b', 'say "hi"')
+		ry.load('c', np.array([[1.5, np.nan], [2, 3]]))
+		ry.py_to_r('a, b, c')
+		out = ry.r_to_py('a, b, c', load=False)
+		self.assertEqual(out['a'], 3)
+		self.assertEqual(out['b'], 'say "hi"')
+		self.assertTrue(np.array_equal(out['c'], [[1.5, np.nan], [2, 3]], equal_nan=True))
+		with self.subTest('same as through a file'):
+			ry.load('d', np.arange(3))
+			ry.py_to_r('a, d')
+			ry.r('dims <- c(dim(a), dim(d))')
+			with mock.patch('multilang.transfer.LITERAL', 0):
+				ry.r('rm(a, d)')
+				ry.py_to_r('a, d')
+			ry.r('same <- identical(dims, c(dim(a), dim(d)))')
+			self.assertTrue(ry.r_to_py('same', load=False)['same'])
+		with self.subTest('too big for a double'):
+			self.assertIsNone(_literal(np.uint64(2**60), 'm'))
+		ry.r_object.close()
+
+	def test_missing(self):
+		ry = Master(mat=False)
+		ry.r('a <- 1')
+		with self.assertRaises(NameError):
+			ry.r_to_py('a, b')
+		with self.assertRaises(NameError):
+			ry.r_to_py('b', lazy=True)
+		self.assertEqual(ry.r_to_py('a', load=False)['a'], 1)
+		ry.r_object.close()
+
+	def test_layout(self):
+		ry = Master(mat=False)
+		ry.load('a', np.arange(6.).reshape(2,3))
+		ry.py_to_r('a')
+		a = ry.r_to_py('a', load=False)['a']
+		with self.subTest('arrives column-major'):
+			self.assertTrue(a.flags.f_contiguous)
+		with self.subTest('sent without copying'):
+			self.assertTrue(any([isinstance(i, memoryview) and np.shares_memory(np.frombuffer(i, dtype=a.dtype), a) for i in _mat_chunks({'a': a})]))
+		ry.load('a', a + 1)
+		ry.py_to_r('a')
+		self.assertListEqual(ry.dump_r()['a'].tolist(), [[1,2,3],[4,5,6]])
+		ry.r_object.close()
+
+	def test_strings(self):
+		ry = Master(mat=False)
+		genes = ['ACTB', '', 'ß-gene', 'x' * 100] * 20
+		ry.load('genes', genes)
+		ry.py_to_r('genes')
+		ry.r('n <- nchar(genes)')
+		d = ry.r_to_py('genes, n', load=False)
+		self.assertListEqual(d['genes'].tolist(), genes)
+		self.assertListEqual(d['n'].tolist(), [len(i) for i in genes])
+		ry.r_object.close()
+
+@unittest.skipUnless(_MATLAB, 'Matlab not available')
+class Test_Multilang_Transfer_Mat(unittest.TestCase):
+	def setUp(self):
+		self.ry = Master(r=False)
+
+	def tearDown(self):
+		self.ry.mat_object.close()
+
+	def test_append(self):
+		self.ry.load('a', np.array([[1,2],[3,4]]))
+		self.ry.py_to_mat('a')
+		self.ry.load('a', np.array([[1,2],[3,4],[5,6]]))
+		self.ry.py_to_mat('a')
+		self.assertListEqual(self.ry.mat_to_py('a', load=False)['a'].tolist(), [[1,2],[3,4],[5,6]])
+
+	def test_append_strings(self):
+		self.ry.load('df', pd.DataFrame([[1.,2.],[3.,4.]], index=['a','b']))
+		self.ry.py_to_mat('df', as_array=True)
+		self.ry.load('df', pd.DataFrame([[1.,2.],[3.,4.],[5.,6.]], index=['a','b','c']))
+		self.ry.py_to_mat('df', as_array=True)
+		out = self.ry.mat_to_py('df, df_index', load=False)
+		self.assertListEqual(out['df'].tolist(), [[1,2],[3,4],[5,6]])
+		self.assertListEqual(out['df_index'].tolist(), ['a','b','c'])
+
+	def test_strings(self):
+		genes = ['ACTB', '', 'ß-gene', 'x' * 100] * 20
+		self.ry.load('genes', genes)
+		self.ry.py_to_mat('genes')
+		self.ry.mat('n = strlength(genes);')
+		d = self.ry.mat_to_py('genes, n', load=False)
+		self.assertListEqual(d['genes'].tolist(), genes)
+		self.assertListEqual(np.ravel(d['n']).tolist(), [len(i) for i in genes])
+
+	def test_strings_r(self):
+		# both ways between R and Matlab, which count characters differently
+		genes = ['ACTB', '', 'ß-gene', '😀x', '𠀀'] * 3
+		ry = Master()
+		ry.load('genes', genes)
+		ry.py_to_r('genes')
+		ry.r_to_mat('genes')
+		ry.r('rm(genes)')
+		ry.mat_to_r('genes')
+		with self.subTest('matlab'):
+			self.assertListEqual(ry.mat_to_py('genes', load=False)['genes'].tolist(), genes)
+		with self.subTest('r'):
+			self.assertListEqual(ry.r_to_py('genes', load=False)['genes'].tolist(), genes)
+		ry.r_object.close()
+		ry.mat_object.close()
+
+	def test_dtypes(self):
+		self.ry.load('a', np.arange(5, dtype='int32'))
+		self.ry.load('b', np.array([True, False]))
+		self.ry.load('f', np.arange(3, dtype='float32'))
+		self.ry.py_to_mat('a, b, f')
+		self.ry.mat('c = isa(a, \'int32\') && islogical(b) && isa(f, \'single\');')
+		out = self.ry.mat_to_py('a, b, c, f', load=False)
+		self.assertEqual(out['a'].dtype, np.int32)
+		self.assertEqual(out['b'].dtype, np.bool_)
+		self.assertEqual(out['f'].dtype, np.float32)
+		self.assertTrue(out['c'])
+
+	def test_fetch(self):
+		self.ry.mat('a = reshape(1:12, 4, 3);')
+		with self.subTest('rows'):
+			self.assertListEqual(self.ry.fetch_mat('a', rows=slice(1,3)).tolist(), [[2,6,10],[3,7,11]])
+		with self.subTest('cols'):
+			self.assertListEqual(np.ravel(self.ry.fetch_mat('a', rows=[-1], cols=[0,2])).tolist(), [4,12])
+
+	def test_summarize(self):
+		self.ry.mat('a = [0 2 0; 1 3 5];')
+		out = self.ry.summarize_mat('a', ['shape', 'sum', 'nnz', 'colsums', 'quantiles'])
+		self.assertListEqual(np.ravel(out['shape']).tolist(), [2,3])
+		self.assertEqual(out['sum'], 11)
+		self.assertEqual(out['nnz'], 4)
+		self.assertListEqual(np.ravel(out['colsums']).tolist(), [1,5,5])
+		self.assertListEqual(np.ravel(out['quantiles']).tolist(), np.quantile([0,1,2,3,0,5], [0,.25,.5,.75,1]).tolist())
+
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file